@@ -11,6 +11,58 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440  # 24 hours
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7  # 7 days
     
+    # Search cache settings
+    SEARCH_CACHE_SIZE: int = 2048
+    SEARCH_CACHE_TTL_SECONDS: int = 300
+
+    # Timeline (feed materializado) settings
+    TIMELINE_MAX_ITEMS: int = 800
+    # Autores com mais seguidores que isso não são distribuídos; o feed os lê na hora
+    TIMELINE_FANOUT_MAX_FOLLOWERS: int = 5000
+
+    # Outbox: efeitos colaterais das escritas executados em segundo plano
+    OUTBOX_WORKERS: int = 2
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_SECONDS: float = 1.0
+    OUTBOX_MAX_ATTEMPTS: int = 10
+    OUTBOX_BACKOFF_BASE_SECONDS: float = 1.0
+    OUTBOX_BACKOFF_MAX_SECONDS: float = 300.0
+
+    # Feed cache settings (páginas serializadas por usuário)
+    FEED_CACHE_SIZE: int = 4096
+    FEED_CACHE_TTL_SECONDS: int = 60
+    # Itens do feed serializados, compartilhados entre seguidores
+    FEED_FRAGMENT_CACHE_SIZE: int = 50000
+    FEED_FRAGMENT_CACHE_TTL_SECONDS: int = 3600
+
+    # Sugestões de quem seguir (grafo de seguidores em memória)
+    SOCIAL_GRAPH_RELOAD_SECONDS: int = 900
+    # Candidatos por conexões em comum que seguem para o cálculo de livros em comum
+    FOLLOW_SUGGESTIONS_CANDIDATES: int = 200
+    FOLLOW_SUGGESTIONS_TOP_K: int = 50
+    # Peso de cada livro em comum na estante, relativo a uma conexão em comum
+    FOLLOW_SUGGESTIONS_SHELF_WEIGHT: float = 0.25
+    FOLLOW_SUGGESTIONS_CACHE_SIZE: int = 10000
+    FOLLOW_SUGGESTIONS_CACHE_TTL_SECONDS: int = 600
+
+    # Vizinhos de cada livro para as recomendações (scripts/build_book_neighbors.py)
+    BOOK_NEIGHBORS_K: int = 50
+    # Pares de livros com menos usuários em comum que isso não viram vizinhos
+    BOOK_NEIGHBORS_MIN_COMMON_USERS: int = 2
+    BOOK_NEIGHBORS_WORKERS: int = 4
+    BOOK_NEIGHBORS_CHUNK_SIZE: int = 500
+
+    # Notificações em tempo real (SSE)
+    # "memory" para um único worker; "postgres" (LISTEN/NOTIFY) para vários
+    NOTIFICATION_BROKER_BACKEND: str = "memory"
+    NOTIFICATION_STREAM_HEARTBEAT_SECONDS: int = 15
+    NOTIFICATION_STREAM_QUEUE_SIZE: int = 100
+    # Resumos de notificações: período de agrupamento e autores guardados por resumo
+    NOTIFICATION_DIGEST_BUCKET_HOURS: int = 24
+    NOTIFICATION_DIGEST_RECENT_ACTORS: int = 3
+    # Notificações lidas mais antigas que isso são removidas por purge_notifications
+    NOTIFICATION_RETENTION_DAYS: int = 90
+
     # CORS settings
     CORS_ORIGINS: list = ["*"]
     
@@ -1,23 +1,52 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from back_end.models.base import get_db
-from back_end.schemas.book import Book as BookSchema
-from back_end.schemas.bookshelf import BookshelfEntry, BookshelfEntryUpdate, UserAverageRating
+from back_end.schemas.book import Book as BookSchema, BookSuggestion, BookRecommendation
+from back_end.schemas.bookshelf import (
+    BookshelfEntry,
+    BookshelfEntryUpdate,
+    UserAverageRating,
+    BookshelfBatchRequest,
+    BookshelfBatchResponse,
+    ReadingEventEntry,
+    MonthlyReadingSummary
+)
 from back_end.auth.auth import get_current_user
-from back_end.services.bookshelf_service import BookshelfService
+from back_end.services.bookshelf_service import (
+    BookshelfService,
+    DEFAULT_BOOKSHELF_PAGE_SIZE,
+    MAX_BOOKSHELF_PAGE_SIZE,
+    DEFAULT_SEARCH_PAGE_SIZE,
+    MAX_SEARCH_PAGE_SIZE
+)
+from back_end.services.pagination import NEXT_CURSOR_HEADER
+from back_end.services.reading_events import ReadingEventService, DEFAULT_HISTORY_PAGE_SIZE, MAX_HISTORY_PAGE_SIZE
+from back_end.services.book_autocomplete import MAX_SUGGESTIONS
+from back_end.services.book_recommendations import RecommendationService, DEFAULT_RECOMMENDATIONS, MAX_RECOMMENDATIONS
 
 router = APIRouter(prefix="/bookshelf", tags=["bookshelf"])
 
 @router.get("/", response_model=List[BookshelfEntry])
 async def get_bookshelf(
+    response: Response,
     status: Optional[str] = Query(None, pattern='^(to_read|reading|read)$'),
+    limit: int = Query(DEFAULT_BOOKSHELF_PAGE_SIZE, ge=1, le=MAX_BOOKSHELF_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = Query("recent", pattern='^(recent|title|rating|favorites)$'),
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    """
+    Estante do usuário paginada por cursor. O cursor da próxima página vem no
+    cabeçalho X-Next-Cursor (ausente na última página).
+    """
     bookshelf_service = BookshelfService(db)
-    return bookshelf_service.get_user_bookshelf(current_user["id"], status)
+    entries, next_cursor = bookshelf_service.get_user_bookshelf(current_user["id"], status, limit, cursor, sort)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return entries
 
 @router.post("/", response_model=BookshelfEntry, status_code=201)
 async def add_to_bookshelf(
@@ -28,6 +57,19 @@ async def add_to_bookshelf(
     bookshelf_service = BookshelfService(db)
     return bookshelf_service.add_to_bookshelf(current_user["id"], book_data)
 
+@router.post("/batch", response_model=BookshelfBatchResponse)
+async def apply_bookshelf_batch(
+    batch: BookshelfBatchRequest,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Aplica até MAX_BATCH_OPERATIONS operações add/update/remove em uma transação.
+    mode=atomic reverte tudo se alguma operação falhar; mode=best_effort aplica as válidas.
+    """
+    bookshelf_service = BookshelfService(db)
+    return bookshelf_service.apply_bookshelf_batch(current_user["id"], batch.operations, batch.mode)
+
 @router.patch("/{entry_id}", response_model=BookshelfEntry)
 async def update_bookshelf_entry(
     entry_id: int,
@@ -59,10 +101,35 @@ async def remove_from_bookshelf(
 @router.get("/search", response_model=List[BookSchema])
 async def search_books(
     query: str = Query(..., min_length=1),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(DEFAULT_SEARCH_PAGE_SIZE, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    bookshelf_service = BookshelfService(db)
+    return bookshelf_service.search_books(query, page, page_size)
+
+@router.get("/search/cache-stats")
+async def get_search_cache_stats(db: Session = Depends(get_db)):
+    """Contadores do cache de resultados de busca (acertos, falhas, descartes)"""
+    bookshelf_service = BookshelfService(db)
+    return bookshelf_service.get_search_cache_stats()
+
+@router.get("/autocomplete", response_model=List[BookSuggestion])
+async def autocomplete_books(
+    query: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=MAX_SUGGESTIONS),
+    db: Session = Depends(get_db)
+):
+    bookshelf_service = BookshelfService(db)
+    return bookshelf_service.autocomplete_books(query, limit)
+
+@router.get("/books/isbn/{isbn}", response_model=BookSchema)
+async def get_book_by_isbn(
+    isbn: str,
     db: Session = Depends(get_db)
 ):
     bookshelf_service = BookshelfService(db)
-    return bookshelf_service.search_books(query)
+    return bookshelf_service.get_book_by_isbn(isbn)
 
 @router.get("/books/{book_id}")
 async def get_book_details(
@@ -73,6 +140,45 @@ async def get_book_details(
     bookshelf_service = BookshelfService(db)
     return bookshelf_service.get_book_details(book_id, current_user["id"])
 
+@router.get("/history", response_model=List[ReadingEventEntry])
+async def get_reading_history(
+    response: Response,
+    book_id: Optional[int] = None,
+    limit: int = Query(DEFAULT_HISTORY_PAGE_SIZE, ge=1, le=MAX_HISTORY_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Histórico de leitura do usuário (eventos da estante), do mais recente ao mais antigo.
+    O cursor da próxima página vem no cabeçalho X-Next-Cursor.
+    """
+    events, next_cursor = ReadingEventService(db).get_history(current_user["id"], limit, cursor, book_id)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return events
+
+@router.get("/history/monthly", response_model=List[MonthlyReadingSummary])
+async def get_monthly_reading_summary(
+    months: int = Query(12, ge=1, le=60),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Quantidade de eventos de leitura de cada tipo por mês, nos últimos `months` meses."""
+    return ReadingEventService(db).get_monthly_summary(current_user["id"], months)
+
+@router.get("/recommendations", response_model=List[BookRecommendation])
+async def get_recommendations(
+    limit: int = Query(DEFAULT_RECOMMENDATIONS, ge=1, le=MAX_RECOMMENDATIONS),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Livros parecidos com os que o usuário avaliou ou favoritou, pelos vizinhos
+    pré-calculados (book_neighbors), excluindo os que já estão na estante.
+    """
+    return RecommendationService(db).recommend(current_user["id"], limit)
+
 @router.get("/average-rating", response_model=UserAverageRating)
 async def get_user_average_rating(
     current_user: dict = Depends(get_current_user),
@@ -1,57 +1,179 @@
-from fastapi import APIRouter, Depends, Query
+import asyncio
+import json
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Optional, List
 from ..models.base import get_db
 from ..models.user import User
-from ..schemas.user import UserResponse, UserSearchResponse, NotificationResponse, FollowResponse
+from ..schemas.user import (
+    UserResponse,
+    UserSearchResponse,
+    NotificationResponse,
+    FollowResponse,
+    FollowSuggestionResponse
+)
 from ..auth import get_current_user
-from ..services.user_service import UserService
+from ..services.user_service import (
+    UserService,
+    DEFAULT_FEED_PAGE_SIZE,
+    MAX_FEED_PAGE_SIZE,
+    DEFAULT_USER_LIST_PAGE_SIZE,
+    DEFAULT_USER_SEARCH_PAGE_SIZE,
+    DEFAULT_FOLLOW_SUGGESTIONS,
+    MAX_USER_LIST_PAGE_SIZE
+)
+from ..configs.settings import settings
+from ..services.notification_broker import get_notification_broker
+from ..services.notification_service import (
+    NotificationService,
+    DEFAULT_NOTIFICATION_PAGE_SIZE,
+    MAX_NOTIFICATION_PAGE_SIZE
+)
+from ..services.pagination import NEXT_CURSOR_HEADER
+from ..services.feed_cache import etag_matches, get_feed_cache_stats
+from ..services.feed_fragments import feed_fragments
+from ..services.social_graph import follow_suggestions_cache, social_graph
 from ..schemas.bookshelf import FeedEntry, FeedEntryDebug, FeedEntryRobust
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 # ROTAS FIXAS PRIMEIRO
 @router.get("/feed", response_model=List[FeedEntry])
-async def get_feed(current_user: dict = Depends(get_current_user), db: Session = Depends(get_db), limit: Optional[str] = Query("20")):
+async def get_feed(
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    limit: int = Query(DEFAULT_FEED_PAGE_SIZE, ge=1, le=MAX_FEED_PAGE_SIZE),
+    before: Optional[str] = Query(None, description="cursor <created_at>,<id> devolvido em X-Next-Cursor"),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Feed paginado por keyset. A resposta sai serializada do cache de páginas do feed,
+    sem a validação de response_model (que só documenta o formato). Com If-None-Match
+    igual ao ETag da página atual, responde 304 sem corpo.
+    """
     try:
-        limit_int = 20
-        try:
-            limit_int = int(limit) if limit and str(limit).isdigit() else 20
-        except Exception as e:
-            limit_int = 20
         user_service = UserService(db)
-        result = user_service.get_feed(current_user["id"], limit_int)
-        if not isinstance(result, list):
-            return []
-        validated_result = []
-        for entry in result:
-            try:
-                feed_entry = FeedEntry(**entry)
-                validated_result.append(feed_entry)
-            except Exception as e:
-                import traceback
-                traceback.print_exc()
-                continue
-        return validated_result
+        body, next_before, etag = user_service.get_feed_page(current_user["id"], limit, before)
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
-        return []
+        return Response(content=b"[]", media_type="application/json")
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if next_before:
+        headers[NEXT_CURSOR_HEADER] = next_before
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.get("/feed/cache-stats")
+async def get_feed_cache_stats_route(current_user: dict = Depends(get_current_user)):
+    """Contadores dos caches de páginas e de itens do feed (acertos, falhas, bytes poupados)"""
+    return {"pages": get_feed_cache_stats(), "fragments": feed_fragments.stats()}
 
 @router.get("/notifications", response_model=List[NotificationResponse])
-async def get_notifications(current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
-    user_service = UserService(db)
-    return user_service.get_notifications(current_user["id"])
+async def get_notifications(
+    response: Response,
+    limit: int = Query(DEFAULT_NOTIFICATION_PAGE_SIZE, ge=1, le=MAX_NOTIFICATION_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Notificações da mais recente à mais antiga; o cursor da próxima página vem em X-Next-Cursor."""
+    notifications, next_cursor = NotificationService(db).list(current_user["id"], limit, cursor)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return notifications
+
+@router.get("/notifications/unread-count")
+async def get_unread_notifications_count(current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Quantidade de notificações não lidas, lida do contador do usuário."""
+    return {"unread_count": NotificationService(db).unread_count(current_user["id"])}
+
+@router.get("/notifications/stream")
+async def stream_notifications(
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Server-Sent Events com as notificações do usuário em tempo real. Ao conectar envia o
+    total de não lidas (evento "unread"); depois, cada notificação criada (evento
+    "notification") e um comentário de heartbeat a cada NOTIFICATION_STREAM_HEARTBEAT_SECONDS.
+    """
+    user_id = current_user["id"]
+    unread_count = NotificationService(db).unread_count(user_id)
+    # A conexão com o banco volta ao pool: o stream só espera na fila do broker
+    db.close()
+    broker = get_notification_broker()
+    heartbeat = settings.NOTIFICATION_STREAM_HEARTBEAT_SECONDS
+
+    async def events():
+        queue = broker.subscribe(user_id)
+        try:
+            yield f"retry: 5000\nevent: unread\ndata: {json.dumps({'unread_count': unread_count})}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+        finally:
+            broker.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/notifications/stream/stats")
+async def get_notification_stream_stats(current_user: dict = Depends(get_current_user)):
+    """Conexões SSE abertas neste worker e notificações publicadas/descartadas"""
+    return get_notification_broker().stats()
+
+@router.post("/notifications/read")
+async def mark_notifications_read(
+    up_to_id: Optional[int] = Query(None, description="marca só as notificações com id até este (padrão: todas)"),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Marca como lidas as notificações não lidas do usuário com um único UPDATE."""
+    notification_service = NotificationService(db)
+    marked = notification_service.mark_read(current_user["id"], up_to_id)
+    db.commit()
+    return {"marked_read": marked, "unread_count": notification_service.unread_count(current_user["id"])}
 
 @router.get("/search", response_model=List[UserSearchResponse])
 async def search_users(
+    response: Response,
     query: str = Query(..., min_length=1),
+    limit: int = Query(DEFAULT_USER_SEARCH_PAGE_SIZE, ge=1, le=MAX_USER_LIST_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    """Resultados por relevância; o cursor da próxima página vem no cabeçalho X-Next-Cursor."""
     user_service = UserService(db)
-    result = user_service.search_users(query, current_user["id"])
-    return result
+    users, next_cursor = user_service.search_users(query, current_user["id"], limit, cursor)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return users
+
+@router.get("/suggestions", response_model=List[FollowSuggestionResponse])
+async def get_follow_suggestions(
+    limit: int = Query(DEFAULT_FOLLOW_SUGGESTIONS, ge=1, le=settings.FOLLOW_SUGGESTIONS_TOP_K),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Pessoas seguidas por quem você segue, ordenadas por conexões e livros em comum."""
+    user_service = UserService(db)
+    return user_service.get_follow_suggestions(current_user["id"], limit)
+
+@router.get("/suggestions/stats")
+async def get_follow_suggestions_stats(current_user: dict = Depends(get_current_user)):
+    return {"graph": social_graph.stats(), "cache": follow_suggestions_cache.stats()}
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
@@ -80,18 +202,34 @@ async def unfollow_user(
 @router.get("/{user_id}/followers", response_model=List[UserSearchResponse])
 async def get_user_followers(
     user_id: int,
+    response: Response,
+    limit: int = Query(DEFAULT_USER_LIST_PAGE_SIZE, ge=1, le=MAX_USER_LIST_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    """Página ordenada por id; o cursor da próxima página vem no cabeçalho X-Next-Cursor."""
     user_service = UserService(db)
-    return user_service.get_user_followers(user_id)
+    users, next_cursor = user_service.get_user_followers(user_id, limit, cursor, current_user["id"])
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return users
 
 @router.get("/{user_id}/following", response_model=List[UserSearchResponse])
 async def get_user_following(
     user_id: int,
+    response: Response,
+    limit: int = Query(DEFAULT_USER_LIST_PAGE_SIZE, ge=1, le=MAX_USER_LIST_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    """Página ordenada por id; o cursor da próxima página vem no cabeçalho X-Next-Cursor."""
     user_service = UserService(db)
-    return user_service.get_user_following(user_id)
+    users, next_cursor = user_service.get_user_following(user_id, limit, cursor, current_user["id"])
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return users
 
 @router.get("/{user_id}/follow-counts")
 async def get_user_follow_counts(
@@ -134,6 +272,6 @@ async def test_follow_counts(user_id: int, db: Session = Depends(get_db)):
         "user_id": user_id,
         "username": user.username,
         "follow_counts": follow_counts,
-        "raw_followers": len(user.followers),
-        "raw_following": len(user.following)
+        "raw_followers": user_service.follow_graph.count_followers([user_id])[user_id],
+        "raw_following": user_service.follow_graph.count_following([user_id])[user_id]
     } 
\ No newline at end of file
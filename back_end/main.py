@@ -1,9 +1,12 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from back_end.models.base import Base, engine
+from back_end.models.base import Base, engine, SessionLocal
 from back_end.routes import auth, bookshelf, users
 from back_end.routes import chatbot
+from back_end.services.outbox import outbox_worker
+from back_end.services.social_graph import social_graph
+import asyncio
 import os
 from datetime import datetime
 
@@ -38,6 +41,18 @@ app.include_router(bookshelf.router, prefix="/api")
 app.include_router(users.router, prefix="/api")
 app.include_router(chatbot.router, prefix="/api")
 
+@app.on_event("startup")
+async def start_outbox_worker():
+    await outbox_worker.start()
+
+@app.on_event("startup")
+async def load_social_graph():
+    await asyncio.to_thread(social_graph.ensure_fresh)
+
+@app.on_event("shutdown")
+async def stop_outbox_worker():
+    await outbox_worker.stop()
+
 @app.get("/")
 async def root():
     try:
@@ -64,4 +79,13 @@ async def health_check():
         raise HTTPException(
             status_code=500,
             detail=f"Erro na verificação de saúde: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@app.get("/health/outbox")
+async def outbox_health():
+    """Fila do outbox: pendentes, parados após esgotar as tentativas e atraso do mais antigo."""
+    db = SessionLocal()
+    try:
+        return outbox_worker.stats(db)
+    finally:
+        db.close()
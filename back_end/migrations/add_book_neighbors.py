@@ -0,0 +1,57 @@
+import sys
+import os
+
+# Caminho absoluto para a raiz do projeto (dois níveis acima)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from back_end.configs.settings import settings
+from sqlalchemy import create_engine, text
+
+def upgrade():
+    """
+    Cria book_neighbors (vizinhos de cada livro para as recomendações) e
+    book_interaction_changes (livros a recalcular). Depois, rode
+    scripts/build_book_neighbors.py --full para o cálculo inicial.
+    """
+    engine = create_engine(settings.DATABASE_URL)
+
+    with engine.connect() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS book_neighbors (
+                book_id INTEGER NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+                neighbor_id INTEGER NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+                score DOUBLE PRECISION NOT NULL,
+                common_users INTEGER NOT NULL,
+                PRIMARY KEY (book_id, neighbor_id)
+            )
+        """))
+        conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_book_neighbors_neighbor
+            ON book_neighbors (neighbor_id)
+        """))
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS book_interaction_changes (
+                book_id INTEGER PRIMARY KEY REFERENCES books(id) ON DELETE CASCADE,
+                changes INTEGER NOT NULL DEFAULT 1,
+                marked_at TIMESTAMP NOT NULL DEFAULT now()
+            )
+        """))
+        conn.commit()
+
+    print("Tabelas book_neighbors e book_interaction_changes criadas")
+
+def downgrade():
+    """Remove as tabelas das recomendações"""
+    engine = create_engine(settings.DATABASE_URL)
+
+    with engine.connect() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS book_interaction_changes"))
+        conn.execute(text("DROP TABLE IF EXISTS book_neighbors"))
+        conn.commit()
+
+    print("Tabelas book_neighbors e book_interaction_changes removidas")
+
+if __name__ == "__main__":
+    upgrade()
@@ -0,0 +1,59 @@
+import sys
+import os
+
+# Caminho absoluto para a raiz do projeto (dois níveis acima)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from back_end.configs.settings import settings
+from sqlalchemy import create_engine, text
+
+def upgrade():
+    """Adiciona rating_sum/rating_count à tabela books e preenche a partir das avaliações existentes"""
+    engine = create_engine(settings.DATABASE_URL)
+
+    with engine.connect() as conn:
+        conn.execute(text("""
+            ALTER TABLE books
+            ADD COLUMN IF NOT EXISTS rating_sum DOUBLE PRECISION NOT NULL DEFAULT 0
+        """))
+        conn.execute(text("""
+            ALTER TABLE books
+            ADD COLUMN IF NOT EXISTS rating_count INTEGER NOT NULL DEFAULT 0
+        """))
+
+        # Preenche os agregados com uma única passada agrupada sobre user_bookshelves
+        result = conn.execute(text("""
+            UPDATE books AS b
+            SET rating_sum = agg.rating_sum,
+                rating_count = agg.rating_count,
+                average_rating = ROUND(CAST(agg.rating_sum / agg.rating_count AS NUMERIC), 2)
+            FROM (
+                SELECT book_id, SUM(rating) AS rating_sum, COUNT(rating) AS rating_count
+                FROM user_bookshelves
+                WHERE rating IS NOT NULL AND rating > 0
+                GROUP BY book_id
+            ) AS agg
+            WHERE b.id = agg.book_id
+        """))
+        conn.commit()
+
+    print(f"Campos rating_sum/rating_count adicionados; {result.rowcount} livros preenchidos")
+
+def downgrade():
+    """Remove rating_sum/rating_count da tabela books"""
+    engine = create_engine(settings.DATABASE_URL)
+
+    with engine.connect() as conn:
+        conn.execute(text("""
+            ALTER TABLE books
+            DROP COLUMN IF EXISTS rating_sum,
+            DROP COLUMN IF EXISTS rating_count
+        """))
+        conn.commit()
+
+    print("Campos rating_sum/rating_count removidos da tabela books")
+
+if __name__ == "__main__":
+    upgrade()
@@ -0,0 +1,72 @@
+import sys
+import os
+
+# Caminho absoluto para a raiz do projeto (dois níveis acima)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from back_end.configs.settings import settings
+from sqlalchemy import create_engine, text
+
+def upgrade():
+    """
+    Cria a coluna books.search_vector (tsvector ponderado: name > subtitle > category > description)
+    com índice GIN, e um índice de trigramas em books.name para tolerância a erros de digitação.
+    """
+    engine = create_engine(settings.DATABASE_URL)
+
+    # CREATE INDEX CONCURRENTLY não pode rodar dentro de uma transação
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS unaccent"))
+
+        # Configuração de busca em português que ignora acentos ("memorias" encontra "Memórias")
+        conn.execute(text("""
+            DO $$
+            BEGIN
+                IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'pt_unaccent') THEN
+                    CREATE TEXT SEARCH CONFIGURATION public.pt_unaccent (COPY = pg_catalog.portuguese);
+                    ALTER TEXT SEARCH CONFIGURATION public.pt_unaccent
+                        ALTER MAPPING FOR hword, hword_part, word
+                        WITH unaccent, portuguese_stem;
+                END IF;
+            END $$;
+        """))
+
+        conn.execute(text("""
+            ALTER TABLE books
+            ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('public.pt_unaccent', coalesce(name, '')), 'A') ||
+                setweight(to_tsvector('public.pt_unaccent', coalesce(subtitle, '')), 'B') ||
+                setweight(to_tsvector('public.pt_unaccent', coalesce(category, '')), 'C') ||
+                setweight(to_tsvector('public.pt_unaccent', coalesce(description, '')), 'D')
+            ) STORED
+        """))
+        print("Coluna search_vector criada")
+
+        conn.execute(text("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_books_search_vector
+            ON books USING GIN (search_vector)
+        """))
+        conn.execute(text("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_books_name_trgm
+            ON books USING GIN (name gin_trgm_ops)
+        """))
+
+    print("Índices de busca de livros criados com sucesso")
+
+def downgrade():
+    """Remove os índices e a coluna de busca de livros"""
+    engine = create_engine(settings.DATABASE_URL)
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS ix_books_name_trgm"))
+        conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS ix_books_search_vector"))
+        conn.execute(text("ALTER TABLE books DROP COLUMN IF EXISTS search_vector"))
+
+    print("Índices de busca de livros removidos")
+
+if __name__ == "__main__":
+    upgrade()
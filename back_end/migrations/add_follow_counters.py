@@ -0,0 +1,41 @@
+import sys
+import os
+
+# Caminho absoluto para a raiz do projeto (dois níveis acima)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from back_end.configs.settings import settings
+from sqlalchemy import create_engine, text
+
+def upgrade():
+    """
+    Adiciona followers_count/following_count à tabela users. As colunas começam NULL
+    (a aplicação conta via COUNT(*) até o preenchimento por repair_follow_counters.py).
+    """
+    engine = create_engine(settings.DATABASE_URL)
+
+    with engine.connect() as conn:
+        conn.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS followers_count INTEGER"))
+        conn.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS following_count INTEGER"))
+        conn.commit()
+
+    print("Campos followers_count/following_count adicionados; rode repair_follow_counters.py para preenchê-los")
+
+def downgrade():
+    """Remove followers_count/following_count da tabela users"""
+    engine = create_engine(settings.DATABASE_URL)
+
+    with engine.connect() as conn:
+        conn.execute(text("""
+            ALTER TABLE users
+            DROP COLUMN IF EXISTS followers_count,
+            DROP COLUMN IF EXISTS following_count
+        """))
+        conn.commit()
+
+    print("Campos followers_count/following_count removidos da tabela users")
+
+if __name__ == "__main__":
+    upgrade()
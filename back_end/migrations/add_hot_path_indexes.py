@@ -0,0 +1,242 @@
+import argparse
+import os
+import sys
+from typing import Optional
+
+# Caminho absoluto para a raiz do projeto (dois níveis acima)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from back_end.configs.settings import settings
+from back_end.models.base import SessionLocal, engine
+from back_end.services.bookshelf_service import BookshelfService
+from back_end.services.notification_service import NotificationService
+from back_end.services.user_service import UserService
+from sqlalchemy import create_engine, event, text
+
+# (nome, DDL). Todos criados com CONCURRENTLY para não bloquear escritas nas tabelas.
+INDEXES = [
+    (
+        "ix_user_bookshelves_user_status",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_bookshelves_user_status "
+        "ON user_bookshelves (user_id, status)"
+    ),
+    (
+        "ix_user_bookshelves_user_updated",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_bookshelves_user_updated "
+        "ON user_bookshelves (user_id, updated_at DESC, id DESC)"
+    ),
+    (
+        "ix_user_bookshelves_book_rated",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_bookshelves_book_rated "
+        "ON user_bookshelves (book_id, rating) WHERE rating > 0"
+    ),
+    (
+        "ix_user_follows_following",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_follows_following "
+        "ON user_follows (following_id, follower_id)"
+    ),
+    (
+        "ix_notifications_user_created",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notifications_user_created "
+        "ON notifications (user_id, created_at DESC)"
+    ),
+]
+
+# Consultas quentes, executadas pelos próprios serviços em verify(): o SQL conferido é
+# o que o código envia hoje, não uma cópia escrita à mão. Cada uma recebe a sessão e os
+# ids de amostra do banco.
+HOT_QUERIES = [
+    (
+        "BookshelfService.get_user_bookshelf (status)",
+        lambda db, ids: BookshelfService(db).get_user_bookshelf(ids["shelf_user_id"], status="reading")
+    ),
+    (
+        "BookshelfService.get_book_details",
+        lambda db, ids: BookshelfService(db).get_book_details(ids["book_id"], ids["shelf_user_id"])
+    ),
+    (
+        "BookshelfService._aggregate_book_ratings",
+        lambda db, ids: BookshelfService(db)._aggregate_book_ratings(ids["book_id"])
+    ),
+    (
+        "UserService.get_feed",
+        lambda db, ids: UserService(db).get_feed(ids["feed_user_id"])
+    ),
+    (
+        "UserService.get_user_followers",
+        lambda db, ids: UserService(db).get_user_followers(ids["popular_user_id"])
+    ),
+    (
+        "NotificationService.list",
+        lambda db, ids: NotificationService(db).list(ids["notified_user_id"])
+    ),
+]
+
+# Tabelas lidas pelas consultas quentes, analisadas antes dos EXPLAIN
+HOT_TABLES = (
+    "user_bookshelves", "books", "users", "user_follows", "user_reading_stats",
+    "timeline_items", "reading_events", "notifications"
+)
+
+# Abaixo disso uma varredura sequencial é barata e o planejador a prefere com razão
+LARGE_TABLE_ROWS = 10000
+
+def upgrade():
+    """Cria os índices compostos/parciais das consultas quentes e a unicidade (user_id, book_id)"""
+    engine = create_engine(settings.DATABASE_URL)
+
+    # CREATE INDEX CONCURRENTLY não pode rodar dentro de uma transação
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        duplicates = conn.execute(text("""
+            SELECT user_id, book_id, COUNT(*)
+            FROM user_bookshelves
+            GROUP BY user_id, book_id
+            HAVING COUNT(*) > 1
+        """)).fetchall()
+        if duplicates:
+            for user_id, book_id, count in duplicates:
+                print(f"Usuário {user_id} tem o livro {book_id} {count} vezes na estante")
+            print("Remova as entradas duplicadas antes de criar a restrição única.")
+            return
+
+        # Um índice inválido sobra de um CONCURRENTLY interrompido; IF NOT EXISTS não o recria
+        invalid = conn.execute(text("""
+            SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE NOT i.indisvalid AND c.relname = ANY(:names)
+        """), {"names": [name for name, _ in INDEXES] + ["uq_user_bookshelves_user_book"]}).scalars().all()
+        for index_name in invalid:
+            print(f"Removendo índice inválido {index_name}")
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}"))
+
+        has_constraint = conn.execute(text("""
+            SELECT 1 FROM pg_constraint WHERE conname = 'uq_user_bookshelves_user_book'
+        """)).first()
+        if not has_constraint:
+            conn.execute(text("""
+                CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_user_bookshelves_user_book
+                ON user_bookshelves (user_id, book_id)
+            """))
+            conn.execute(text("""
+                ALTER TABLE user_bookshelves
+                ADD CONSTRAINT uq_user_bookshelves_user_book
+                UNIQUE USING INDEX uq_user_bookshelves_user_book
+            """))
+            print("Restrição única (user_id, book_id) criada")
+
+        for name, ddl in INDEXES:
+            conn.execute(text(ddl))
+            print(f"Índice {name} criado")
+
+        for table in ("user_bookshelves", "user_follows", "notifications"):
+            conn.execute(text(f"ANALYZE {table}"))
+
+    print("Migração concluída com sucesso!")
+
+def downgrade():
+    """Remove os índices e a restrição única criados por upgrade()"""
+    engine = create_engine(settings.DATABASE_URL)
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, _ in INDEXES:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        conn.execute(text("""
+            ALTER TABLE user_bookshelves DROP CONSTRAINT IF EXISTS uq_user_bookshelves_user_book
+        """))
+
+    print("Índices das consultas quentes removidos")
+
+def _sample_ids(conn) -> Optional[dict]:
+    """Ids reais para exercitar cada consulta: o feed de quem segue o usuário mais seguido, etc."""
+    shelf = conn.execute(text("SELECT user_id, book_id FROM user_bookshelves ORDER BY id LIMIT 1")).first()
+    if shelf is None:
+        return None
+    popular_user_id = conn.execute(text("SELECT id FROM users ORDER BY followers_count DESC NULLS LAST LIMIT 1")).scalar()
+    feed_user_id = conn.execute(
+        text("SELECT follower_id FROM user_follows WHERE following_id = :user_id LIMIT 1"),
+        {"user_id": popular_user_id}
+    ).scalar()
+    notified_user_id = conn.execute(text("SELECT user_id FROM notifications LIMIT 1")).scalar()
+    return {
+        "shelf_user_id": shelf.user_id,
+        "book_id": shelf.book_id,
+        "popular_user_id": popular_user_id,
+        "feed_user_id": feed_user_id or shelf.user_id,
+        "notified_user_id": notified_user_id or shelf.user_id
+    }
+
+def _plan_nodes(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+def verify() -> bool:
+    """
+    Roda cada consulta quente pelo serviço que a usa, captura o SQL enviado e confere o
+    EXPLAIN de cada comando com as estatísticas recém-atualizadas (ANALYZE). Falha se
+    algum plano fizer varredura sequencial de uma tabela com mais de LARGE_TABLE_ROWS
+    linhas. Só tem sentido num banco populado: com tabelas pequenas, recusa verificar.
+    """
+    db = SessionLocal()
+    all_ok = True
+    try:
+        conn = db.connection()
+        for table in HOT_TABLES:
+            conn.execute(text(f"ANALYZE {table}"))
+        rows = dict(conn.execute(
+            text("SELECT relname, reltuples::bigint FROM pg_class WHERE relname = ANY(:names) AND relkind = 'r'"),
+            {"names": list(HOT_TABLES)}
+        ).all())
+        if not any(count > LARGE_TABLE_ROWS for count in rows.values()):
+            print(f"Nenhuma tabela com mais de {LARGE_TABLE_ROWS} linhas; popule o banco antes de verificar os planos.")
+            return False
+        ids = _sample_ids(conn)
+        if ids is None:
+            print("Sem dados em user_bookshelves; popule o banco antes de verificar os planos.")
+            return False
+
+        for label, run in HOT_QUERIES:
+            statements = []
+
+            def capture(conn, cursor, statement, parameters, context, executemany):
+                if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+                    statements.append((statement, parameters))
+
+            event.listen(engine, "before_cursor_execute", capture)
+            try:
+                run(db, ids)
+            finally:
+                event.remove(engine, "before_cursor_execute", capture)
+
+            indexes, problems = set(), []
+            for statement, parameters in statements:
+                (plan,) = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+                for node in _plan_nodes(plan["Plan"]):
+                    if "Index Name" in node:
+                        indexes.add(node["Index Name"])
+                    relation = node.get("Relation Name")
+                    if node["Node Type"] == "Seq Scan" and rows.get(relation, 0) > LARGE_TABLE_ROWS:
+                        problems.append((relation, statement))
+
+            all_ok = all_ok and not problems
+            print(f"[{'OK' if not problems else 'FALHOU'}] {label}: {', '.join(sorted(indexes)) or 'sem índices'}")
+            for relation, statement in problems:
+                print(f"  varredura sequencial em {relation} ({rows[relation]} linhas):\n  {statement}")
+    finally:
+        db.rollback()
+        db.close()
+
+    return all_ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Índices das consultas quentes")
+    parser.add_argument("--verify", action="store_true", help="confere via EXPLAIN se as consultas quentes evitam varreduras sequenciais")
+    parser.add_argument("--downgrade", action="store_true", help="remove os índices")
+    args = parser.parse_args()
+    if args.verify:
+        sys.exit(0 if verify() else 1)
+    elif args.downgrade:
+        downgrade()
+    else:
+        upgrade()
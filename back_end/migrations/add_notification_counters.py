@@ -0,0 +1,45 @@
+import sys
+import os
+
+# Caminho absoluto para a raiz do projeto (dois níveis acima)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from back_end.configs.settings import settings
+from sqlalchemy import create_engine, text
+
+def upgrade():
+    """
+    Adiciona users.unread_notifications_count (NULL até repair_notification_counters.py
+    preenchê-lo) e o índice parcial das notificações não lidas.
+    """
+    engine = create_engine(settings.DATABASE_URL)
+
+    with engine.connect() as conn:
+        conn.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS unread_notifications_count INTEGER"))
+        # Linhas antigas sem valor contam como não lidas, como o default do modelo
+        conn.execute(text("UPDATE notifications SET is_read = false WHERE is_read IS NULL"))
+        conn.commit()
+
+    # CONCURRENTLY não roda dentro de transação
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notifications_user_unread "
+            "ON notifications (user_id, id) WHERE is_read = false"
+        ))
+
+    print("Contador de notificações não lidas adicionado; rode repair_notification_counters.py para preenchê-lo")
+
+def downgrade():
+    """Remove o contador e o índice parcial"""
+    engine = create_engine(settings.DATABASE_URL)
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS ix_notifications_user_unread"))
+        conn.execute(text("ALTER TABLE users DROP COLUMN IF EXISTS unread_notifications_count"))
+
+    print("Contador de notificações não lidas removido")
+
+if __name__ == "__main__":
+    upgrade()
@@ -0,0 +1,82 @@
+import sys
+import os
+
+# Caminho absoluto para a raiz do projeto (dois níveis acima)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from back_end.configs.settings import settings
+from sqlalchemy import create_engine, text
+
+# (nome, DDL). Criados com CONCURRENTLY para não bloquear as escritas em notifications.
+INDEXES = [
+    (
+        "ux_notifications_digest",
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ux_notifications_digest "
+        "ON notifications (user_id, type, bucket_start) WHERE is_read = false"
+    ),
+    (
+        "ix_notifications_read_created",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notifications_read_created "
+        "ON notifications (created_at) WHERE is_read = true"
+    ),
+]
+
+def upgrade():
+    """
+    Adiciona as colunas dos resumos de notificações (bucket_start, actor_count,
+    recent_actors), a tabela notification_actors (autores já contados em cada resumo) e
+    os índices do upsert e da retenção. Notificações existentes ficam como avulsas
+    (bucket_start NULL), fora do índice único.
+    """
+    engine = create_engine(settings.DATABASE_URL)
+
+    with engine.connect() as conn:
+        conn.execute(text("ALTER TABLE notifications ADD COLUMN IF NOT EXISTS bucket_start TIMESTAMP WITH TIME ZONE"))
+        conn.execute(text("ALTER TABLE notifications ADD COLUMN IF NOT EXISTS actor_count INTEGER NOT NULL DEFAULT 1"))
+        conn.execute(text("ALTER TABLE notifications ADD COLUMN IF NOT EXISTS recent_actors JSONB NOT NULL DEFAULT '[]'"))
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS notification_actors (
+                notification_id INTEGER NOT NULL REFERENCES notifications(id) ON DELETE CASCADE,
+                actor_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                PRIMARY KEY (notification_id, actor_id)
+            )
+        """))
+        # Resumos não lidos já existentes: os autores recentes são os únicos conhecidos
+        conn.execute(text("""
+            INSERT INTO notification_actors (notification_id, actor_id)
+            SELECT n.id, (actor->>'id')::integer
+            FROM notifications AS n, jsonb_array_elements(n.recent_actors) AS actor
+            WHERE n.is_read = false AND n.bucket_start IS NOT NULL
+            ON CONFLICT DO NOTHING
+        """))
+        conn.commit()
+
+    # CONCURRENTLY não roda dentro de transação
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, ddl in INDEXES:
+            conn.execute(text(ddl))
+            print(f"Índice {name} criado")
+
+    print("Colunas de resumo de notificações adicionadas")
+
+def downgrade():
+    """Remove os índices, a tabela notification_actors e as colunas dos resumos"""
+    engine = create_engine(settings.DATABASE_URL)
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, _ in INDEXES:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        conn.execute(text("DROP TABLE IF EXISTS notification_actors"))
+        conn.execute(text("""
+            ALTER TABLE notifications
+            DROP COLUMN IF EXISTS bucket_start,
+            DROP COLUMN IF EXISTS actor_count,
+            DROP COLUMN IF EXISTS recent_actors
+        """))
+
+    print("Colunas de resumo de notificações removidas")
+
+if __name__ == "__main__":
+    upgrade()
@@ -0,0 +1,57 @@
+import sys
+import os
+
+# Caminho absoluto para a raiz do projeto (dois níveis acima)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from back_end.configs.settings import settings
+from sqlalchemy import create_engine, text
+
+def upgrade():
+    """
+    Cria a tabela outbox_events (efeitos colaterais das escritas, drenados pelo
+    OutboxWorker). Pode rodar com a aplicação no ar: nada ainda grava nela.
+    """
+    engine = create_engine(settings.DATABASE_URL)
+
+    with engine.connect() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS outbox_events (
+                id BIGSERIAL PRIMARY KEY,
+                kind VARCHAR(64) NOT NULL,
+                payload JSONB NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+                available_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT
+            )
+        """))
+        conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_outbox_events_available
+            ON outbox_events (available_at, id)
+        """))
+        # Linhas apagadas a todo momento: autovacuum mais frequente que o padrão
+        conn.execute(text("""
+            ALTER TABLE outbox_events SET (
+                autovacuum_vacuum_scale_factor = 0.01,
+                autovacuum_vacuum_threshold = 1000
+            )
+        """))
+        conn.commit()
+
+    print("Tabela outbox_events criada")
+
+def downgrade():
+    """Remove a tabela outbox_events (eventos pendentes são perdidos)"""
+    engine = create_engine(settings.DATABASE_URL)
+
+    with engine.connect() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS outbox_events"))
+        conn.commit()
+
+    print("Tabela outbox_events removida")
+
+if __name__ == "__main__":
+    upgrade()
@@ -0,0 +1,158 @@
+import argparse
+import os
+import sys
+from datetime import date
+
+# Caminho absoluto para a raiz do projeto (dois níveis acima)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from back_end.configs.settings import settings
+from sqlalchemy import create_engine, text
+
+# Partições criadas à frente do mês atual; rode --ensure-partitions mensalmente (cron)
+DEFAULT_MONTHS_AHEAD = 3
+
+# Eventos reconstruídos do estado atual das estantes: não há como recuperar o histórico
+# real, então cada entrada gera added (created_at) e o estado atual (updated_at)
+BACKFILL_SQL = [
+    """
+    INSERT INTO reading_events
+        (user_id, book_id, entry_id, event_type, status, pages_read, total_pages, rating, is_favorite, created_at)
+    SELECT user_id, book_id, id, 'added', 'to_read', 0, total_pages, NULL, FALSE,
+           COALESCE(created_at, updated_at, CURRENT_TIMESTAMP)
+    FROM user_bookshelves
+    WHERE user_id IS NOT NULL AND book_id IS NOT NULL
+    """,
+    """
+    INSERT INTO reading_events
+        (user_id, book_id, entry_id, event_type, status, pages_read, total_pages, rating, is_favorite, created_at)
+    SELECT user_id, book_id, id,
+           CASE status WHEN 'reading' THEN 'started' ELSE 'finished' END,
+           status, COALESCE(pages_read, 0), total_pages, rating, COALESCE(is_favorite, FALSE),
+           COALESCE(updated_at, created_at, CURRENT_TIMESTAMP)
+    FROM user_bookshelves
+    WHERE user_id IS NOT NULL AND book_id IS NOT NULL AND status IN ('reading', 'read')
+    """,
+    """
+    INSERT INTO reading_events
+        (user_id, book_id, entry_id, event_type, status, pages_read, total_pages, rating, is_favorite, created_at)
+    SELECT user_id, book_id, id, 'rated', status, COALESCE(pages_read, 0), total_pages, rating,
+           COALESCE(is_favorite, FALSE), COALESCE(updated_at, created_at, CURRENT_TIMESTAMP)
+    FROM user_bookshelves
+    WHERE user_id IS NOT NULL AND book_id IS NOT NULL AND rating > 0
+    """,
+    """
+    INSERT INTO reading_events
+        (user_id, book_id, entry_id, event_type, status, pages_read, total_pages, rating, is_favorite, created_at)
+    SELECT user_id, book_id, id, 'favorited', status, COALESCE(pages_read, 0), total_pages, rating,
+           TRUE, COALESCE(updated_at, created_at, CURRENT_TIMESTAMP)
+    FROM user_bookshelves
+    WHERE user_id IS NOT NULL AND book_id IS NOT NULL AND is_favorite
+    """,
+]
+
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+def ensure_partitions(conn, first_month: date, months_ahead: int = DEFAULT_MONTHS_AHEAD) -> int:
+    """Cria as partições mensais de first_month até months_ahead meses depois do atual."""
+    last_month = _add_months(date.today().replace(day=1), months_ahead)
+    month = first_month.replace(day=1)
+    created = 0
+    while month <= last_month:
+        next_month = _add_months(month, 1)
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS reading_events_{month:%Y_%m}
+            PARTITION OF reading_events
+            FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')
+        """))
+        created += 1
+        month = next_month
+    return created
+
+def upgrade():
+    """
+    Cria reading_events particionada por mês em created_at, com índice (user_id, created_at),
+    preenche a partir das estantes e recria timeline_items apontando para os eventos.
+    """
+    engine = create_engine(settings.DATABASE_URL)
+
+    with engine.connect() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS reading_events (
+                id BIGSERIAL,
+                user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                book_id INTEGER NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+                entry_id INTEGER,
+                event_type VARCHAR(16) NOT NULL,
+                status VARCHAR NOT NULL,
+                pages_read INTEGER NOT NULL DEFAULT 0,
+                total_pages INTEGER,
+                rating DOUBLE PRECISION,
+                is_favorite BOOLEAN NOT NULL DEFAULT FALSE,
+                created_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+                PRIMARY KEY (id, created_at)
+            ) PARTITION BY RANGE (created_at)
+        """))
+        conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_reading_events_user_created
+            ON reading_events (user_id, created_at DESC, id DESC)
+        """))
+
+        oldest = conn.execute(text("SELECT MIN(COALESCE(created_at, updated_at)) FROM user_bookshelves")).scalar()
+        first_month = (oldest.date() if oldest else date.today()).replace(day=1)
+        created = ensure_partitions(conn, first_month)
+        # Rede de segurança para datas fora das partições; deve ficar vazia
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS reading_events_default PARTITION OF reading_events DEFAULT
+        """))
+        print(f"Tabela reading_events criada com {created} partições mensais")
+
+        already_filled = conn.execute(text("SELECT 1 FROM reading_events LIMIT 1")).first()
+        if not already_filled:
+            total = 0
+            for statement in BACKFILL_SQL:
+                total += conn.execute(text(statement)).rowcount
+            print(f"{total} eventos reconstruídos a partir das estantes")
+
+        # O feed passa a apontar para eventos; timeline_items é derivada e pode ser recriada
+        has_entry_column = conn.execute(text("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'timeline_items' AND column_name = 'entry_id'
+        """)).first()
+        if has_entry_column:
+            conn.execute(text("DROP TABLE timeline_items"))
+            print("timeline_items antiga (por entrada) removida")
+        conn.commit()
+
+    from back_end.migrations.add_timeline_items import upgrade as add_timeline_items
+    add_timeline_items()
+    print("Migração concluída; rode rebuild_timelines.py para preencher as timelines")
+
+def downgrade():
+    """Remove a tabela reading_events e todas as partições"""
+    engine = create_engine(settings.DATABASE_URL)
+
+    with engine.connect() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS reading_events CASCADE"))
+        conn.commit()
+
+    print("Tabela reading_events removida")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tabela de eventos de leitura particionada por mês")
+    parser.add_argument("--ensure-partitions", action="store_true",
+                        help="só cria as partições dos próximos meses (rodar mensalmente)")
+    parser.add_argument("--months-ahead", type=int, default=DEFAULT_MONTHS_AHEAD)
+    args = parser.parse_args()
+    if args.ensure_partitions:
+        engine = create_engine(settings.DATABASE_URL)
+        with engine.connect() as conn:
+            count = ensure_partitions(conn, date.today().replace(day=1), args.months_ahead)
+            conn.commit()
+        print(f"{count} partições verificadas")
+    else:
+        upgrade()
@@ -0,0 +1,49 @@
+import sys
+import os
+
+# Caminho absoluto para a raiz do projeto (dois níveis acima)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from back_end.configs.settings import settings
+from sqlalchemy import create_engine, text
+
+def upgrade():
+    """
+    Cria a tabela timeline_items (feed materializado por seguidor, apontando para
+    reading_events; ver add_reading_events).
+    Rode rebuild_timelines.py em seguida para preencher as timelines existentes.
+    """
+    engine = create_engine(settings.DATABASE_URL)
+
+    with engine.connect() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS timeline_items (
+                owner_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                event_id BIGINT NOT NULL,
+                author_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                created_at TIMESTAMP NOT NULL,
+                PRIMARY KEY (owner_id, event_id)
+            )
+        """))
+        conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_timeline_items_owner_created
+            ON timeline_items (owner_id, created_at DESC, event_id DESC)
+        """))
+        conn.commit()
+
+    print("Tabela timeline_items criada; rode rebuild_timelines.py para preenchê-la")
+
+def downgrade():
+    """Remove a tabela timeline_items"""
+    engine = create_engine(settings.DATABASE_URL)
+
+    with engine.connect() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS timeline_items"))
+        conn.commit()
+
+    print("Tabela timeline_items removida")
+
+if __name__ == "__main__":
+    upgrade()
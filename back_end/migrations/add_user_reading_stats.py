@@ -0,0 +1,64 @@
+import sys
+import os
+
+# Caminho absoluto para a raiz do projeto (dois níveis acima)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from back_end.configs.settings import settings
+from sqlalchemy import create_engine, text
+
+def upgrade():
+    """Cria a tabela user_reading_stats e preenche a partir de user_bookshelves"""
+    engine = create_engine(settings.DATABASE_URL)
+
+    with engine.connect() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS user_reading_stats (
+                user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+                total INTEGER NOT NULL DEFAULT 0,
+                to_read INTEGER NOT NULL DEFAULT 0,
+                reading INTEGER NOT NULL DEFAULT 0,
+                read INTEGER NOT NULL DEFAULT 0,
+                rated_count INTEGER NOT NULL DEFAULT 0,
+                rating_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+                favorites INTEGER NOT NULL DEFAULT 0,
+                pages_read INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+
+        result = conn.execute(text("""
+            INSERT INTO user_reading_stats
+                (user_id, total, to_read, reading, read, rated_count, rating_sum, favorites, pages_read)
+            SELECT user_id,
+                   COUNT(*),
+                   SUM(CASE WHEN status = 'to_read' THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN status = 'reading' THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN status = 'read' THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN status = 'read' AND rating > 0 THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN status = 'read' AND rating > 0 THEN rating ELSE 0 END),
+                   SUM(CASE WHEN is_favorite THEN 1 ELSE 0 END),
+                   COALESCE(SUM(pages_read), 0)
+            FROM user_bookshelves
+            WHERE user_id IS NOT NULL
+            GROUP BY user_id
+            ON CONFLICT (user_id) DO NOTHING
+        """))
+        conn.commit()
+
+    print(f"Tabela user_reading_stats criada; {result.rowcount} usuários preenchidos")
+
+def downgrade():
+    """Remove a tabela user_reading_stats"""
+    engine = create_engine(settings.DATABASE_URL)
+
+    with engine.connect() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS user_reading_stats"))
+        conn.commit()
+
+    print("Tabela user_reading_stats removida")
+
+if __name__ == "__main__":
+    upgrade()
@@ -0,0 +1,78 @@
+import sys
+import os
+
+# Caminho absoluto para a raiz do projeto (dois níveis acima)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from back_end.configs.settings import settings
+from sqlalchemy import create_engine, text
+
+# (nome, DDL) dos índices usados por PostgresUserSearchBackend
+INDEXES = [
+    (
+        "ix_users_username_trgm",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_username_trgm "
+        "ON users USING GIN (public.immutable_unaccent(lower(username)) gin_trgm_ops)"
+    ),
+    (
+        "ix_users_full_name_trgm",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_full_name_trgm "
+        "ON users USING GIN (public.immutable_unaccent(lower(coalesce(full_name, ''))) gin_trgm_ops)"
+    ),
+    # Termos de uma ou duas letras não geram trigramas: buscas por prefixo usam a btree
+    (
+        "ix_users_username_prefix",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_username_prefix "
+        "ON users (public.immutable_unaccent(lower(username)) text_pattern_ops)"
+    ),
+    (
+        "ix_users_full_name_prefix",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_full_name_prefix "
+        "ON users (public.immutable_unaccent(lower(coalesce(full_name, ''))) text_pattern_ops)"
+    ),
+]
+
+def upgrade():
+    """
+    Cria os índices de trigramas e de prefixo sobre username e full_name sem acentos,
+    usados pela busca de usuários.
+    """
+    engine = create_engine(settings.DATABASE_URL)
+
+    # CREATE INDEX CONCURRENTLY não pode rodar dentro de uma transação
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS unaccent"))
+
+        # unaccent() é STABLE e não pode ser usada em índices; este wrapper fixa o
+        # dicionário e pode ser declarado IMMUTABLE
+        conn.execute(text("""
+            CREATE OR REPLACE FUNCTION public.immutable_unaccent(text)
+            RETURNS text
+            LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+            AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+        """))
+
+        for name, ddl in INDEXES:
+            conn.execute(text(ddl))
+            print(f"Índice {name} criado")
+
+        conn.execute(text("ANALYZE users"))
+
+    print("Índices de busca de usuários criados com sucesso")
+
+def downgrade():
+    """Remove os índices de busca de usuários e a função auxiliar"""
+    engine = create_engine(settings.DATABASE_URL)
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, _ in INDEXES:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        conn.execute(text("DROP FUNCTION IF EXISTS public.immutable_unaccent(text)"))
+
+    print("Índices de busca de usuários removidos")
+
+if __name__ == "__main__":
+    upgrade()
@@ -0,0 +1,45 @@
+import sys
+import os
+
+# Caminho absoluto para a raiz do projeto (dois níveis acima)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from back_end.configs.settings import settings
+from sqlalchemy import create_engine, text
+
+def normalize_isbns():
+    """
+    Remove hífens/espaços dos ISBNs já gravados (e 'x' minúsculo vira 'X'),
+    para que as buscas exatas por isbn13/isbn10 usem os índices únicos.
+    """
+    engine = create_engine(settings.DATABASE_URL)
+
+    with engine.connect() as connection:
+        for column in ("isbn13", "isbn10"):
+            # Valores que colidiriam com outro livro depois de normalizados violam o índice único
+            duplicates = connection.execute(text(f"""
+                SELECT UPPER(REGEXP_REPLACE({column}, '[^0-9Xx]', '', 'g')) AS normalized, COUNT(*)
+                FROM books
+                WHERE {column} IS NOT NULL
+                GROUP BY 1
+                HAVING COUNT(*) > 1
+            """)).fetchall()
+            if duplicates:
+                for normalized, count in duplicates:
+                    print(f"{column} {normalized} aparece em {count} livros; corrija manualmente")
+                continue
+
+            result = connection.execute(text(f"""
+                UPDATE books
+                SET {column} = NULLIF(UPPER(REGEXP_REPLACE({column}, '[^0-9Xx]', '', 'g')), '')
+                WHERE {column} IS NOT NULL AND {column} !~ '^[0-9X]+$'
+            """))
+            print(f"{result.rowcount} valores de {column} normalizados")
+        connection.commit()
+
+if __name__ == "__main__":
+    print("Iniciando normalização de ISBNs...")
+    normalize_isbns()
+    print("Migração concluída!")
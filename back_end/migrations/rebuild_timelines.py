@@ -0,0 +1,88 @@
+import argparse
+import os
+import sys
+from sqlalchemy import create_engine, text
+
+# Adiciona o diretório raiz do projeto ao sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from back_end.configs.settings import settings
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# Timelines de um intervalo de donos: os TIMELINE_MAX_ITEMS eventos mais recentes dos
+# autores seguidos, exceto os muito seguidos (lidos na hora pelo feed)
+REBUILD_CHUNK_SQL = text("""
+    INSERT INTO timeline_items (owner_id, author_id, event_id, created_at)
+    SELECT owner_id, author_id, event_id, created_at
+    FROM (
+        SELECT f.follower_id AS owner_id,
+               e.user_id AS author_id,
+               e.id AS event_id,
+               e.created_at,
+               ROW_NUMBER() OVER (
+                   PARTITION BY f.follower_id
+                   ORDER BY e.created_at DESC, e.id DESC
+               ) AS position
+        FROM user_follows AS f
+        JOIN users AS a ON a.id = f.following_id
+        JOIN reading_events AS e ON e.user_id = f.following_id
+        WHERE f.follower_id > :lower_id AND f.follower_id <= :upper_id
+          AND (a.followers_count IS NULL OR a.followers_count <= :max_followers)
+    ) AS ranked
+    WHERE position <= :max_items
+    ON CONFLICT (owner_id, event_id) DO NOTHING
+""")
+
+NEXT_CHUNK_UPPER_SQL = text("""
+    SELECT MAX(id) FROM (
+        SELECT id FROM users
+        WHERE id > :lower_id
+        ORDER BY id
+        LIMIT :chunk_size
+    ) AS chunk
+""")
+
+def rebuild_timelines(chunk_size: int = DEFAULT_CHUNK_SIZE, start_after: int = 0) -> int:
+    """
+    Preenche timeline_items em lotes de donos ordenados por id, com commit por lote.
+    Pode ser retomado com --start-after. Retorna os itens gravados.
+    """
+    engine = create_engine(settings.DATABASE_URL)
+    last_id = start_after
+    total_items = 0
+
+    with engine.connect() as conn:
+        while True:
+            upper_id = conn.execute(
+                NEXT_CHUNK_UPPER_SQL,
+                {"lower_id": last_id, "chunk_size": chunk_size}
+            ).scalar()
+            if upper_id is None:
+                break
+            try:
+                result = conn.execute(REBUILD_CHUNK_SQL, {
+                    "lower_id": last_id,
+                    "upper_id": upper_id,
+                    "max_items": settings.TIMELINE_MAX_ITEMS,
+                    "max_followers": settings.TIMELINE_FANOUT_MAX_FOLLOWERS
+                })
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro no lote ({last_id}, {upper_id}]: {e}")
+                print(f"Para retomar: --start-after {last_id}")
+                raise
+            total_items += result.rowcount
+            last_id = upper_id
+            print(f"Timelines até o usuário {last_id} preenchidas ({total_items} itens)")
+
+    print(f"Timelines reconstruídas: {total_items} itens gravados.")
+    return total_items
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preenche timeline_items a partir de reading_events")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="donos de timeline por lote/commit")
+    parser.add_argument("--start-after", type=int, default=0, help="retoma a partir deste id de usuário")
+    args = parser.parse_args()
+    rebuild_timelines(chunk_size=args.chunk_size, start_after=args.start_after)
@@ -0,0 +1,46 @@
+import argparse
+import os
+import sys
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Adiciona o diretório raiz do projeto ao sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from back_end.configs.settings import settings
+from back_end.models.user import User  # Importação extra para resolver dependência
+from back_end.models.bookshelf import UserBookshelf
+from back_end.services.reading_stats_service import ReadingStatsService
+
+def rebuild(fix: bool = False) -> int:
+    """
+    Confere user_reading_stats contra as estatísticas recalculadas da estante.
+    Com fix=True, reconstrói as linhas divergentes. Retorna a quantidade de usuários divergentes.
+    """
+    engine = create_engine(settings.DATABASE_URL)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    try:
+        report = ReadingStatsService(session).reconcile(fix=fix)
+        for mismatch in report["mismatches"]:
+            print(f"Usuário {mismatch['user_id']}: {mismatch['stored']} -> {mismatch['expected']}")
+        if not report["mismatched_users"]:
+            print("Estatísticas de leitura consistentes.")
+        elif fix:
+            print(f"{report['mismatched_users']} usuários reconstruídos.")
+        else:
+            print(f"{report['mismatched_users']} usuários divergentes (use --fix para reconstruir).")
+        return report["mismatched_users"]
+    except Exception as e:
+        print(f"Erro ao verificar estatísticas de leitura: {e}")
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verifica/reconstrói a tabela user_reading_stats")
+    parser.add_argument("--fix", action="store_true", help="reconstrói as linhas divergentes")
+    args = parser.parse_args()
+    mismatched = rebuild(fix=args.fix)
+    sys.exit(1 if mismatched and not args.fix else 0)
@@ -0,0 +1,50 @@
+import argparse
+import os
+import sys
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Adiciona o diretório raiz do projeto ao sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from back_end.configs.settings import settings
+from back_end.models.bookshelf import Book, UserBookshelf
+from back_end.models.user import User  # Importação extra para resolver dependência
+from back_end.services.bookshelf_service import BookshelfService
+
+def reconcile(fix: bool = False) -> int:
+    """
+    Confere os agregados rating_sum/rating_count dos livros contra as avaliações
+    reais em user_bookshelves. Retorna a quantidade de livros divergentes.
+    """
+    engine = create_engine(settings.DATABASE_URL)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    try:
+        report = BookshelfService(session).reconcile_book_rating_aggregates(fix=fix)
+        for mismatch in report["mismatches"]:
+            print(
+                f"Livro {mismatch['book_id']}: "
+                f"soma {mismatch['stored_sum']} -> {mismatch['expected_sum']}, "
+                f"contagem {mismatch['stored_count']} -> {mismatch['expected_count']}"
+            )
+        if not report["mismatched_books"]:
+            print("Agregados de avaliação consistentes.")
+        elif fix:
+            print(f"{report['mismatched_books']} livros corrigidos.")
+        else:
+            print(f"{report['mismatched_books']} livros divergentes (use --fix para corrigir).")
+        return report["mismatched_books"]
+    except Exception as e:
+        print(f"Erro ao reconciliar agregados: {e}")
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcilia os agregados de avaliação dos livros")
+    parser.add_argument("--fix", action="store_true", help="corrige os livros divergentes")
+    args = parser.parse_args()
+    mismatched = reconcile(fix=args.fix)
+    sys.exit(1 if mismatched and not args.fix else 0)
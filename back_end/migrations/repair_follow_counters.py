@@ -0,0 +1,77 @@
+import argparse
+import os
+import sys
+from sqlalchemy import create_engine, text
+
+# Adiciona o diretório raiz do projeto ao sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from back_end.configs.settings import settings
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# Recalcula os contadores de um intervalo de usuários a partir de user_follows,
+# reescrevendo só as linhas divergentes (ou ainda NULL)
+REPAIR_CHUNK_SQL = text("""
+    UPDATE users AS u
+    SET followers_count = counts.followers_count,
+        following_count = counts.following_count
+    FROM (
+        SELECT us.id AS user_id,
+               (SELECT COUNT(*) FROM user_follows f WHERE f.following_id = us.id) AS followers_count,
+               (SELECT COUNT(*) FROM user_follows f WHERE f.follower_id = us.id) AS following_count
+        FROM users AS us
+        WHERE us.id > :lower_id AND us.id <= :upper_id
+    ) AS counts
+    WHERE u.id = counts.user_id
+      AND (u.followers_count IS DISTINCT FROM counts.followers_count
+           OR u.following_count IS DISTINCT FROM counts.following_count)
+""")
+
+NEXT_CHUNK_UPPER_SQL = text("""
+    SELECT MAX(id) FROM (
+        SELECT id FROM users
+        WHERE id > :lower_id
+        ORDER BY id
+        LIMIT :chunk_size
+    ) AS chunk
+""")
+
+def repair_follow_counters(chunk_size: int = DEFAULT_CHUNK_SIZE, start_after: int = 0) -> int:
+    """
+    Preenche/corrige followers_count e following_count em lotes ordenados por id,
+    com commit por lote. Pode ser retomado com --start-after. Retorna os usuários alterados.
+    """
+    engine = create_engine(settings.DATABASE_URL)
+    last_id = start_after
+    total_changed = 0
+
+    with engine.connect() as conn:
+        while True:
+            upper_id = conn.execute(
+                NEXT_CHUNK_UPPER_SQL,
+                {"lower_id": last_id, "chunk_size": chunk_size}
+            ).scalar()
+            if upper_id is None:
+                break
+            try:
+                result = conn.execute(REPAIR_CHUNK_SQL, {"lower_id": last_id, "upper_id": upper_id})
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro no lote ({last_id}, {upper_id}]: {e}")
+                print(f"Para retomar: --start-after {last_id}")
+                raise
+            total_changed += result.rowcount
+            last_id = upper_id
+            print(f"Usuários até o id {last_id} verificados ({total_changed} corrigidos)")
+
+    print(f"Contadores de seguidores reparados: {total_changed} usuários alterados.")
+    return total_changed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preenche/repara os contadores de seguidores")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="usuários por lote/commit")
+    parser.add_argument("--start-after", type=int, default=0, help="retoma a partir deste id de usuário")
+    args = parser.parse_args()
+    repair_follow_counters(chunk_size=args.chunk_size, start_after=args.start_after)
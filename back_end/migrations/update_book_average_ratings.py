@@ -1,41 +1,124 @@
+import argparse
 import os
 import sys
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import time
+from sqlalchemy import create_engine, text
 
 # Adiciona o diretório raiz do projeto ao sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 from back_end.configs.settings import settings
-from back_end.models.bookshelf import Book, UserBookshelf
-from back_end.models.user import User  # Importação extra para resolver dependência
 
-def update_all_books_average_rating():
+DEFAULT_CHUNK_SIZE = 5000
+
+# Recalcula os agregados de um intervalo de ids com um único agregado agrupado
+# aplicado via UPDATE ... FROM. Só reescreve as linhas que de fato mudaram. Livros com
+# variações rating.delta ainda no outbox ficam de fora: as avaliações já estão na estante
+# e seriam somadas de novo quando o worker aplicasse as variações.
+UPDATE_CHUNK_SQL = text("""
+    UPDATE books AS b
+    SET rating_sum = agg.rating_sum,
+        rating_count = agg.rating_count,
+        average_rating = agg.average_rating
+    FROM (
+        SELECT bk.id AS book_id,
+               COALESCE(SUM(ub.rating), 0) AS rating_sum,
+               COUNT(ub.rating) AS rating_count,
+               COALESCE(ROUND(CAST(AVG(ub.rating) AS NUMERIC), 2), 0) AS average_rating
+        FROM books AS bk
+        LEFT JOIN user_bookshelves AS ub
+               ON ub.book_id = bk.id AND ub.rating IS NOT NULL AND ub.rating > 0
+        WHERE bk.id > :lower_id AND bk.id <= :upper_id
+        GROUP BY bk.id
+    ) AS agg
+    WHERE b.id = agg.book_id
+      AND NOT EXISTS (
+          SELECT 1 FROM outbox_events AS oe
+          WHERE oe.kind = 'rating.delta'
+            AND CAST(oe.payload->>'book_id' AS INTEGER) = b.id
+      )
+      AND (b.rating_count IS DISTINCT FROM agg.rating_count
+           OR b.rating_sum IS DISTINCT FROM agg.rating_sum
+           OR b.average_rating IS DISTINCT FROM agg.average_rating)
+""")
+
+# Limite superior do próximo lote, em ordem de id (paginação por keyset)
+NEXT_CHUNK_UPPER_SQL = text("""
+    SELECT MAX(id) FROM (
+        SELECT id FROM books
+        WHERE id > :lower_id
+        ORDER BY id
+        LIMIT :chunk_size
+    ) AS chunk
+""")
+
+# Livros ignorados por ainda terem variações no outbox
+PENDING_BOOKS_SQL = text("""
+    SELECT COUNT(DISTINCT CAST(payload->>'book_id' AS INTEGER))
+    FROM outbox_events
+    WHERE kind = 'rating.delta'
+""")
+
+def update_all_books_average_rating(chunk_size: int = DEFAULT_CHUNK_SIZE, start_after: int = 0) -> int:
+    """
+    Recalcula average_rating/rating_sum/rating_count de todos os livros em lotes
+    ordenados por id, com commit ao fim de cada lote. Em caso de falha, basta
+    rodar novamente com --start-after <último id processado>.
+    Retorna a quantidade de livros alterados.
+    """
     engine = create_engine(settings.DATABASE_URL)
-    Session = sessionmaker(bind=engine)
-    session = Session()
-    try:
-        books = session.query(Book).all()
-        for book in books:
-            ratings = session.query(UserBookshelf.rating).filter(
-                UserBookshelf.book_id == book.id,
-                UserBookshelf.rating.isnot(None),
-                UserBookshelf.rating > 0
-            ).all()
-            if ratings:
-                avg = round(sum(r[0] for r in ratings) / len(ratings), 2)
-            else:
-                avg = 0.0
-            if book.average_rating != avg:
-                print(f"Atualizando livro {book.id} - '{book.name}': {book.average_rating} -> {avg}")
-                book.average_rating = avg
-        session.commit()
-        print("Médias corrigidas com sucesso!")
-    except Exception as e:
-        print(f"Erro ao atualizar médias: {e}")
-        session.rollback()
-    finally:
-        session.close()
+    last_id = start_after
+    total_changed = 0
+    total_books = 0
+    started = time.monotonic()
+
+    with engine.connect() as conn:
+        remaining = conn.execute(
+            text("SELECT COUNT(*) FROM books WHERE id > :lower_id"),
+            {"lower_id": last_id}
+        ).scalar()
+        print(f"Recalculando médias de {remaining} livros a partir do id {last_id} (lotes de {chunk_size})")
+
+        while True:
+            upper_id = conn.execute(
+                NEXT_CHUNK_UPPER_SQL,
+                {"lower_id": last_id, "chunk_size": chunk_size}
+            ).scalar()
+            if upper_id is None:
+                break
+
+            try:
+                result = conn.execute(UPDATE_CHUNK_SQL, {"lower_id": last_id, "upper_id": upper_id})
+                chunk_books = conn.execute(
+                    text("SELECT COUNT(*) FROM books WHERE id > :lower_id AND id <= :upper_id"),
+                    {"lower_id": last_id, "upper_id": upper_id}
+                ).scalar()
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro no lote ({last_id}, {upper_id}]: {e}")
+                print(f"Para retomar: --start-after {last_id}")
+                raise
+
+            total_changed += result.rowcount
+            total_books += chunk_books
+            last_id = upper_id
+            elapsed = time.monotonic() - started
+            print(
+                f"Processados {total_books}/{remaining} livros "
+                f"(último id {last_id}, {total_changed} alterados, {elapsed:.1f}s)"
+            )
+
+    with engine.connect() as conn:
+        pending = conn.execute(PENDING_BOOKS_SQL).scalar()
+    print(f"Médias corrigidas com sucesso! {total_changed} livros alterados de {total_books} processados.")
+    if pending:
+        print(f"{pending} livros com variações pendentes no outbox foram ignorados; rode de novo após o worker aplicá-las.")
+    return total_changed
 
 if __name__ == "__main__":
-    update_all_books_average_rating() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Recalcula as médias de avaliação dos livros em lotes")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="livros por lote/commit")
+    parser.add_argument("--start-after", type=int, default=0, help="retoma a partir deste id de livro")
+    args = parser.parse_args()
+    update_all_books_average_rating(chunk_size=args.chunk_size, start_after=args.start_after)
@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime, Index, func
+from back_end.models.base import Base
+
+class BookNeighbor(Base):
+    """
+    Vizinhos mais parecidos de cada livro pela similaridade de cosseno entre as colunas
+    da matriz usuário × livro das estantes (ver services/book_similarity.py). Calculados
+    pelo job scripts/build_book_neighbors.py; as recomendações só leem esta tabela.
+    """
+    __tablename__ = 'book_neighbors'
+    __table_args__ = (
+        # Livros que têm um livro recalculado entre os vizinhos (recálculo incremental)
+        Index('ix_book_neighbors_neighbor', 'neighbor_id'),
+    )
+
+    book_id = Column(Integer, ForeignKey('books.id', ondelete='CASCADE'), primary_key=True)
+    neighbor_id = Column(Integer, ForeignKey('books.id', ondelete='CASCADE'), primary_key=True)
+    score = Column(Float, nullable=False)
+    # Usuários que interagiram com os dois livros
+    common_users = Column(Integer, nullable=False)
+
+class BookInteractionChange(Base):
+    """
+    Livros cujas interações (status, avaliação ou favorito em alguma estante) mudaram
+    desde o último cálculo dos vizinhos. Gravado na transação da escrita na estante e
+    consumido pelo job incremental.
+    """
+    __tablename__ = 'book_interaction_changes'
+
+    book_id = Column(Integer, ForeignKey('books.id', ondelete='CASCADE'), primary_key=True)
+    # Incrementado a cada nova mudança: o job só apaga a marca se ela não mudou desde a leitura
+    changes = Column(Integer, nullable=False, default=1, server_default="1")
+    marked_at = Column(DateTime, nullable=False, server_default=func.now())
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text, Boolean, Index, UniqueConstraint, text
+from sqlalchemy.orm import relationship, validates
 from datetime import datetime
 from back_end.models.base import Base
+from back_end.services.isbn import clean_isbn
 
 class Book(Base):
     __tablename__ = 'books'
@@ -17,13 +18,32 @@ class Book(Base):
     publication_year = Column(Integer, nullable=True)
     num_pages = Column(Integer, nullable=True)
     average_rating = Column(Float, default=0.0)
+    # Agregados mantidos incrementalmente a cada avaliação (ver BookshelfService)
+    rating_sum = Column(Float, nullable=False, default=0.0, server_default="0")
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     bookshelves = relationship("UserBookshelf", back_populates="book")
 
+    @validates("isbn13", "isbn10")
+    def normalize_isbn(self, key, value):
+        # Armazena ISBNs sem hífens/espaços para que as buscas exatas nos índices únicos não falhem
+        return clean_isbn(value)
+
 class UserBookshelf(Base):
     __tablename__ = "user_bookshelves"
+    # Índices das consultas quentes (ver migrations/add_hot_path_indexes.py)
+    __table_args__ = (
+        UniqueConstraint("user_id", "book_id", name="uq_user_bookshelves_user_book"),
+        Index("ix_user_bookshelves_user_status", "user_id", "status"),
+        Index("ix_user_bookshelves_user_updated", "user_id", text("updated_at DESC"), text("id DESC")),
+        Index(
+            "ix_user_bookshelves_book_rated", "book_id", "rating",
+            postgresql_where=text("rating > 0"),
+            sqlite_where=text("rating > 0")
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
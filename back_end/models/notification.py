@@ -1,10 +1,35 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Index, JSON, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from back_end.models.base import Base
 
 class Notification(Base):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        Index('ix_notifications_user_created', 'user_id', text('created_at DESC')),
+        # Não lidas: contagem de reparo e marcação em massa como lidas
+        Index(
+            'ix_notifications_user_unread', 'user_id', 'id',
+            postgresql_where=text("is_read = false"),
+            sqlite_where=text("is_read = 0")
+        ),
+        # Alvo do upsert dos resumos: um resumo não lido por (destinatário, tipo, período)
+        Index(
+            'ux_notifications_digest', 'user_id', 'type', 'bucket_start',
+            unique=True,
+            postgresql_where=text("is_read = false"),
+            sqlite_where=text("is_read = 0")
+        ),
+        # Retenção: lidas mais antigas que NOTIFICATION_RETENTION_DAYS
+        Index(
+            'ix_notifications_read_created', 'created_at',
+            postgresql_where=text("is_read = true"),
+            sqlite_where=text("is_read = 1")
+        ),
+    )
+    # created_at volta no próprio INSERT (RETURNING): a notificação é publicada sem nova consulta
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id'))  # Usuário que receberá a notificação
@@ -12,5 +37,23 @@ class Notification(Base):
     message = Column(String)
     is_read = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Resumos (NotificationService.notify): início do período agrupado, total de autores
+    # e os mais recentes ([{"id", "username"}], do mais antigo ao mais novo).
+    # Notificações avulsas têm bucket_start NULL, actor_count 1 e recent_actors vazio.
+    bucket_start = Column(DateTime(timezone=True), nullable=True)
+    actor_count = Column(Integer, nullable=False, default=1, server_default=text("1"))
+    recent_actors = Column(
+        JSON().with_variant(JSONB, "postgresql"), nullable=False, default=list, server_default=text("'[]'")
+    )
 
-    user = relationship('User', back_populates='notifications') 
\ No newline at end of file
+    user = relationship('User', back_populates='notifications')
+
+class NotificationActor(Base):
+    """
+    Autores já contados em cada resumo: quem segue, deixa de seguir e segue de novo no
+    mesmo período não é contado duas vezes em actor_count.
+    """
+    __tablename__ = 'notification_actors'
+
+    notification_id = Column(Integer, ForeignKey('notifications.id', ondelete='CASCADE'), primary_key=True)
+    actor_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text, JSON, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
+from datetime import datetime
+from back_end.models.base import Base
+
+class OutboxEvent(Base):
+    """
+    Efeito colateral de uma escrita, gravado na mesma transação dela (services/outbox.py)
+    e executado depois pelo OutboxWorker. A linha é apagada na transação que aplica o
+    efeito; enquanto falha, attempts e available_at controlam as novas tentativas.
+    """
+    __tablename__ = 'outbox_events'
+    __table_args__ = (
+        # Próximos eventos prontos, na ordem em que foram gravados
+        Index('ix_outbox_events_available', 'available_at', 'id'),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    kind = Column(String(64), nullable=False)
+    payload = Column(JSON().with_variant(JSONB, "postgresql"), nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    available_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Boolean, DateTime, ForeignKey, Index, text
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from back_end.models.base import Base
+
+class ReadingEvent(Base):
+    """
+    Registro imutável (só INSERT) de cada mudança na estante: added, started, progress,
+    finished, rated ou favorited, um por escrita (o mais significativo, ver
+    services/reading_events.py). Guarda o estado da entrada no momento do evento, para
+    que feed e histórico não dependam do estado atual (mutável) de user_bookshelves.
+
+    No Postgres a tabela é particionada por mês em created_at (migração
+    add_reading_events), com chave primária (id, created_at); id vem de uma sequência
+    e é único sozinho, por isso é a chave do mapeamento.
+    """
+    __tablename__ = 'reading_events'
+    __table_args__ = (
+        Index('ix_reading_events_user_created', 'user_id', text('created_at DESC'), text('id DESC')),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    book_id = Column(Integer, ForeignKey('books.id', ondelete='CASCADE'), nullable=False)
+    # Sem chave estrangeira: o evento sobrevive à remoção da entrada
+    entry_id = Column(Integer, nullable=True)
+    event_type = Column(String(16), nullable=False)
+    # Estado da entrada depois da mudança
+    status = Column(String, nullable=False)
+    pages_read = Column(Integer, nullable=False, default=0)
+    total_pages = Column(Integer, nullable=True)
+    rating = Column(Float, nullable=True)
+    is_favorite = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    book = relationship("Book")
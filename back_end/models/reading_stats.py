@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime
+from datetime import datetime
+from back_end.models.base import Base
+
+class UserReadingStats(Base):
+    """
+    Estatísticas de leitura por usuário, mantidas pelas escritas na estante
+    (ver ReadingStatsService) para que perfis e listas leiam uma linha pela chave primária.
+    """
+    __tablename__ = 'user_reading_stats'
+
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    total = Column(Integer, nullable=False, default=0, server_default="0")
+    to_read = Column(Integer, nullable=False, default=0, server_default="0")
+    reading = Column(Integer, nullable=False, default=0, server_default="0")
+    read = Column(Integer, nullable=False, default=0, server_default="0")
+    # Livros lidos com avaliação (status 'read' e rating > 0), base da média do usuário
+    rated_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_sum = Column(Float, nullable=False, default=0.0, server_default="0")
+    favorites = Column(Integer, nullable=False, default=0, server_default="0")
+    pages_read = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
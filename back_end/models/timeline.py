@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, BigInteger, ForeignKey, DateTime, Index, text
+from back_end.models.base import Base
+
+class TimelineItem(Base):
+    """
+    Feed materializado: uma linha por seguidor para cada evento de leitura (reading_events)
+    de quem ele segue (ver TimelineService). O feed de um usuário é uma varredura de
+    (owner_id, created_at DESC) em vez de juntar a estante de todos os seguidos.
+    """
+    __tablename__ = 'timeline_items'
+    __table_args__ = (
+        Index('ix_timeline_items_owner_created', 'owner_id', text('created_at DESC'), text('event_id DESC')),
+    )
+
+    owner_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    # Sem chave estrangeira: reading_events é particionada e tem chave (id, created_at)
+    event_id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=False)
+    author_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    # Momento do evento, não da inserção na timeline
+    created_at = Column(DateTime, nullable=False)
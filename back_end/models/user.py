@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Table, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -9,7 +9,9 @@ user_follows = Table(
     'user_follows',
     Base.metadata,
     Column('follower_id', Integer, ForeignKey('users.id'), primary_key=True),
-    Column('following_id', Integer, ForeignKey('users.id'), primary_key=True)
+    Column('following_id', Integer, ForeignKey('users.id'), primary_key=True),
+    # A chave primária começa por follower_id; buscas de seguidores precisam do inverso
+    Index('ix_user_follows_following', 'following_id', 'follower_id')
 )
 
 class User(Base):
@@ -24,6 +26,13 @@ class User(Base):
     disabled = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Contadores mantidos por follow/unfollow. NULL = ainda não preenchido pelo
+    # repair_follow_counters; nesse caso a contagem vem de COUNT(*) em user_follows.
+    followers_count = Column(Integer, nullable=True, default=0)
+    following_count = Column(Integer, nullable=True, default=0)
+    # Notificações não lidas, mantido por NotificationService na criação e na leitura.
+    # NULL = ainda não preenchido por repair_notification_counters (conta-se na hora).
+    unread_notifications_count = Column(Integer, nullable=True, default=0)
 
     # Relationships
     bookshelves = relationship("UserBookshelf", back_populates="user", cascade="all, delete-orphan")
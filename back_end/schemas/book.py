@@ -23,4 +23,17 @@ class Book(BookBase):
     updated_at: datetime
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class BookSuggestion(BaseModel):
+    id: int
+    name: str
+    subtitle: Optional[str] = None
+    cover_url: Optional[str] = None
+    average_rating: float = 0.0
+
+class BookRecommendation(BaseModel):
+    book: Book
+    score: float
+    # Livros avaliados/favoritados do usuário que levaram a esta recomendação
+    sources: int
@@ -1,4 +1,4 @@
-from typing import Optional, Literal, Union
+from typing import List, Optional, Literal, Union
 from datetime import datetime
 from pydantic import BaseModel, Field, validator
 from back_end.schemas.book import Book
@@ -32,6 +32,40 @@ class BookshelfEntryUpdate(BaseModel):
             raise ValueError('Rating must be in 0.5 increments')
         return v
 
+MAX_BATCH_OPERATIONS = 500
+
+class BookshelfBatchOperation(BookshelfEntryUpdate):
+    op: Literal['add', 'update', 'remove']
+    # book_id identifica o livro em 'add'; entry_id identifica a entrada em 'update'/'remove'
+    book_id: Optional[int] = None
+    entry_id: Optional[int] = None
+
+    @validator('status', 'pages_read', 'is_favorite')
+    def reject_explicit_null(cls, v):
+        # Omitir o campo mantém o valor atual; null seria gravado como NULL na entrada
+        if v is None:
+            raise ValueError('Field cannot be null; omit it to keep the current value')
+        return v
+
+class BookshelfBatchRequest(BaseModel):
+    operations: List[BookshelfBatchOperation] = Field(min_length=1, max_length=MAX_BATCH_OPERATIONS)
+    # atomic: qualquer falha reverte o lote inteiro; best_effort: aplica o que for válido
+    mode: Literal['atomic', 'best_effort'] = 'atomic'
+
+class BookshelfBatchItemResult(BaseModel):
+    index: int
+    op: str
+    success: bool
+    entry_id: Optional[int] = None
+    book_id: Optional[int] = None
+    error: Optional[str] = None
+
+class BookshelfBatchResponse(BaseModel):
+    mode: str
+    succeeded: int
+    failed: int
+    results: List[BookshelfBatchItemResult]
+
 class BookshelfEntry(BookshelfEntryBase):
     id: int
     user_id: int
@@ -48,6 +82,30 @@ class UserAverageRating(BaseModel):
     total_read_books: int = Field(ge=0)
     message: str 
 
+class ReadingEventEntry(BaseModel):
+    id: int
+    book_id: int
+    entry_id: Optional[int] = None
+    event_type: Literal["added", "started", "progress", "finished", "rated", "favorited"]
+    status: str
+    pages_read: int
+    total_pages: Optional[int] = None
+    rating: Optional[float] = None
+    is_favorite: bool = False
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class MonthlyReadingSummary(BaseModel):
+    month: str
+    added: int = 0
+    started: int = 0
+    progress: int = 0
+    finished: int = 0
+    rated: int = 0
+    favorited: int = 0
+
 class FeedEntry(BaseModel):
     id: int
     user_id: int
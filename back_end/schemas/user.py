@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class BookshelfStats(BaseModel):
@@ -25,6 +25,10 @@ class UserSearchResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class FollowSuggestionResponse(UserSearchResponse):
+    mutual_count: int
+    shelf_overlap: int
+
 class UserBase(BaseModel):
     username: str
     email: Optional[EmailStr] = None
@@ -83,6 +87,9 @@ class NotificationResponse(BaseModel):
     message: str
     is_read: bool
     created_at: datetime
+    # Resumos: quantas pessoas e os nomes de usuário das mais recentes (mais nova primeiro)
+    actor_count: int = 1
+    actors: List[str] = []
 
     class Config:
         from_attributes = True
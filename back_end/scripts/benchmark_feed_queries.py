@@ -0,0 +1,86 @@
+import argparse
+import os
+import sys
+import time
+
+# Caminho absoluto para a raiz do projeto (dois níveis acima)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from sqlalchemy import event, func
+
+from back_end.models.base import SessionLocal, engine
+from back_end.models.user import user_follows
+from back_end.services.user_service import UserService, MAX_FEED_PAGE_SIZE
+
+PAGE_SIZES = [1, 5, 20, MAX_FEED_PAGE_SIZE]
+
+class QueryCounter:
+    """Conta os comandos SQL enviados pelo engine enquanto ativo."""
+
+    def __init__(self):
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine, "before_cursor_execute", self._on_execute)
+
+def busiest_follower(db) -> int:
+    """Usuário que segue mais contas, para exercitar um feed cheio."""
+    row = db.query(user_follows.c.follower_id, func.count()).group_by(
+        user_follows.c.follower_id
+    ).order_by(func.count().desc()).first()
+    if row is None:
+        raise SystemExit("Nenhum usuário segue ninguém; popule o banco antes do benchmark.")
+    return row[0]
+
+def benchmark(user_id: int = None, repeat: int = 5) -> bool:
+    """
+    Mede consultas e tempo de UserService.get_feed para vários tamanhos de página e para
+    a segunda página (cursor). Retorna False se a quantidade de consultas variar.
+    """
+    db = SessionLocal()
+    try:
+        user_id = user_id or busiest_follower(db)
+        print(f"Feed do usuário {user_id}")
+        print(f"{'página':>8} {'itens':>6} {'consultas':>10} {'ms (mediana)':>13}")
+
+        counts = set()
+        for limit in PAGE_SIZES:
+            for cursor_label in ("1ª", "2ª"):
+                before = None
+                if cursor_label == "2ª":
+                    _, before = UserService(db).get_feed(user_id, limit)
+                    if before is None:
+                        continue
+                timings = []
+                for _ in range(repeat):
+                    db.expire_all()
+                    with QueryCounter() as counter:
+                        started = time.perf_counter()
+                        entries, _ = UserService(db).get_feed(user_id, limit, before)
+                        timings.append((time.perf_counter() - started) * 1000)
+                counts.add(counter.count)
+                timings.sort()
+                print(f"{cursor_label + ' ' + str(limit):>8} {len(entries):>6} {counter.count:>10} {timings[len(timings) // 2]:>13.2f}")
+    finally:
+        db.close()
+
+    constant = len(counts) == 1
+    print("Quantidade de consultas constante" if constant else f"Quantidade de consultas variou: {sorted(counts)}")
+    return constant
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consultas e tempo do feed por tamanho de página")
+    parser.add_argument("--user-id", type=int, help="usuário cujo feed será medido (padrão: o que mais segue)")
+    parser.add_argument("--repeat", type=int, default=5, help="execuções por tamanho de página")
+    args = parser.parse_args()
+    sys.exit(0 if benchmark(args.user_id, args.repeat) else 1)
@@ -0,0 +1,21 @@
+import argparse
+import os
+import sys
+
+# Caminho absoluto para a raiz do projeto (dois níveis acima)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from back_end.configs.settings import settings
+from back_end.services.book_similarity import build_book_neighbors
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Recalcula os vizinhos de cada livro (book_neighbors) usados pelas recomendações"
+    )
+    parser.add_argument("--full", action="store_true", help="recalcula todos os livros, não só os alterados")
+    parser.add_argument("--workers", type=int, default=settings.BOOK_NEIGHBORS_WORKERS, help="processos de cálculo")
+    parser.add_argument("--chunk-size", type=int, default=settings.BOOK_NEIGHBORS_CHUNK_SIZE, help="livros por bloco/commit")
+    args = parser.parse_args()
+    build_book_neighbors(full=args.full, workers=args.workers, chunk_size=args.chunk_size)
@@ -0,0 +1,56 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+# Caminho absoluto para a raiz do projeto (dois níveis acima)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from sqlalchemy import delete, select, true
+
+from back_end.configs.settings import settings
+from back_end.models.base import engine
+from back_end.models.notification import Notification
+
+DEFAULT_BATCH_SIZE = 5000
+
+def purge_read_notifications(
+    days: int = settings.NOTIFICATION_RETENTION_DAYS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    pause_seconds: float = 0.0
+) -> int:
+    """
+    Remove notificações lidas mais antigas que `days` dias, em lotes de batch_size com
+    commit por lote (índice parcial ix_notifications_read_created), para não segurar
+    bloqueios longos. As não lidas nunca são removidas, então o contador não muda.
+    Retorna o total removido.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    total_deleted = 0
+    while True:
+        batch = select(Notification.id).where(
+            Notification.is_read == true(),
+            Notification.created_at < cutoff
+        ).order_by(Notification.created_at).limit(batch_size)
+        with engine.begin() as conn:
+            deleted = conn.execute(delete(Notification).where(Notification.id.in_(batch))).rowcount
+        if not deleted:
+            break
+        total_deleted += deleted
+        print(f"{total_deleted} notificações removidas")
+        if pause_seconds:
+            time.sleep(pause_seconds)
+
+    print(f"Retenção concluída: {total_deleted} notificações lidas anteriores a {cutoff:%Y-%m-%d} removidas.")
+    return total_deleted
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove notificações lidas antigas em lotes")
+    parser.add_argument("--days", type=int, default=settings.NOTIFICATION_RETENTION_DAYS, help="idade mínima, em dias")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="notificações por lote/commit")
+    parser.add_argument("--pause", type=float, default=0.0, help="segundos de pausa entre lotes")
+    args = parser.parse_args()
+    purge_read_notifications(days=args.days, batch_size=args.batch_size, pause_seconds=args.pause)
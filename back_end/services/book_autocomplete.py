@@ -0,0 +1,152 @@
+import heapq
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from back_end.models.bookshelf import Book
+from back_end.services.catalog_events import on_books_changed
+
+# Quantidade máxima de sugestões guardadas por prefixo curto
+MAX_SUGGESTIONS = 20
+
+# Prefixos até este tamanho casam com muitos títulos; o top-N deles fica memorizado
+CACHED_PREFIX_LENGTH = 3
+
+def fold_title(value: Optional[str]) -> str:
+    """Chave de busca: sem acentos, minúscula, só letras/dígitos separados por um espaço."""
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", value)
+    without_accents = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(re.findall(r"\w+", without_accents.casefold()))
+
+def _title_keys(name: Optional[str], subtitle: Optional[str]) -> Set[str]:
+    """Uma chave para cada início de palavra do título e do subtítulo ("harry potter" e "potter")."""
+    keys = set()
+    for text in (name, subtitle):
+        words = fold_title(text).split(" ")
+        for start in range(len(words)):
+            key = " ".join(words[start:])
+            if key:
+                keys.add(key)
+    return keys
+
+class TitleAutocompleteIndex:
+    """
+    Índice em memória de prefixos de títulos: um array ordenado de (chave, book_id)
+    consultado com bisect. Mantido incrementalmente a partir dos commits que alteram
+    livros (ver catalog_events); só consulta o banco para carregar ou atualizar livros alterados.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries: List[tuple] = []
+        self._books: Dict[int, dict] = {}
+        self._keys_by_book: Dict[int, Set[str]] = {}
+        self._top_by_prefix: Dict[str, List[int]] = {}
+        self._stale_ids: Set[int] = set()
+        self._loaded = False
+
+    def mark_stale(self, book_ids: Iterable[int]) -> None:
+        with self._lock:
+            self._stale_ids.update(book_ids)
+
+    def load(self, db: Session) -> None:
+        """Reconstrói o índice inteiro a partir da tabela books."""
+        with self._lock:
+            self._stale_ids = set()
+        rows = db.query(
+            Book.id, Book.name, Book.subtitle, Book.cover_url, Book.average_rating, Book.rating_count
+        ).all()
+        with self._lock:
+            self._entries = []
+            self._books = {}
+            self._keys_by_book = {}
+            self._top_by_prefix = {}
+            for row in rows:
+                self._entries.extend((key, row.id) for key in self._store(row))
+            self._entries.sort()
+            self._loaded = True
+
+    def refresh(self, db: Session) -> None:
+        """Carrega o índice na primeira chamada e depois só relê os livros marcados como alterados."""
+        if not self._loaded:
+            self.load(db)
+            return
+        with self._lock:
+            stale_ids = self._stale_ids
+            self._stale_ids = set()
+        if not stale_ids:
+            return
+        rows = db.query(
+            Book.id, Book.name, Book.subtitle, Book.cover_url, Book.average_rating, Book.rating_count
+        ).filter(Book.id.in_(stale_ids)).all()
+        with self._lock:
+            for book_id in stale_ids:
+                self._remove(book_id)
+            for row in rows:
+                keys = self._store(row)
+                for key in keys:
+                    insort(self._entries, (key, row.id))
+                self._forget_prefixes(keys)
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[dict]:
+        key = fold_title(prefix)
+        if not key:
+            return []
+        limit = min(limit, MAX_SUGGESTIONS)
+        with self._lock:
+            top_ids = self._top_by_prefix.get(key) if len(key) <= CACHED_PREFIX_LENGTH else None
+            if top_ids is None:
+                top_ids = self._rank(self._matching_ids(key), MAX_SUGGESTIONS)
+                if len(key) <= CACHED_PREFIX_LENGTH:
+                    self._top_by_prefix[key] = top_ids
+            return [self._books[book_id] for book_id in top_ids[:limit]]
+
+    def _matching_ids(self, key: str) -> Set[int]:
+        start = bisect_left(self._entries, (key,))
+        end = bisect_left(self._entries, (key + "\uffff",))
+        return {book_id for _, book_id in self._entries[start:end]}
+
+    def _rank(self, book_ids: Set[int], limit: int) -> List[int]:
+        def score(book_id):
+            book = self._books[book_id]
+            return (book["average_rating"], book["rating_count"], -book_id)
+        return heapq.nlargest(limit, book_ids, key=score)
+
+    def _store(self, row) -> Set[str]:
+        keys = _title_keys(row.name, row.subtitle)
+        self._books[row.id] = {
+            "id": row.id,
+            "name": row.name,
+            "subtitle": row.subtitle,
+            "cover_url": row.cover_url,
+            "average_rating": row.average_rating or 0.0,
+            "rating_count": row.rating_count or 0
+        }
+        self._keys_by_book[row.id] = keys
+        return keys
+
+    def _remove(self, book_id: int) -> None:
+        keys = self._keys_by_book.pop(book_id, set())
+        self._books.pop(book_id, None)
+        for key in keys:
+            position = bisect_left(self._entries, (key, book_id))
+            if position < len(self._entries) and self._entries[position] == (key, book_id):
+                del self._entries[position]
+        self._forget_prefixes(keys)
+
+    def _forget_prefixes(self, keys: Set[str]) -> None:
+        for key in keys:
+            for length in range(1, CACHED_PREFIX_LENGTH + 1):
+                self._top_by_prefix.pop(key[:length], None)
+
+autocomplete_index = TitleAutocompleteIndex()
+
+@on_books_changed
+def _mark_autocomplete_stale(book_ids: Set[int]) -> None:
+    autocomplete_index.mark_stale(book_ids)
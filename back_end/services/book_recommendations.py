@@ -0,0 +1,92 @@
+from typing import List, Optional
+
+from sqlalchemy import case, event, func, literal, or_, select, true
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from back_end.models.book_neighbor import BookInteractionChange, BookNeighbor
+from back_end.models.bookshelf import Book, UserBookshelf
+
+DEFAULT_RECOMMENDATIONS = 20
+MAX_RECOMMENDATIONS = 100
+
+# Peso de uma entrada da estante sem avaliação nem favorito, por status
+STATUS_WEIGHTS = {"to_read": 0.2, "reading": 0.4, "read": 0.6}
+
+# Livros com interações alteradas na transação corrente, guardados em session.info
+_PENDING_KEY = "book_interactions_changed"
+
+def interaction_weight(state: Optional[dict]) -> float:
+    """
+    Valor de uma entrada da estante (entry_state) na matriz usuário × livro: favorito vale
+    1, uma avaliação vale estrelas / 5 e, sem nenhum dos dois, o peso do status.
+    """
+    if state is None:
+        return 0.0
+    if state["is_favorite"]:
+        return 1.0
+    if state["rating"] is not None and state["rating"] > 0:
+        return state["rating"] / 5
+    return STATUS_WEIGHTS.get(state["status"], 0.0)
+
+def record_interaction_change(session: Session, book_id: int, old_state: Optional[dict], new_state: Optional[dict]) -> None:
+    """Marca o livro para o recálculo dos vizinhos se o peso da entrada mudou."""
+    if interaction_weight(old_state) != interaction_weight(new_state):
+        session.info.setdefault(_PENDING_KEY, set()).add(book_id)
+
+@event.listens_for(Session, "before_commit")
+def _write_interaction_changes(session):
+    book_ids = session.info.pop(_PENDING_KEY, None)
+    if not book_ids:
+        return
+    insert = sqlite.insert if session.get_bind().dialect.name == "sqlite" else postgresql.insert
+    statement = insert(BookInteractionChange).values([{"book_id": book_id} for book_id in sorted(book_ids)])
+    session.execute(statement.on_conflict_do_update(
+        index_elements=[BookInteractionChange.book_id],
+        set_={"changes": BookInteractionChange.changes + 1, "marked_at": func.now()}
+    ))
+
+@event.listens_for(Session, "after_rollback")
+def _discard_interaction_changes(session):
+    session.info.pop(_PENDING_KEY, None)
+
+class RecommendationService:
+    """Recomendações item a item a partir da tabela book_neighbors, já calculada."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def recommend(self, user_id: int, limit: int = DEFAULT_RECOMMENDATIONS) -> List[dict]:
+        """
+        Pontua os vizinhos dos livros avaliados ou favoritados pelo usuário (soma de
+        similaridade × peso do livro de origem) e devolve os melhores que ainda não estão
+        na estante dele. Uma consulta agrupada pela chave primária de book_neighbors.
+        """
+        limit = max(1, min(limit, MAX_RECOMMENDATIONS))
+        seed_weight = case(
+            (UserBookshelf.is_favorite == true(), literal(1.0)),
+            else_=UserBookshelf.rating / 5.0
+        )
+        seeds = select(UserBookshelf.book_id, seed_weight.label("weight")).where(
+            UserBookshelf.user_id == user_id,
+            or_(UserBookshelf.is_favorite == true(), UserBookshelf.rating > 0)
+        ).subquery()
+        shelved = select(UserBookshelf.book_id).where(UserBookshelf.user_id == user_id)
+
+        score = func.sum(BookNeighbor.score * seeds.c.weight).label("score")
+        rows = self.db.execute(
+            select(BookNeighbor.neighbor_id, score, func.count().label("sources")).join(
+                seeds, BookNeighbor.book_id == seeds.c.book_id
+            ).where(
+                BookNeighbor.neighbor_id.not_in(shelved)
+            ).group_by(BookNeighbor.neighbor_id).order_by(score.desc(), BookNeighbor.neighbor_id).limit(limit)
+        ).all()
+        if not rows:
+            return []
+
+        books = {book.id: book for book in self.db.query(Book).filter(Book.id.in_([row.neighbor_id for row in rows]))}
+        return [
+            {"book": books[row.neighbor_id], "score": round(row.score, 4), "sources": row.sources}
+            for row in rows
+            if row.neighbor_id in books
+        ]
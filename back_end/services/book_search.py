@@ -0,0 +1,154 @@
+import re
+from abc import ABC, abstractmethod
+from typing import List
+
+from sqlalchemy import text, or_
+from sqlalchemy.orm import Session
+
+from back_end.models.bookshelf import Book
+
+# Peso da similaridade por trigramas (tolerância a erros de digitação) no ranking do Postgres
+TRIGRAM_WEIGHT = 0.5
+
+# Pesos das colunas no bm25 do FTS5: name > subtitle > category > description
+FTS5_COLUMN_WEIGHTS = (10.0, 5.0, 2.0, 1.0)
+
+def tokenize_query(query: str) -> List[str]:
+    """Quebra a busca em termos alfanuméricos, descartando operadores e pontuação."""
+    return re.findall(r"\w+", query.lower())
+
+class BookSearchBackend(ABC):
+    """Interface comum dos motores de busca de livros: devolve ids ordenados por relevância."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @abstractmethod
+    def search_ids(self, query: str, limit: int, offset: int = 0) -> List[int]:
+        """Ids dos livros que casam com query, do mais ao menos relevante."""
+        pass
+
+class PostgresBookSearchBackend(BookSearchBackend):
+    """
+    Busca em books.search_vector (tsvector ponderado, índice GIN) combinada com
+    similaridade por trigramas em books.name para tolerar erros de digitação.
+    Depende da migração add_book_search_index.
+    """
+
+    SEARCH_SQL = text("""
+        SELECT b.id
+        FROM books AS b
+        CROSS JOIN (SELECT to_tsquery('public.pt_unaccent', :tsquery) AS query) AS q
+        WHERE b.search_vector @@ q.query OR b.name % :raw
+        ORDER BY ts_rank_cd(b.search_vector, q.query) + :trigram_weight * similarity(b.name, :raw) DESC,
+                 b.id
+        LIMIT :limit OFFSET :offset
+    """)
+
+    def search_ids(self, query: str, limit: int, offset: int = 0) -> List[int]:
+        terms = tokenize_query(query)
+        if not terms:
+            return []
+        # Todos os termos com prefixo (:*) para funcionar enquanto o usuário digita
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        rows = self.db.execute(self.SEARCH_SQL, {
+            "tsquery": tsquery,
+            "raw": query,
+            "trigram_weight": TRIGRAM_WEIGHT,
+            "limit": limit,
+            "offset": offset
+        })
+        return [row[0] for row in rows]
+
+class SQLiteBookSearchBackend(BookSearchBackend):
+    """
+    Mesma busca sobre uma tabela virtual FTS5 (books_fts) sincronizada por triggers,
+    para rodar localmente e em testes. Não há tolerância a erros de digitação.
+    """
+
+    _ready_engines = set()
+
+    SCHEMA_SQL = [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+            name, subtitle, category, description,
+            content='books', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts(rowid, name, subtitle, category, description)
+            VALUES (new.id, new.name, new.subtitle, new.category, new.description);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+            INSERT INTO books_fts(books_fts, rowid, name, subtitle, category, description)
+            VALUES ('delete', old.id, old.name, old.subtitle, old.category, old.description);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE ON books BEGIN
+            INSERT INTO books_fts(books_fts, rowid, name, subtitle, category, description)
+            VALUES ('delete', old.id, old.name, old.subtitle, old.category, old.description);
+            INSERT INTO books_fts(rowid, name, subtitle, category, description)
+            VALUES (new.id, new.name, new.subtitle, new.category, new.description);
+        END
+        """,
+        "INSERT INTO books_fts(books_fts) VALUES ('rebuild')"
+    ]
+
+    SEARCH_SQL = text("""
+        SELECT rowid
+        FROM books_fts
+        WHERE books_fts MATCH :match
+        ORDER BY bm25(books_fts, {weights}), rowid
+        LIMIT :limit OFFSET :offset
+    """.format(weights=", ".join(str(w) for w in FTS5_COLUMN_WEIGHTS)))
+
+    def ensure_schema(self) -> None:
+        """Cria a tabela FTS5 e os triggers uma vez por engine, indexando os livros existentes."""
+        engine = self.db.get_bind()
+        if id(engine) in self._ready_engines:
+            return
+        with engine.begin() as conn:
+            exists = conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books_fts'"
+            ).first()
+            if not exists:
+                for statement in self.SCHEMA_SQL:
+                    conn.exec_driver_sql(statement)
+        self._ready_engines.add(id(engine))
+
+    def search_ids(self, query: str, limit: int, offset: int = 0) -> List[int]:
+        terms = tokenize_query(query)
+        if not terms:
+            return []
+        self.ensure_schema()
+        match = " ".join(f'"{term}"*' for term in terms)
+        rows = self.db.execute(self.SEARCH_SQL, {"match": match, "limit": limit, "offset": offset})
+        return [row[0] for row in rows]
+
+class LikeBookSearchBackend(BookSearchBackend):
+    """Fallback para outros bancos: ILIKE nas colunas principais, sem ranking."""
+
+    def search_ids(self, query: str, limit: int, offset: int = 0) -> List[int]:
+        search_query = f"%{query}%"
+        rows = self.db.query(Book.id).filter(
+            or_(
+                Book.name.ilike(search_query),
+                Book.subtitle.ilike(search_query),
+                Book.category.ilike(search_query)
+            )
+        ).order_by(Book.name, Book.id).limit(limit).offset(offset).all()
+        return [row[0] for row in rows]
+
+def get_book_search_backend(db: Session) -> BookSearchBackend:
+    """Escolhe o motor de busca de acordo com o banco da sessão."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return PostgresBookSearchBackend(db)
+    if dialect == "sqlite":
+        return SQLiteBookSearchBackend(db)
+    return LikeBookSearchBackend(db)
@@ -0,0 +1,233 @@
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Set, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import bindparam, delete, func, insert, select
+
+from back_end.configs.settings import settings
+from back_end.models.base import engine
+from back_end.models.book_neighbor import BookInteractionChange, BookNeighbor
+from back_end.models.bookshelf import UserBookshelf
+from back_end.services.book_recommendations import interaction_weight
+
+# Vizinhos de um livro: (coluna do livro, colunas dos vizinhos, similaridades, usuários em comum)
+NeighborRow = Tuple[int, np.ndarray, np.ndarray, np.ndarray]
+
+# Matrizes do processo corrente, recebidas uma vez por processo do pool (ver _init_worker)
+_normalized = None
+_binary = None
+_k = 0
+_min_common_users = 0
+
+def load_interaction_matrix() -> Tuple[sparse.csc_matrix, np.ndarray]:
+    """
+    Matriz esparsa usuário × livro com o peso de cada entrada das estantes
+    (interaction_weight) e os ids dos livros de cada coluna, em ordem crescente.
+    """
+    user_ids, book_ids, weights = [], [], []
+    with engine.connect() as conn:
+        rows = conn.execution_options(yield_per=50000).execute(select(
+            UserBookshelf.user_id, UserBookshelf.book_id, UserBookshelf.status,
+            UserBookshelf.rating, UserBookshelf.is_favorite
+        ))
+        for row in rows:
+            weight = interaction_weight(row._mapping)
+            if weight > 0:
+                user_ids.append(row.user_id)
+                book_ids.append(row.book_id)
+                weights.append(weight)
+
+    users, user_index = np.unique(np.array(user_ids, dtype=np.int64), return_inverse=True)
+    books, book_index = np.unique(np.array(book_ids, dtype=np.int64), return_inverse=True)
+    matrix = sparse.csc_matrix(
+        (np.array(weights, dtype=np.float32), (user_index, book_index)),
+        shape=(len(users), len(books))
+    )
+    return matrix, books
+
+def _init_worker(normalized: sparse.csc_matrix, binary: sparse.csc_matrix, k: int, min_common_users: int) -> None:
+    global _normalized, _binary, _k, _min_common_users
+    _normalized, _binary, _k, _min_common_users = normalized, binary, k, min_common_users
+
+def _candidate_rows(columns: np.ndarray) -> Iterator[NeighborRow]:
+    """Todos os vizinhos de cada coluna pedida com o mínimo de usuários em comum, sem ordem."""
+    # Colunas normalizadas: o produto já é o cosseno. Os pesos são positivos, então as
+    # duas matrizes têm o mesmo padrão de não nulos e, com os índices ordenados, alinham
+    similarity = (_normalized[:, columns].T @ _normalized).tocsr()
+    common = (_binary[:, columns].T @ _binary).tocsr()
+    similarity.sort_indices()
+    common.sort_indices()
+
+    for row, column in enumerate(columns):
+        start, end = similarity.indptr[row], similarity.indptr[row + 1]
+        neighbors = similarity.indices[start:end]
+        scores = similarity.data[start:end]
+        counts = np.rint(common.data[start:end]).astype(np.int64)
+
+        keep = (neighbors != column) & (counts >= _min_common_users)
+        yield int(column), neighbors[keep], scores[keep], counts[keep]
+
+def _top_k(row: NeighborRow) -> NeighborRow:
+    """Os _k vizinhos de maior cosseno da linha, do maior para o menor (empate pelo id)."""
+    column, neighbors, scores, counts = row
+    if len(scores) > _k:
+        top = np.argpartition(-scores, _k - 1)[:_k]
+        neighbors, scores, counts = neighbors[top], scores[top], counts[top]
+    order = np.lexsort((neighbors, -scores))
+    return column, neighbors[order], scores[order], counts[order]
+
+def _top_neighbors(columns: np.ndarray) -> List[NeighborRow]:
+    """Os _k vizinhos de maior cosseno de cada coluna pedida, com o mínimo de usuários em comum."""
+    return [_top_k(row) for row in _candidate_rows(columns)]
+
+def _rising_books(book_ids: np.ndarray, candidates: List[NeighborRow], skip: Set[int], k: int) -> Set[int]:
+    """
+    Livros fora de `skip` em que algum livro alterado pode ter entrado entre os vizinhos:
+    o cosseno é simétrico, então a linha completa do livro alterado traz a similaridade
+    dele com cada livro, comparada aqui com o k-ésimo score gravado desse livro (ou
+    qualquer uma, se ele tem menos de k vizinhos). O top-k não é simétrico: os vizinhos
+    novos do livro alterado não bastam.
+    """
+    if not candidates:
+        return set()
+    columns = np.concatenate([neighbors for _, neighbors, _, _ in candidates])
+    scores = np.concatenate([row_scores for _, _, row_scores, _ in candidates])
+    best = {}
+    for column, score in zip(columns.tolist(), scores.tolist()):
+        book_id = int(book_ids[column])
+        if book_id not in skip and score > best.get(book_id, 0.0):
+            best[book_id] = score
+
+    rising = set()
+    pending = sorted(best)
+    with engine.connect() as conn:
+        for start in range(0, len(pending), 10000):
+            chunk = pending[start:start + 10000]
+            stored = {
+                row.book_id: row
+                for row in conn.execute(
+                    select(
+                        BookNeighbor.book_id, func.count().label("neighbors"), func.min(BookNeighbor.score).label("lowest")
+                    ).where(BookNeighbor.book_id.in_(chunk)).group_by(BookNeighbor.book_id)
+                )
+            }
+            for book_id in chunk:
+                row = stored.get(book_id)
+                # Scores gravados com 6 casas: a folga evita perder um empate pelo arredondamento
+                if row is None or row.neighbors < k or best[book_id] >= row.lowest - 1e-6:
+                    rising.add(book_id)
+    return rising
+
+def _write_neighbors(book_ids: np.ndarray, results: List[NeighborRow], columns: np.ndarray) -> int:
+    """Troca os vizinhos dos livros das colunas em uma transação. Retorna quantos gravou."""
+    rows = [
+        {
+            "book_id": int(book_ids[column]),
+            "neighbor_id": int(book_ids[neighbor]),
+            "score": round(float(score), 6),
+            "common_users": int(count)
+        }
+        for column, neighbors, scores, counts in results
+        for neighbor, score, count in zip(neighbors, scores, counts)
+    ]
+    with engine.begin() as conn:
+        conn.execute(delete(BookNeighbor).where(BookNeighbor.book_id.in_([int(book_ids[c]) for c in columns])))
+        if rows:
+            conn.execute(insert(BookNeighbor), rows)
+    return len(rows)
+
+def build_book_neighbors(
+    full: bool = False,
+    workers: int = settings.BOOK_NEIGHBORS_WORKERS,
+    chunk_size: int = settings.BOOK_NEIGHBORS_CHUNK_SIZE,
+    k: int = settings.BOOK_NEIGHBORS_K,
+    min_common_users: int = settings.BOOK_NEIGHBORS_MIN_COMMON_USERS
+) -> dict:
+    """
+    Recalcula book_neighbors. No modo incremental, os livros marcados em
+    book_interaction_changes, os que têm algum deles entre os vizinhos e aqueles em que
+    algum deles passou a caber entre os vizinhos (ver _rising_books); com full, todos.
+    A matriz é sempre a completa (o cosseno depende da coluna inteira de cada vizinho);
+    o custo que cai é o dos produtos e das escritas. Os blocos de livros são calculados
+    em `workers` processos, cada um recebendo a matriz uma vez.
+    """
+    started = time.monotonic()
+    with engine.connect() as conn:
+        marks = conn.execute(select(BookInteractionChange.book_id, BookInteractionChange.changes)).all()
+    if not full and not marks:
+        print("Nenhum livro com interações alteradas.")
+        return {"books": 0, "neighbors": 0, "seconds": 0.0}
+
+    matrix, book_ids = load_interaction_matrix()
+    touched = set()
+    if full:
+        targets = set(book_ids.tolist())
+        with engine.connect() as conn:
+            targets.update(conn.execute(select(BookNeighbor.book_id).distinct()).scalars())
+    else:
+        touched = {mark.book_id for mark in marks}
+        with engine.connect() as conn:
+            targets = touched | set(conn.execute(
+                select(BookNeighbor.book_id).where(BookNeighbor.neighbor_id.in_(touched)).distinct()
+            ).scalars())
+
+    # Livros que não têm mais nenhuma interação ficam sem vizinhos
+    targets = np.array(sorted(targets), dtype=np.int64)
+    present = np.isin(targets, book_ids)
+    vanished = targets[~present].tolist()
+    targets = targets[present]
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    normalized = (matrix @ sparse.diags(1.0 / np.where(norms > 0, norms, 1.0))).tocsc()
+    binary = (matrix > 0).astype(np.float32).tocsc()
+    _init_worker(normalized, binary, k, min_common_users)
+
+    def split(columns: np.ndarray) -> List[np.ndarray]:
+        return np.array_split(columns, max(1, math.ceil(len(columns) / chunk_size))) if len(columns) else []
+
+    # Incremental: os livros alterados vêm antes, neste processo, porque as linhas completas
+    # deles dizem em que outros livros eles podem ter entrado entre os vizinhos
+    first = np.searchsorted(book_ids, targets[np.isin(targets, np.array(sorted(touched), dtype=np.int64))])
+    skip = set(targets.tolist())
+    rising = set()
+    written = 0
+    for chunk in split(first):
+        candidates = list(_candidate_rows(chunk))
+        rising |= _rising_books(book_ids, candidates, skip, k)
+        written += _write_neighbors(book_ids, [_top_k(row) for row in candidates], chunk)
+
+    rest = np.union1d(np.setdiff1d(targets, book_ids[first]), np.array(sorted(rising), dtype=np.int64))
+    columns = np.searchsorted(book_ids, rest)
+    chunks = split(columns)
+    if workers > 1 and len(chunks) > 1:
+        # Os processos do pool não usam o banco; as conexões ociosas não são herdadas
+        engine.dispose()
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(normalized, binary, k, min_common_users)
+        ) as executor:
+            for chunk, results in zip(chunks, executor.map(_top_neighbors, chunks)):
+                written += _write_neighbors(book_ids, results, chunk)
+    else:
+        for chunk in chunks:
+            written += _write_neighbors(book_ids, _top_neighbors(chunk), chunk)
+
+    with engine.begin() as conn:
+        if vanished:
+            conn.execute(delete(BookNeighbor).where(BookNeighbor.book_id.in_(vanished)))
+        if marks:
+            # Só as marcas lidas no início: mudanças durante o cálculo ficam para a próxima execução
+            conn.execute(
+                delete(BookInteractionChange).where(
+                    BookInteractionChange.book_id == bindparam("mark_book_id"),
+                    BookInteractionChange.changes == bindparam("mark_changes")
+                ),
+                [{"mark_book_id": mark.book_id, "mark_changes": mark.changes} for mark in marks]
+            )
+
+    seconds = round(time.monotonic() - started, 2)
+    recalculated = len(first) + len(columns)
+    print(f"Vizinhos recalculados: {recalculated} livros, {written} vizinhos gravados em {seconds}s.")
+    return {"books": recalculated + len(vanished), "neighbors": written, "seconds": seconds}
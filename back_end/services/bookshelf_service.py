@@ -1,21 +1,124 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Optional, Tuple
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, func
+from sqlalchemy.orm import Session, contains_eager
+from sqlalchemy import or_, func, case, cast, Numeric, insert, update, delete
+from sqlalchemy.exc import IntegrityError
 
+from back_end.configs.settings import settings
 from back_end.models.bookshelf import Book, UserBookshelf
+from back_end.models.outbox import OutboxEvent
 from back_end.schemas.book import BookCreate, Book as BookSchema
-from back_end.schemas.bookshelf import BookshelfEntry, BookshelfEntryUpdate
+from back_end.schemas.bookshelf import BookshelfEntry, BookshelfEntryUpdate, BookshelfBatchOperation
+from back_end.services.book_search import get_book_search_backend
+from back_end.services.isbn import parse_isbn
+from back_end.services.catalog_events import mark_books_changed, get_catalog_version
+from back_end.services.cache import LRUTTLCache
+from back_end.services.outbox import enqueue, outbox_handler
+from back_end.services.pagination import encode_cursor, decode_cursor, keyset_filter, order_by_clauses
+from back_end.services.book_autocomplete import autocomplete_index, MAX_SUGGESTIONS
+from back_end.services.book_recommendations import record_interaction_change
+from back_end.services.reading_stats_service import ReadingStatsService, entry_state, stats_delta
+from back_end.services.reading_events import ReadingEventService
+
+DEFAULT_BOOKSHELF_PAGE_SIZE = 50
+MAX_BOOKSHELF_PAGE_SIZE = 200
+
+DEFAULT_SEARCH_PAGE_SIZE = 10
+MAX_SEARCH_PAGE_SIZE = 50
+
+# Cache de resultados de busca compartilhado pelas requisições do worker
+search_cache = LRUTTLCache(settings.SEARCH_CACHE_SIZE, settings.SEARCH_CACHE_TTL_SECONDS)
+
+@outbox_handler("rating.delta")
+def _apply_rating_deltas(db: Session, payloads: List[dict]) -> None:
+    """
+    Soma as variações do lote por livro e aplica cada total com um único UPDATE atômico:
+    uma avaliação disputada vira uma escrita por lote na linha do livro, fora da requisição.
+    """
+    deltas = {}
+    for payload in payloads:
+        sum_delta, count_delta = deltas.get(payload["book_id"], (0.0, 0))
+        deltas[payload["book_id"]] = (sum_delta + payload["sum_delta"], count_delta + payload["count_delta"])
+
+    for book_id, (sum_delta, count_delta) in deltas.items():
+        new_sum = Book.rating_sum + sum_delta
+        new_count = Book.rating_count + count_delta
+        # No UPDATE as expressões do lado direito enxergam os valores antigos da linha,
+        # então a média é derivada dos novos agregados sem uma leitura prévia.
+        db.query(Book).filter(Book.id == book_id).update(
+            {
+                Book.rating_sum: new_sum,
+                Book.rating_count: new_count,
+                Book.average_rating: case(
+                    (new_count > 0, func.round(cast(new_sum / new_count, Numeric), 2)),
+                    else_=0.0
+                )
+            },
+            synchronize_session=False
+        )
+    mark_books_changed(db, deltas.keys())
 
 class BookshelfService:
     def __init__(self, db: Session):
         self.db = db
+        self.reading_stats = ReadingStatsService(db)
+        self.reading_events = ReadingEventService(db)
+
+    def _bookshelf_sort_order(self, sort: str) -> list:
+        """Colunas (expressão, descendente) de cada ordenação da estante; id desempata."""
+        if sort == "title":
+            return [(Book.name, False), (UserBookshelf.id, False)]
+        if sort == "rating":
+            return [(func.coalesce(UserBookshelf.rating, 0.0), True), (UserBookshelf.id, True)]
+        if sort == "favorites":
+            return [
+                (func.coalesce(UserBookshelf.is_favorite, False), True),
+                (UserBookshelf.updated_at, True),
+                (UserBookshelf.id, True)
+            ]
+        return [(UserBookshelf.updated_at, True), (UserBookshelf.id, True)]
+
+    def get_user_bookshelf(
+        self,
+        user_id: int,
+        status: Optional[str] = None,
+        limit: int = DEFAULT_BOOKSHELF_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        sort: str = "recent"
+    ) -> Tuple[List[UserBookshelf], Optional[str]]:
+        """
+        Página da estante do usuário, paginada por keyset (cursor opaco) e com os livros
+        carregados na mesma consulta. Retorna (entradas, cursor da próxima página ou None).
+        """
+        limit = max(1, min(limit, MAX_BOOKSHELF_PAGE_SIZE))
+        order = self._bookshelf_sort_order(sort)
 
-    def get_user_bookshelf(self, user_id: int, status: Optional[str] = None) -> List[BookshelfEntry]:
-        query = self.db.query(UserBookshelf).filter(UserBookshelf.user_id == user_id)
+        query = self.db.query(UserBookshelf).join(UserBookshelf.book).options(
+            contains_eager(UserBookshelf.book)
+        ).filter(UserBookshelf.user_id == user_id)
         if status:
             query = query.filter(UserBookshelf.status == status)
-        return query.all()
+        if cursor:
+            query = query.filter(keyset_filter(order, decode_cursor(cursor, len(order))))
+
+        entries = query.order_by(*order_by_clauses(order)).limit(limit + 1).all()
+
+        next_cursor = None
+        if len(entries) > limit:
+            entries = entries[:limit]
+            last = entries[-1]
+            next_cursor = encode_cursor(self._bookshelf_sort_values(last, sort))
+        return entries, next_cursor
+
+    def _bookshelf_sort_values(self, entry: UserBookshelf, sort: str) -> list:
+        if sort == "title":
+            return [entry.book.name, entry.id]
+        if sort == "rating":
+            return [entry.rating or 0.0, entry.id]
+        if sort == "favorites":
+            return [bool(entry.is_favorite), entry.updated_at, entry.id]
+        return [entry.updated_at, entry.id]
 
     def add_to_bookshelf(self, user_id: int, book_data: dict) -> BookshelfEntry:
         # Get the book by ID
@@ -50,8 +153,22 @@ class BookshelfService:
             total_pages=total_pages
         )
         
+        self.reading_stats.ensure_row(user_id)
         self.db.add(bookshelf)
-        self.db.commit()
+        self._apply_rating_change(book.id, None, bookshelf.rating)
+        self.reading_stats.apply_change(user_id, None, entry_state(bookshelf))
+        record_interaction_change(self.db, book.id, None, entry_state(bookshelf))
+        try:
+            self.db.flush()
+            self.reading_events.record(user_id, book.id, bookshelf.id, None, entry_state(bookshelf))
+            self.db.commit()
+        except IntegrityError:
+            # Outra requisição adicionou o mesmo livro (restrição única user_id, book_id)
+            self.db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Este livro já está na sua estante"
+            )
         self.db.refresh(bookshelf)
         
         return bookshelf
@@ -61,31 +178,119 @@ class BookshelfService:
         Calcula a média de rating de um livro específico baseado nas avaliações de todos os usuários.
         Retorna 0.0 se nenhum usuário avaliou o livro.
         """
-        # Busca todas as avaliações válidas para o livro (rating > 0)
-        ratings = self.db.query(UserBookshelf.rating).filter(
+        rating_sum, rating_count = self._aggregate_book_ratings(book_id)
+        return self._average_from_aggregates(rating_sum, rating_count)
+
+    def _aggregate_book_ratings(self, book_id: int) -> tuple:
+        """Soma e contagem das avaliações válidas (rating > 0) de um livro, calculadas no banco."""
+        rating_sum, rating_count = self.db.query(
+            func.coalesce(func.sum(UserBookshelf.rating), 0.0),
+            func.count(UserBookshelf.rating)
+        ).filter(
             UserBookshelf.book_id == book_id,
             UserBookshelf.rating.isnot(None),
             UserBookshelf.rating > 0
-        ).all()
-        
-        if not ratings:
+        ).one()
+        return float(rating_sum), int(rating_count)
+
+    @staticmethod
+    def _average_from_aggregates(rating_sum: float, rating_count: int) -> float:
+        if not rating_count:
             return 0.0
-        
-        # Calcula a média
-        total_rating = sum(rating[0] for rating in ratings)
-        average_rating = total_rating / len(ratings)
-        
-        return round(average_rating, 2)
+        return round(rating_sum / rating_count, 2)
+
+    @staticmethod
+    def _is_counted_rating(rating: Optional[float]) -> bool:
+        return rating is not None and rating > 0
+
+    @classmethod
+    def _rating_delta(cls, old_rating: Optional[float], new_rating: Optional[float]) -> Tuple[float, int]:
+        """Variação (soma, contagem) dos agregados do livro quando uma avaliação muda."""
+        old_counted = cls._is_counted_rating(old_rating)
+        new_counted = cls._is_counted_rating(new_rating)
+        sum_delta = (new_rating if new_counted else 0.0) - (old_rating if old_counted else 0.0)
+        count_delta = int(new_counted) - int(old_counted)
+        return sum_delta, count_delta
+
+    def _apply_rating_change(self, book_id: int, old_rating: Optional[float], new_rating: Optional[float]) -> None:
+        """
+        Grava no outbox, na mesma transação da escrita na estante, a variação de uma
+        avaliação nos agregados do livro (rating_sum/rating_count).
+        Não faz commit: quem chama é responsável por confirmar a transação.
+        """
+        self._apply_rating_delta(book_id, *self._rating_delta(old_rating, new_rating))
+
+    def _apply_rating_delta(self, book_id: int, sum_delta: float, count_delta: int) -> None:
+        if not sum_delta and not count_delta:
+            return
+        enqueue(self.db, "rating.delta", {"book_id": book_id, "sum_delta": sum_delta, "count_delta": count_delta})
 
-    def update_book_average_rating(self, book_id: int) -> None:
+    def reconcile_book_rating_aggregates(self, fix: bool = False) -> dict:
         """
-        Atualiza a média de rating de um livro no banco de dados.
+        Compara rating_sum/rating_count de cada livro com as avaliações reais da estante.
+        Com fix=True, corrige os livros divergentes na mesma transação. Livros com variações
+        ainda no outbox são ignorados: a correção seria somada de novo quando elas fossem aplicadas.
         """
-        book = self.db.query(Book).filter(Book.id == book_id).first()
-        if book:
-            book.average_rating = self.calculate_book_average_rating(book_id)
+        pending_books = {
+            payload["book_id"]
+            for (payload,) in self.db.query(OutboxEvent.payload).filter(OutboxEvent.kind == "rating.delta")
+        }
+        ratings = self.db.query(
+            UserBookshelf.book_id.label("book_id"),
+            func.sum(UserBookshelf.rating).label("rating_sum"),
+            func.count(UserBookshelf.rating).label("rating_count")
+        ).filter(
+            UserBookshelf.rating.isnot(None),
+            UserBookshelf.rating > 0
+        ).group_by(UserBookshelf.book_id).subquery()
+
+        expected_sum = func.coalesce(ratings.c.rating_sum, 0.0)
+        expected_count = func.coalesce(ratings.c.rating_count, 0)
+        rows = self.db.query(
+            Book.id,
+            Book.rating_sum,
+            Book.rating_count,
+            Book.average_rating,
+            expected_sum,
+            expected_count
+        ).outerjoin(ratings, ratings.c.book_id == Book.id).filter(
+            or_(
+                func.abs(Book.rating_sum - expected_sum) > 1e-6,
+                Book.rating_count != expected_count
+            )
+        ).all()
+
+        mismatches = []
+        for book_id, stored_sum, stored_count, stored_average, real_sum, real_count in rows:
+            if book_id in pending_books:
+                continue
+            mismatches.append({
+                "book_id": book_id,
+                "stored_sum": stored_sum,
+                "stored_count": stored_count,
+                "expected_sum": float(real_sum),
+                "expected_count": int(real_count)
+            })
+            if fix:
+                self.db.query(Book).filter(Book.id == book_id).update(
+                    {
+                        Book.rating_sum: float(real_sum),
+                        Book.rating_count: int(real_count),
+                        Book.average_rating: self._average_from_aggregates(float(real_sum), int(real_count))
+                    },
+                    synchronize_session=False
+                )
+                mark_books_changed(self.db, [book_id])
+        if fix and mismatches:
             self.db.commit()
 
+        return {
+            "mismatched_books": len(mismatches),
+            "pending_books": len(pending_books),
+            "fixed": fix,
+            "mismatches": mismatches
+        }
+
     def update_bookshelf_entry(self, entry_id: int, user_id: int, entry_update: BookshelfEntryUpdate) -> BookshelfEntry:
         bookshelf_entry = self.db.query(UserBookshelf).filter(
             UserBookshelf.id == entry_id,
@@ -119,6 +324,10 @@ class BookshelfService:
                     detail="You can only rate books that are marked as 'read'"
                 )
 
+        self.reading_stats.ensure_row(user_id)
+        old_state = entry_state(bookshelf_entry)
+        old_rating = bookshelf_entry.rating
+
         for field, value in update_data.items():
             setattr(bookshelf_entry, field, value)
 
@@ -133,13 +342,17 @@ class BookshelfService:
             if update_data['pages_read'] == bookshelf_entry.total_pages:
                 bookshelf_entry.status = 'read'
 
+        # Se o rating foi alterado, ajusta os agregados do livro na mesma transação
+        if 'rating' in update_data:
+            self._apply_rating_change(bookshelf_entry.book_id, old_rating, bookshelf_entry.rating)
+        new_state = entry_state(bookshelf_entry)
+        self.reading_stats.apply_change(user_id, old_state, new_state)
+        self.reading_events.record(user_id, bookshelf_entry.book_id, bookshelf_entry.id, old_state, new_state)
+        record_interaction_change(self.db, bookshelf_entry.book_id, old_state, new_state)
+
         self.db.commit()
         self.db.refresh(bookshelf_entry)
-        
-        # Se o rating foi atualizado, recalcula a média do livro
-        if 'rating' in update_data:
-            self.update_book_average_rating(bookshelf_entry.book_id)
-        
+
         return bookshelf_entry
 
     def remove_from_bookshelf(self, bookshelf_id: int, user_id: int) -> dict:
@@ -154,24 +367,83 @@ class BookshelfService:
                 detail="Bookshelf entry not found"
             )
         
+        self.reading_stats.ensure_row(user_id)
+        self._apply_rating_change(bookshelf.book_id, bookshelf.rating, None)
+        self.reading_stats.apply_change(user_id, entry_state(bookshelf), None)
+        record_interaction_change(self.db, bookshelf.book_id, entry_state(bookshelf), None)
         self.db.delete(bookshelf)
         self.db.commit()
         
         return {"message": "Book removed from bookshelf successfully"}
 
-    def search_books(self, query: str) -> List[BookSchema]:
-        search_query = f"%{query}%"
-        books = self.db.query(Book).filter(
-            or_(
-                Book.name.ilike(search_query),
-                Book.subtitle.ilike(search_query),
-                Book.category.ilike(search_query),
-                Book.isbn13.ilike(search_query),
-                Book.isbn10.ilike(search_query)
+    def search_books(self, query: str, page: int = 1, page_size: int = DEFAULT_SEARCH_PAGE_SIZE) -> List[BookSchema]:
+        """
+        Busca livros por relevância (texto completo ponderado + trigramas no Postgres,
+        FTS5 no SQLite), paginada e limitada a MAX_SEARCH_PAGE_SIZE resultados por página.
+        Resultados ficam em cache por versão do catálogo, que muda a cada alteração de livro.
+        """
+        page_size = max(1, min(page_size, MAX_SEARCH_PAGE_SIZE))
+        page = max(page, 1)
+        cache_key = (get_catalog_version(), " ".join(query.lower().split()), page, page_size)
+        cached = search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        books = self._search_books_uncached(query, page, page_size)
+        result = [BookSchema.model_validate(book) for book in books]
+        search_cache.set(cache_key, result)
+        return result
+
+    def _search_books_uncached(self, query: str, page: int, page_size: int) -> List[Book]:
+        offset = (page - 1) * page_size
+
+        # Um ISBN é respondido por busca exata nos índices únicos, sem passar pelo motor de texto
+        isbns = parse_isbn(query)
+        if isbns:
+            book = self._find_book_by_isbns(*isbns)
+            return [book] if book and offset == 0 else []
+
+        book_ids = get_book_search_backend(self.db).search_ids(query, limit=page_size, offset=offset)
+        if not book_ids:
+            return []
+
+        books_by_id = {
+            book.id: book
+            for book in self.db.query(Book).filter(Book.id.in_(book_ids)).all()
+        }
+        return [books_by_id[book_id] for book_id in book_ids if book_id in books_by_id]
+
+    def get_search_cache_stats(self) -> dict:
+        return {**search_cache.stats(), "catalog_version": get_catalog_version()}
+
+    def autocomplete_books(self, prefix: str, limit: int = 10) -> List[dict]:
+        """
+        Sugestões de títulos por prefixo a partir do índice em memória, ordenadas por
+        avaliação. O banco só é consultado para carregar o índice ou reler livros alterados.
+        """
+        autocomplete_index.refresh(self.db)
+        return autocomplete_index.suggest(prefix, min(limit, MAX_SUGGESTIONS))
+
+    def _find_book_by_isbns(self, isbn13: str, isbn10: Optional[str]) -> Optional[Book]:
+        criteria = [Book.isbn13 == isbn13]
+        if isbn10:
+            criteria.append(Book.isbn10 == isbn10)
+        return self.db.query(Book).filter(or_(*criteria)).first()
+
+    def get_book_by_isbn(self, isbn: str) -> Book:
+        isbns = parse_isbn(isbn)
+        if not isbns:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="ISBN inválido"
             )
-        ).order_by(Book.name).limit(10).all()
-        
-        return books or []
+        book = self._find_book_by_isbns(*isbns)
+        if not book:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Livro não encontrado"
+            )
+        return book
 
     def get_book_details(self, book_id: int, user_id: int) -> dict:
         book = self.db.query(Book).filter(Book.id == book_id).first()
@@ -195,78 +467,14 @@ class BookshelfService:
     def get_user_average_rating(self, user_id: int) -> dict:
         """
         Calcula a média de estrelas que um usuário deu aos livros que já leu.
-        Retorna apenas livros marcados como 'read' e que possuem rating.
+        Considera apenas livros marcados como 'read' e que possuem rating,
+        lidos de user_reading_stats (uma linha pela chave primária).
         """
-        # Busca todos os livros do usuário que estão marcados como lidos e possuem rating
-        read_books_with_rating = self.db.query(UserBookshelf).filter(
-            UserBookshelf.user_id == user_id,
-            UserBookshelf.status == "read",
-            UserBookshelf.rating.isnot(None),
-            UserBookshelf.rating > 0
-        ).all()
-
-        if not read_books_with_rating:
-            return {
-                "average_rating": 0.0,
-                "total_rated_books": 0,
-                "total_read_books": 0,
-                "message": "Nenhum livro avaliado encontrado"
-            }
-
-        # Calcula a média das avaliações
-        total_rating = sum(book.rating for book in read_books_with_rating)
-        average_rating = total_rating / len(read_books_with_rating)
-
-        # Busca o total de livros lidos (com ou sem avaliação)
-        total_read_books = self.db.query(UserBookshelf).filter(
-            UserBookshelf.user_id == user_id,
-            UserBookshelf.status == "read"
-        ).count()
-
-        return {
-            "average_rating": round(average_rating, 2),
-            "total_rated_books": len(read_books_with_rating),
-            "total_read_books": total_read_books,
-            "message": f"Média calculada com base em {len(read_books_with_rating)} livros avaliados"
-        }
+        return self.reading_stats.get_average_rating(user_id)
 
     def get_user_average_rating_by_id(self, user_id: int) -> dict:
-        """
-        Calcula a média de estrelas que um usuário específico deu aos livros que já leu.
-        Retorna apenas livros marcados como 'read' e que possuem rating.
-        """
-        # Busca todos os livros do usuário que estão marcados como lidos e possuem rating
-        read_books_with_rating = self.db.query(UserBookshelf).filter(
-            UserBookshelf.user_id == user_id,
-            UserBookshelf.status == "read",
-            UserBookshelf.rating.isnot(None),
-            UserBookshelf.rating > 0
-        ).all()
-
-        if not read_books_with_rating:
-            return {
-                "average_rating": 0.0,
-                "total_rated_books": 0,
-                "total_read_books": 0,
-                "message": "Nenhum livro avaliado encontrado"
-            }
-
-        # Calcula a média das avaliações
-        total_rating = sum(book.rating for book in read_books_with_rating)
-        average_rating = total_rating / len(read_books_with_rating)
-
-        # Busca o total de livros lidos (com ou sem avaliação)
-        total_read_books = self.db.query(UserBookshelf).filter(
-            UserBookshelf.user_id == user_id,
-            UserBookshelf.status == "read"
-        ).count()
-
-        return {
-            "average_rating": round(average_rating, 2),
-            "total_rated_books": len(read_books_with_rating),
-            "total_read_books": total_read_books,
-            "message": f"Média calculada com base em {len(read_books_with_rating)} livros avaliados"
-        } 
+        """Mesma média de get_user_average_rating, para um usuário específico."""
+        return self.get_user_average_rating(user_id)
 
     def toggle_favorite(self, entry_id: int, user_id: int) -> UserBookshelf:
         bookshelf_entry = self.db.query(UserBookshelf).filter(
@@ -278,7 +486,174 @@ class BookshelfService:
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Bookshelf entry not found"
             )
+        self.reading_stats.ensure_row(user_id)
+        old_state = entry_state(bookshelf_entry)
         bookshelf_entry.is_favorite = not bookshelf_entry.is_favorite
+        new_state = entry_state(bookshelf_entry)
+        self.reading_stats.apply_change(user_id, old_state, new_state)
+        self.reading_events.record(user_id, bookshelf_entry.book_id, bookshelf_entry.id, old_state, new_state)
+        record_interaction_change(self.db, bookshelf_entry.book_id, old_state, new_state)
         self.db.commit()
         self.db.refresh(bookshelf_entry)
-        return bookshelf_entry 
\ No newline at end of file
+        return bookshelf_entry 
+
+    def apply_bookshelf_batch(self, user_id: int, operations: List[BookshelfBatchOperation], mode: str = "atomic") -> dict:
+        """
+        Aplica várias operações add/update/remove na estante em uma única transação,
+        com INSERT/UPDATE de várias linhas e ajuste dos agregados de avaliação uma vez
+        por livro. Em modo 'atomic' qualquer falha reverte o lote inteiro (400);
+        em 'best_effort' as operações inválidas são ignoradas e as demais aplicadas.
+        """
+        add_book_ids = {op.book_id for op in operations if op.op == "add" and op.book_id is not None}
+        entry_ids = {op.entry_id for op in operations if op.op != "add" and op.entry_id is not None}
+
+        # Estado atual carregado de uma vez: livros a adicionar e entradas envolvidas do usuário
+        books = {
+            book.id: book
+            for book in self.db.query(Book.id, Book.num_pages).filter(Book.id.in_(add_book_ids)).all()
+        } if add_book_ids else {}
+        entries = {}
+        if add_book_ids or entry_ids:
+            rows = self.db.query(
+                UserBookshelf.id, UserBookshelf.book_id, UserBookshelf.status, UserBookshelf.pages_read,
+                UserBookshelf.total_pages, UserBookshelf.rating, UserBookshelf.is_favorite
+            ).filter(
+                UserBookshelf.user_id == user_id,
+                or_(UserBookshelf.id.in_(entry_ids), UserBookshelf.book_id.in_(add_book_ids))
+            ).all()
+            entries = {row.id: dict(row._mapping) for row in rows}
+        shelved_book_ids = {entry["book_id"] for entry in entries.values()}
+
+        inserts = []
+        updates = {}
+        deletes = set()
+        # Estado de cada entrada alterada antes do lote, para os eventos de leitura
+        original_states = {}
+        rating_deltas = {}
+        user_stats_delta = stats_delta(None, None)
+        results = []
+
+        def track(book_id, old_state, new_state):
+            # Acumula as variações dos agregados do livro e das estatísticas do usuário
+            sum_delta, count_delta = self._rating_delta(
+                old_state["rating"] if old_state else None,
+                new_state["rating"] if new_state else None
+            )
+            current_sum, current_count = rating_deltas.get(book_id, (0.0, 0))
+            rating_deltas[book_id] = (current_sum + sum_delta, current_count + count_delta)
+            for field, value in stats_delta(old_state, new_state).items():
+                user_stats_delta[field] += value
+            record_interaction_change(self.db, book_id, old_state, new_state)
+
+        for index, operation in enumerate(operations):
+            result = {"index": index, "op": operation.op, "book_id": operation.book_id, "entry_id": operation.entry_id}
+            changes = operation.dict(exclude_unset=True, exclude={"op", "book_id", "entry_id"})
+            try:
+                if operation.op == "add":
+                    book = books.get(operation.book_id)
+                    if book is None:
+                        raise ValueError("Livro não encontrado")
+                    if book.id in shelved_book_ids:
+                        raise ValueError("Este livro já está na sua estante")
+                    values = {
+                        "status": "to_read",
+                        "pages_read": 0,
+                        "total_pages": book.num_pages,
+                        "rating": None,
+                        "is_favorite": False
+                    }
+                    values.update({field: value for field, value in changes.items() if value is not None})
+                    self._validate_entry_values(values, changes)
+                    inserts.append((index, {"user_id": user_id, "book_id": book.id, **values}))
+                    shelved_book_ids.add(book.id)
+                    track(book.id, None, values)
+                else:
+                    entry = entries.get(operation.entry_id)
+                    if entry is None or entry["id"] in deletes:
+                        raise ValueError("Bookshelf entry not found")
+                    result["book_id"] = entry["book_id"]
+                    if operation.op == "remove":
+                        deletes.add(entry["id"])
+                        updates.pop(entry["id"], None)
+                        shelved_book_ids.discard(entry["book_id"])
+                        track(entry["book_id"], entry, None)
+                    else:
+                        values = {**entry, **changes}
+                        self._validate_entry_values(values, changes)
+                        track(entry["book_id"], dict(entry), values)
+                        original_states.setdefault(entry["id"], dict(entry))
+                        entry.update(values)
+                        updates.setdefault(entry["id"], {}).update(
+                            {field: values[field] for field in list(changes) + ["status"]}
+                        )
+                result["success"] = True
+            except ValueError as e:
+                result["success"] = False
+                result["error"] = str(e)
+            results.append(result)
+
+        failed = [result for result in results if not result["success"]]
+        if failed and mode == "atomic":
+            for result in results:
+                if result["success"]:
+                    result["success"] = False
+                    result["error"] = "Não aplicado: o lote foi revertido"
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"message": f"{len(failed)} operações inválidas; nenhuma alteração aplicada", "results": results}
+            )
+
+        now = datetime.utcnow()
+        new_ids = []
+        self.reading_stats.ensure_row(user_id)
+        try:
+            if deletes:
+                self.db.execute(
+                    delete(UserBookshelf).where(UserBookshelf.user_id == user_id, UserBookshelf.id.in_(deletes))
+                )
+            if updates:
+                self.db.execute(
+                    update(UserBookshelf),
+                    [{"id": entry_id, **values, "updated_at": now} for entry_id, values in updates.items()]
+                )
+            if inserts:
+                new_ids = self.db.scalars(
+                    insert(UserBookshelf).returning(UserBookshelf.id, sort_by_parameter_order=True),
+                    [{**values, "created_at": now, "updated_at": now} for _, values in inserts]
+                ).all()
+                for (index, _), entry_id in zip(inserts, new_ids):
+                    results[index]["entry_id"] = entry_id
+            self.reading_events.record_many(user_id, [
+                (entries[entry_id]["book_id"], entry_id, original_states[entry_id], entries[entry_id])
+                for entry_id in updates
+            ] + [
+                (values["book_id"], entry_id, None, values)
+                for (_, values), entry_id in zip(inserts, new_ids)
+            ])
+            for book_id, (sum_delta, count_delta) in rating_deltas.items():
+                self._apply_rating_delta(book_id, sum_delta, count_delta)
+            self.reading_stats.apply_delta(user_id, user_stats_delta)
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A estante foi alterada por outra requisição; tente novamente"
+            )
+
+        return {
+            "mode": mode,
+            "succeeded": len(results) - len(failed),
+            "failed": len(failed),
+            "results": results
+        }
+
+    def _validate_entry_values(self, values: dict, changes: dict) -> None:
+        """Mesmas regras de update_bookshelf_entry, aplicadas aos valores finais de uma entrada."""
+        if changes.get("rating") is not None and values["status"] != "read":
+            raise ValueError("You can only rate books that are marked as 'read'")
+        if "pages_read" in changes and values.get("total_pages"):
+            if values["pages_read"] > values["total_pages"]:
+                raise ValueError("Pages read cannot exceed total pages")
+            if values["pages_read"] == values["total_pages"]:
+                values["status"] = "read"
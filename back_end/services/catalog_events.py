@@ -0,0 +1,67 @@
+import threading
+from itertools import chain
+from typing import Callable, Iterable, List, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from back_end.models.bookshelf import Book
+
+# Ids de livros alterados na transação corrente, guardados em session.info
+_PENDING_KEY = "catalog_changed_book_ids"
+
+_listeners: List[Callable[[Set[int]], None]] = []
+
+# Versão do catálogo: incrementada a cada commit que altera livros. Caches derivados
+# do catálogo incluem a versão na chave e assim nunca servem resultados antigos.
+_version_lock = threading.Lock()
+_catalog_version = 0
+
+def get_catalog_version() -> int:
+    return _catalog_version
+
+def _bump_catalog_version() -> None:
+    global _catalog_version
+    with _version_lock:
+        _catalog_version += 1
+
+def on_books_changed(listener: Callable[[Set[int]], None]) -> Callable[[Set[int]], None]:
+    """
+    Registra uma função chamada após cada commit que alterou livros, com os ids alterados.
+    Pode ser usada como decorador.
+    """
+    _listeners.append(listener)
+    return listener
+
+def mark_books_changed(session: Session, book_ids: Iterable[int]) -> None:
+    """
+    Marca livros como alterados na transação corrente. Necessário para UPDATEs em massa
+    (query.update), que não passam pelo flush da sessão.
+    """
+    session.info.setdefault(_PENDING_KEY, set()).update(book_ids)
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_books(session, flush_context):
+    book_ids = {
+        obj.id
+        for obj in chain(session.new, session.dirty, session.deleted)
+        if isinstance(obj, Book) and obj.id is not None
+    }
+    if book_ids:
+        mark_books_changed(session, book_ids)
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_changed_books(session):
+    book_ids = session.info.pop(_PENDING_KEY, None)
+    if not book_ids:
+        return
+    _bump_catalog_version()
+    for listener in _listeners:
+        try:
+            listener(book_ids)
+        except Exception as e:
+            print(f"Erro ao notificar alteração de livros {sorted(book_ids)}: {e}")
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_books(session):
+    session.info.pop(_PENDING_KEY, None)
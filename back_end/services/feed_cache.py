@@ -0,0 +1,71 @@
+import hashlib
+import threading
+from itertools import count
+from typing import Hashable, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from back_end.configs.settings import settings
+from back_end.services.cache import LRUTTLCache
+
+# Páginas de feed já serializadas: (corpo JSON, cursor da próxima página, ETag)
+feed_cache = LRUTTLCache(settings.FEED_CACHE_SIZE, settings.FEED_CACHE_TTL_SECONDS)
+
+# Versão do feed de cada usuário, trocada quando a timeline dele muda (atividade de um
+# seguido já distribuída, follow ou unfollow). A versão entra na chave do cache, então uma
+# página guardada antes da mudança nunca é servida depois dela. A troca só descarta a
+# entrada: quem não está na tabela (trocado, expirado ou descartado pelo LRU) recebe na
+# próxima leitura um valor novo do contador global, que nunca repete versões antigas.
+# Assim a tabela guarda só quem lê o feed e fica limitada como o próprio cache de páginas.
+_version_lock = threading.Lock()
+_version_counter = count(1)
+_feed_versions = LRUTTLCache(settings.FEED_CACHE_SIZE, settings.FEED_CACHE_TTL_SECONDS)
+
+def get_feed_version(user_id: int) -> int:
+    with _version_lock:
+        version = _feed_versions.get(user_id)
+        if version is None:
+            version = next(_version_counter)
+        # Regravar renova o TTL: a versão vive enquanto o usuário continuar lendo o feed
+        _feed_versions.set(user_id, version)
+        return version
+
+def bump_feed_versions(user_ids: Iterable[int]) -> None:
+    with _version_lock:
+        for user_id in user_ids:
+            _feed_versions.invalidate(user_id)
+
+# Donos de timelines alteradas na transação corrente, guardados em session.info
+_PENDING_KEY = "feed_changed_owner_ids"
+
+def mark_feeds_changed(session: Session, user_ids: Iterable[int]) -> None:
+    """Incrementa a versão do feed desses usuários quando a transação corrente for confirmada."""
+    session.info.setdefault(_PENDING_KEY, set()).update(user_ids)
+
+@event.listens_for(Session, "after_commit")
+def _bump_changed_feeds(session):
+    user_ids = session.info.pop(_PENDING_KEY, None)
+    if user_ids:
+        bump_feed_versions(user_ids)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_feeds(session):
+    session.info.pop(_PENDING_KEY, None)
+
+def feed_cache_key(user_id: int, limit: int, before) -> Hashable:
+    return (user_id, get_feed_version(user_id), limit, before)
+
+def feed_etag(body: bytes) -> str:
+    """ETag forte derivado do corpo: páginas iguais têm o mesmo ETag mesmo após expirar do cache."""
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    """Compara o cabeçalho If-None-Match (lista separada por vírgulas, aceita W/ e *) com o ETag."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+def get_feed_cache_stats() -> dict:
+    return {**feed_cache.stats(), "tracked_users": _feed_versions.stats()["size"]}
@@ -0,0 +1,135 @@
+import threading
+from itertools import count
+from typing import Dict, Iterable, List
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from back_end.configs.settings import settings
+from back_end.models.user import User
+from back_end.services.cache import LRUTTLCache
+from back_end.services.catalog_events import on_books_changed
+
+# Autores com perfil alterado na transação corrente, guardados em session.info
+_PENDING_KEY = "feed_changed_author_ids"
+
+# Campos do autor que aparecem nos itens do feed
+_AUTHOR_FIELDS = ("username", "full_name", "profile_picture")
+
+class FeedFragmentCache:
+    """
+    JSON já serializado de cada item do feed (evento + cartão do autor + cartão do livro),
+    compartilhado entre os feeds de todos os seguidores. Eventos são imutáveis, então o
+    item só muda quando o perfil do autor ou o livro muda: cada fragmento guarda as
+    versões de autor e livro com que foi gerado e é descartado se alguma avançou.
+    As versões ficam em caches do mesmo tamanho e TTL dos fragmentos (cada fragmento
+    aponta um autor e um livro). Uma versão que expira só é mais nova que fragmentos já
+    expirados; se o LRU descarta uma versão ainda em uso, o piso (_floor) sobe para a
+    última versão emitida e vale para todos os ids, invalidando os fragmentos anteriores.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self._cache = LRUTTLCache(max_size, ttl_seconds)
+        self._lock = threading.Lock()
+        self._counter = count(1)
+        self._stamp = 0
+        self._floor = 0
+        self._author_versions = LRUTTLCache(max_size, ttl_seconds)
+        self._book_versions = LRUTTLCache(max_size, ttl_seconds)
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.bytes_saved = 0
+
+    def _bump(self, versions: LRUTTLCache, ids: Iterable[int]) -> None:
+        with self._lock:
+            evictions = versions.evictions
+            for item_id in ids:
+                self._stamp = next(self._counter)
+                versions.set(item_id, self._stamp)
+            if versions.evictions != evictions:
+                self._floor = self._stamp
+
+    def _version(self, author_id: int, book_id: int) -> int:
+        """Versão mais recente que afeta um item do feed desse autor e desse livro."""
+        return max(self._floor, self._author_versions.get(author_id, 0), self._book_versions.get(book_id, 0))
+
+    def bump_authors(self, author_ids: Iterable[int]) -> None:
+        self._bump(self._author_versions, author_ids)
+
+    def bump_books(self, book_ids: Iterable[int]) -> None:
+        self._bump(self._book_versions, book_ids)
+
+    def stamp(self) -> int:
+        """Última versão emitida. Tirada antes de ler o banco, delimita o que store aceita."""
+        return self._stamp
+
+    def get_many(self, event_ids: List[int]) -> Dict[int, bytes]:
+        """Fragmentos válidos dos eventos pedidos; os ausentes precisam ser gerados."""
+        found = {}
+        for event_id in event_ids:
+            item = self._cache.get(event_id)
+            if item is not None:
+                author_id, book_id, version, fragment = item
+                if self._version(author_id, book_id) <= version:
+                    found[event_id] = fragment
+                    continue
+                self._cache.invalidate(event_id)
+                self.stale += 1
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(event_ids) - len(found)
+            self.bytes_saved += sum(len(fragment) for fragment in found.values())
+        return found
+
+    def store(self, event_id: int, author_id: int, book_id: int, fragment: bytes, stamp: int) -> None:
+        """
+        Guarda o fragmento gerado a partir de dados lidos depois de stamp. Se autor ou livro
+        mudaram desde então, o fragmento pode estar desatualizado e não é guardado.
+        """
+        if self._version(author_id, book_id) > stamp:
+            return
+        self._cache.set(event_id, (author_id, book_id, stamp, fragment))
+
+    def stats(self) -> dict:
+        cache_stats = self._cache.stats()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": cache_stats["size"],
+                "max_size": cache_stats["max_size"],
+                "ttl_seconds": cache_stats["ttl_seconds"],
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": cache_stats["evictions"],
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "tracked_authors": self._author_versions.stats()["size"],
+                "tracked_books": self._book_versions.stats()["size"]
+            }
+
+feed_fragments = FeedFragmentCache(settings.FEED_FRAGMENT_CACHE_SIZE, settings.FEED_FRAGMENT_CACHE_TTL_SECONDS)
+
+on_books_changed(feed_fragments.bump_books)
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_authors(session, flush_context):
+    author_ids = {
+        obj.id
+        for obj in session.dirty
+        if isinstance(obj, User) and obj.id is not None
+        and any(inspect(obj).attrs[field].history.has_changes() for field in _AUTHOR_FIELDS)
+    }
+    if author_ids:
+        session.info.setdefault(_PENDING_KEY, set()).update(author_ids)
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_changed_authors(session):
+    author_ids = session.info.pop(_PENDING_KEY, None)
+    if author_ids:
+        feed_fragments.bump_authors(author_ids)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_authors(session):
+    session.info.pop(_PENDING_KEY, None)
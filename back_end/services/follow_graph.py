@@ -0,0 +1,80 @@
+from typing import Dict, Iterable, List, Set
+
+from sqlalchemy import Integer, any_, delete, exists, func, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from back_end.models.user import user_follows
+
+class FollowGraphRepository:
+    """
+    Consultas e escritas na tabela user_follows sem carregar as coleções
+    User.following/User.followers. Nada aqui faz commit.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _dialect(self) -> str:
+        return self.db.get_bind().dialect.name
+
+    def is_following(self, follower_id: int, following_id: int) -> bool:
+        """EXISTS pela chave primária (follower_id, following_id)."""
+        return bool(self.db.execute(select(exists().where(
+            user_follows.c.follower_id == follower_id,
+            user_follows.c.following_id == following_id
+        ))).scalar())
+
+    def following_among(self, follower_id: int, user_ids: Iterable[int]) -> Set[int]:
+        """Quais de user_ids são seguidos por follower_id, em uma consulta."""
+        user_ids = list(set(user_ids))
+        if not user_ids:
+            return set()
+        if self._dialect() == "postgresql":
+            # Um único parâmetro array: o texto da consulta não muda com o tamanho da lista
+            candidates = user_follows.c.following_id == any_(literal(user_ids, postgresql.ARRAY(Integer)))
+        else:
+            candidates = user_follows.c.following_id.in_(user_ids)
+        rows = self.db.execute(select(user_follows.c.following_id).where(
+            user_follows.c.follower_id == follower_id, candidates
+        ))
+        return {row[0] for row in rows}
+
+    def following_ids(self, follower_id: int) -> List[int]:
+        rows = self.db.execute(select(user_follows.c.following_id).where(
+            user_follows.c.follower_id == follower_id
+        ))
+        return [row[0] for row in rows]
+
+    def follow(self, follower_id: int, following_id: int) -> bool:
+        """Cria a relação; retorna False se ela já existia (sem erro de unicidade)."""
+        insert = sqlite.insert if self._dialect() == "sqlite" else postgresql.insert
+        statement = insert(user_follows).values(
+            follower_id=follower_id, following_id=following_id
+        ).on_conflict_do_nothing().returning(user_follows.c.follower_id)
+        return self.db.execute(statement).first() is not None
+
+    def unfollow(self, follower_id: int, following_id: int) -> bool:
+        """Remove a relação; retorna False se ela não existia."""
+        statement = delete(user_follows).where(
+            user_follows.c.follower_id == follower_id,
+            user_follows.c.following_id == following_id
+        ).returning(user_follows.c.follower_id)
+        return self.db.execute(statement).first() is not None
+
+    def count_followers(self, user_ids: Iterable[int]) -> Dict[int, int]:
+        """Seguidores de cada usuário, por COUNT(*) agrupado (índice ix_user_follows_following)."""
+        return self._count_grouped(user_follows.c.following_id, user_ids)
+
+    def count_following(self, user_ids: Iterable[int]) -> Dict[int, int]:
+        """Seguidos por cada usuário, por COUNT(*) agrupado (chave primária)."""
+        return self._count_grouped(user_follows.c.follower_id, user_ids)
+
+    def _count_grouped(self, column, user_ids: Iterable[int]) -> Dict[int, int]:
+        user_ids = list(set(user_ids))
+        if not user_ids:
+            return {}
+        grouped = dict(self.db.execute(
+            select(column, func.count()).where(column.in_(user_ids)).group_by(column)
+        ).all())
+        return {user_id: grouped.get(user_id, 0) for user_id in user_ids}
@@ -0,0 +1,54 @@
+import re
+from typing import Optional, Tuple
+
+_NON_ISBN_CHARS = re.compile(r"[^0-9Xx]")
+_ISBN_SHAPE = re.compile(r"^[0-9Xx\-\s]+$")
+
+def clean_isbn(value: Optional[str]) -> Optional[str]:
+    """Remove hífens, espaços e afins, deixando só dígitos e 'X' maiúsculo. Vazio vira None."""
+    if value is None:
+        return None
+    cleaned = _NON_ISBN_CHARS.sub("", value).upper()
+    return cleaned or None
+
+def is_valid_isbn10(isbn: str) -> bool:
+    if not re.fullmatch(r"[0-9]{9}[0-9X]", isbn):
+        return False
+    total = sum((10 - i) * (10 if char == "X" else int(char)) for i, char in enumerate(isbn))
+    return total % 11 == 0
+
+def is_valid_isbn13(isbn: str) -> bool:
+    if not re.fullmatch(r"[0-9]{13}", isbn):
+        return False
+    total = sum(int(char) * (1 if i % 2 == 0 else 3) for i, char in enumerate(isbn))
+    return total % 10 == 0
+
+def isbn10_to_isbn13(isbn10: str) -> str:
+    body = "978" + isbn10[:9]
+    total = sum(int(char) * (1 if i % 2 == 0 else 3) for i, char in enumerate(body))
+    return body + str((10 - total % 10) % 10)
+
+def isbn13_to_isbn10(isbn13: str) -> Optional[str]:
+    """Só ISBN-13 com prefixo 978 têm um ISBN-10 equivalente."""
+    if not isbn13.startswith("978"):
+        return None
+    body = isbn13[3:12]
+    total = sum((10 - i) * int(char) for i, char in enumerate(body))
+    check = (11 - total % 11) % 11
+    return body + ("X" if check == 10 else str(check))
+
+def parse_isbn(value: str) -> Optional[Tuple[str, Optional[str]]]:
+    """
+    Reconhece um ISBN-10 ou ISBN-13 (com ou sem hífens) e valida o dígito verificador.
+    Retorna (isbn13, isbn10) normalizados, ou None se o texto não for um ISBN.
+    """
+    if not value or not _ISBN_SHAPE.match(value.strip()):
+        return None
+    isbn = clean_isbn(value)
+    if isbn is None:
+        return None
+    if len(isbn) == 10 and is_valid_isbn10(isbn):
+        return isbn10_to_isbn13(isbn), isbn
+    if len(isbn) == 13 and is_valid_isbn13(isbn):
+        return isbn, isbn13_to_isbn10(isbn)
+    return None
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import select
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import func, select as sql_select
+
+from back_end.configs.settings import settings
+from back_end.models.base import engine
+
+# Canal do LISTEN/NOTIFY; o payload é {"user_id": ..., "frame": <evento SSE>}
+PG_CHANNEL = "user_notifications"
+
+Subscriber = Tuple[asyncio.AbstractEventLoop, asyncio.Queue]
+
+class NotificationBroker(ABC):
+    """
+    Pub/sub de notificações por usuário para as conexões SSE deste worker. Cada conexão
+    é uma fila asyncio limitada; publish pode ser chamado de qualquer thread (o after_commit
+    roda na thread da requisição). Se a fila de uma conexão lenta enche, a notificação
+    mais antiga é descartada: o cliente ainda recupera tudo pela listagem paginada.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers: Dict[int, Set[Subscriber]] = {}
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        """Registra uma conexão; deve ser chamado no loop que vai consumir a fila."""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(self.queue_size))
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+        return subscriber[1]
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(user_id, set())
+            subscribers.difference_update({s for s in subscribers if s[1] is queue})
+            if not subscribers:
+                self._subscribers.pop(user_id, None)
+
+    @abstractmethod
+    def publish(self, user_id: int, frame: str) -> None:
+        """Entrega o evento SSE a todas as conexões do usuário, deste worker ou de outros."""
+        pass
+
+    def _deliver(self, user_id: int, frame: str) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, frame)
+            except RuntimeError:
+                # Loop já encerrado; a conexão sai no unsubscribe
+                pass
+
+    def _put(self, queue: asyncio.Queue, frame: str) -> None:
+        if queue.full():
+            queue.get_nowait()
+            self.dropped += 1
+        queue.put_nowait(frame)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": type(self).__name__,
+                "users": len(self._subscribers),
+                "connections": sum(len(s) for s in self._subscribers.values()),
+                "published": self.published,
+                "dropped": self.dropped
+            }
+
+class InProcessNotificationBroker(NotificationBroker):
+    """Entrega direta às conexões deste processo. Só serve com um único worker."""
+
+    def publish(self, user_id: int, frame: str) -> None:
+        self.published += 1
+        self._deliver(user_id, frame)
+
+class PostgresNotificationBroker(NotificationBroker):
+    """
+    Publica com pg_notify e entrega o que chega pelo LISTEN, então cada worker recebe as
+    notificações gravadas por qualquer outro. Uma thread por worker mantém uma conexão
+    dedicada (fora do pool) escutando o canal; ela só é aberta na primeira inscrição.
+    """
+
+    def __init__(self, queue_size: int, reconnect_seconds: float = 5.0):
+        super().__init__(queue_size)
+        self.reconnect_seconds = reconnect_seconds
+        self._listener: Optional[threading.Thread] = None
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue = super().subscribe(user_id)
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="notification-listener", daemon=True)
+                self._listener.start()
+        return queue
+
+    def publish(self, user_id: int, frame: str) -> None:
+        self.published += 1
+        payload = json.dumps({"user_id": user_id, "frame": frame}, separators=(",", ":"))
+        with engine.begin() as conn:
+            conn.execute(sql_select(func.pg_notify(PG_CHANNEL, payload)))
+
+    def _listen(self) -> None:
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(dsn)
+                conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                conn.cursor().execute(f"LISTEN {PG_CHANNEL}")
+                while True:
+                    if select.select([conn], [], [], self.reconnect_seconds) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        message = json.loads(conn.notifies.pop(0).payload)
+                        self._deliver(message["user_id"], message["frame"])
+            except Exception as e:
+                print(f"Erro no LISTEN de notificações, reconectando: {e}")
+                if conn is not None:
+                    conn.close()
+                time.sleep(self.reconnect_seconds)
+
+_broker: Optional[NotificationBroker] = None
+
+def get_notification_broker() -> NotificationBroker:
+    """Broker do worker, conforme NOTIFICATION_BROKER_BACKEND ("memory" ou "postgres")."""
+    global _broker
+    if _broker is None:
+        backend = settings.NOTIFICATION_BROKER_BACKEND
+        if backend == "postgres":
+            _broker = PostgresNotificationBroker(settings.NOTIFICATION_STREAM_QUEUE_SIZE)
+        elif backend == "memory":
+            _broker = InProcessNotificationBroker(settings.NOTIFICATION_STREAM_QUEUE_SIZE)
+        else:
+            raise ValueError(f"NOTIFICATION_BROKER_BACKEND inválido: {backend}")
+    return _broker
@@ -0,0 +1,204 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event, false, func, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from back_end.configs.settings import settings
+
+from back_end.models.notification import Notification, NotificationActor
+from back_end.models.user import User
+from back_end.schemas.user import NotificationResponse
+from back_end.services.notification_broker import get_notification_broker
+from back_end.services.outbox import outbox_handler
+from back_end.services.pagination import decode_cursor, encode_cursor, keyset_filter, order_by_clauses
+
+DEFAULT_NOTIFICATION_PAGE_SIZE = 20
+MAX_NOTIFICATION_PAGE_SIZE = 100
+
+# Texto de cada tipo de resumo: (um autor, vários autores)
+DIGEST_MESSAGES = {
+    "follow": ("{actor} começou a te seguir.", "{actor} e mais {others} {people} começaram a te seguir.")
+}
+
+def render_message(type: str, message: Optional[str], actor_count: int, recent_actors: list) -> str:
+    """Texto da notificação; o de um resumo é montado na leitura, com o autor mais recente."""
+    templates = DIGEST_MESSAGES.get(type)
+    if not templates or not recent_actors:
+        return message or ""
+    others = actor_count - 1
+    template = templates[1] if others > 0 else templates[0]
+    return template.format(
+        actor=recent_actors[-1]["username"], others=others, people="pessoa" if others == 1 else "pessoas"
+    )
+
+def _to_response(row) -> NotificationResponse:
+    recent_actors = row.recent_actors or []
+    return NotificationResponse.model_construct(
+        id=row.id,
+        type=row.type,
+        message=render_message(row.type, row.message, row.actor_count or 1, recent_actors),
+        is_read=bool(row.is_read),
+        created_at=row.created_at,
+        actor_count=row.actor_count or 1,
+        actors=[actor["username"] for actor in reversed(recent_actors)]
+    )
+
+# Notificações da transação corrente já serializadas para o broker; publicadas só
+# depois do commit
+_SERIALIZED_KEY = "notifications_serialized_push"
+
+def _push_frame(notification) -> str:
+    """Evento SSE pronto: serializado uma vez e repassado igual a todas as conexões."""
+    data = _to_response(notification).model_dump_json()
+    return f"id: {notification.id}\nevent: notification\ndata: {data}\n\n"
+
+@event.listens_for(Session, "after_commit")
+def _publish_notifications(session):
+    serialized = session.info.pop(_SERIALIZED_KEY, None)
+    if not serialized:
+        return
+    broker = get_notification_broker()
+    for user_id, frame in serialized:
+        try:
+            broker.publish(user_id, frame)
+        except Exception as e:
+            print(f"Erro ao publicar notificação para o usuário {user_id}: {e}")
+
+@event.listens_for(Session, "after_rollback")
+def _discard_notifications(session):
+    session.info.pop(_SERIALIZED_KEY, None)
+
+@outbox_handler("notification.notify")
+def _apply_notifications(db: Session, payloads: List[dict]) -> None:
+    """Notificações gravadas no outbox pelas escritas (ex.: follow_user)."""
+    notification_service = NotificationService(db)
+    for payload in payloads:
+        notification_service.notify(payload["user_id"], payload["type"], payload["actor_id"], payload["actor_username"])
+
+class NotificationService:
+    """
+    Notificações de um usuário e o contador users.unread_notifications_count, ajustado
+    na mesma transação de cada criação ou leitura. Nada aqui faz commit.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _adjust_unread_counter(self, user_id: int, delta: int) -> None:
+        # Contador NULL (não preenchido) continua NULL, como os contadores de seguidores
+        self.db.query(User).filter(User.id == user_id).update(
+            {User.unread_notifications_count: User.unread_notifications_count + delta},
+            synchronize_session=False
+        )
+
+    def _digest_bucket(self, now: datetime) -> datetime:
+        bucket_seconds = settings.NOTIFICATION_DIGEST_BUCKET_HOURS * 3600
+        epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+        elapsed = int((now - epoch).total_seconds())
+        return epoch + timedelta(seconds=elapsed - elapsed % bucket_seconds)
+
+    def notify(self, user_id: int, type: str, actor_id: int, actor_username: str) -> None:
+        """
+        Registra que actor fez `type` para user_id no resumo não lido do período corrente.
+        O INSERT ... ON CONFLICT DO UPDATE cria o resumo ou trava o existente; cada autor é
+        contado uma vez por resumo (notification_actors). Um autor novo incrementa
+        actor_count e traz o resumo para o topo; um repetido só passa a ser o mais recente,
+        sem nova publicação. Um resumo já lido não é reaberto; o próximo evento começa outro.
+        """
+        insert = sqlite.insert if self.db.get_bind().dialect.name == "sqlite" else postgresql.insert
+        actor = {"id": actor_id, "username": actor_username}
+        digest = self.db.execute(
+            insert(Notification).values(
+                user_id=user_id,
+                type=type,
+                message=render_message(type, None, 1, [actor]),
+                is_read=False,
+                bucket_start=self._digest_bucket(datetime.now(timezone.utc)),
+                actor_count=0,
+                recent_actors=[]
+            ).on_conflict_do_update(
+                index_elements=[Notification.user_id, Notification.type, Notification.bucket_start],
+                index_where=Notification.is_read == false(),
+                # Atribuição sem efeito: só para travar a linha e devolvê-la
+                set_={"actor_count": Notification.actor_count}
+            ).returning(Notification.id, Notification.recent_actors)
+        ).one()
+
+        new_actor = self.db.execute(
+            insert(NotificationActor).values(
+                notification_id=digest.id, actor_id=actor_id
+            ).on_conflict_do_nothing().returning(NotificationActor.actor_id)
+        ).first() is not None
+        recent_actors = [a for a in digest.recent_actors or [] if a["id"] != actor_id] + [actor]
+
+        values = {"recent_actors": recent_actors[-settings.NOTIFICATION_DIGEST_RECENT_ACTORS:]}
+        if new_actor:
+            values.update(actor_count=Notification.actor_count + 1, created_at=func.now())
+        row = self.db.execute(
+            update(Notification).where(Notification.id == digest.id).values(**values).returning(
+                Notification.id, Notification.type, Notification.message, Notification.is_read,
+                Notification.created_at, Notification.actor_count, Notification.recent_actors
+            ).execution_options(synchronize_session=False)
+        ).one()
+        if not new_actor:
+            return
+        # Só um resumo novo muda a quantidade de não lidas
+        if row.actor_count == 1:
+            self._adjust_unread_counter(user_id, 1)
+        self.db.info.setdefault(_SERIALIZED_KEY, []).append((user_id, _push_frame(row)))
+
+    def list(
+        self,
+        user_id: int,
+        limit: int = DEFAULT_NOTIFICATION_PAGE_SIZE,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[NotificationResponse], Optional[str]]:
+        """Notificações da mais recente à mais antiga, paginadas por (created_at, id)."""
+        limit = max(1, min(limit, MAX_NOTIFICATION_PAGE_SIZE))
+        order = [(Notification.created_at, True), (Notification.id, True)]
+
+        query = self.db.query(
+            Notification.id, Notification.type, Notification.message, Notification.is_read,
+            Notification.created_at, Notification.actor_count, Notification.recent_actors
+        ).filter(Notification.user_id == user_id)
+        if cursor:
+            query = query.filter(keyset_filter(order, decode_cursor(cursor, len(order))))
+        rows = query.order_by(*order_by_clauses(order)).limit(limit + 1).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1].created_at, rows[-1].id])
+        notifications = [_to_response(row) for row in rows]
+        return notifications, next_cursor
+
+    def unread_count(self, user_id: int) -> int:
+        """Lido do contador; usuários ainda não preenchidos pelo reparo contam pelo índice parcial."""
+        counter = self.db.query(User.unread_notifications_count).filter(User.id == user_id).scalar()
+        if counter is not None:
+            return counter
+        return self.db.query(func.count(Notification.id)).filter(
+            Notification.user_id == user_id,
+            Notification.is_read == false()
+        ).scalar()
+
+    def mark_read(self, user_id: int, up_to_id: Optional[int] = None) -> int:
+        """
+        Marca como lidas todas as não lidas do usuário (ou só as de id <= up_to_id) com um
+        único UPDATE e desconta do contador as linhas efetivamente alteradas. Retorna quantas.
+        """
+        # "= false", e não "IS false": é a condição do índice parcial ix_notifications_user_unread
+        statement = update(Notification).where(
+            Notification.user_id == user_id,
+            Notification.is_read == false()
+        )
+        if up_to_id is not None:
+            statement = statement.where(Notification.id <= up_to_id)
+        marked = self.db.execute(
+            statement.values(is_read=True).execution_options(synchronize_session=False)
+        ).rowcount
+        if marked:
+            self._adjust_unread_counter(user_id, -marked)
+        return marked
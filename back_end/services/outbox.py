@@ -0,0 +1,233 @@
+import asyncio
+import threading
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import delete, event, func
+from sqlalchemy.orm import Session
+
+from back_end.configs.settings import settings
+from back_end.models.base import SessionLocal
+from back_end.models.outbox import OutboxEvent
+
+# Marca em session.info de que a transação gravou eventos: o commit acorda os workers
+_ENQUEUED_KEY = "outbox_enqueued"
+
+# Aplica um lote de payloads do mesmo tipo na sessão recebida, sem fazer commit
+BatchHandler = Callable[[Session, List[dict]], None]
+
+_handlers: Dict[str, BatchHandler] = {}
+
+def outbox_handler(kind: str) -> Callable[[BatchHandler], BatchHandler]:
+    """
+    Registra a função que aplica os eventos de `kind`. Pode ser usada como decorador.
+    A entrega é pelo menos uma vez: o handler deve tolerar reexecução e eventos de um
+    mesmo lote fora da ordem de gravação.
+    """
+    def register(handler: BatchHandler) -> BatchHandler:
+        _handlers[kind] = handler
+        return handler
+    return register
+
+def enqueue(session: Session, kind: str, payload: dict) -> None:
+    """Grava o evento na transação corrente; ele só existe se ela for confirmada."""
+    session.add(OutboxEvent(kind=kind, payload=payload))
+    session.info[_ENQUEUED_KEY] = True
+
+@event.listens_for(Session, "after_commit")
+def _wake_outbox_workers(session):
+    if session.info.pop(_ENQUEUED_KEY, False):
+        outbox_worker.wake()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_outbox_mark(session):
+    session.info.pop(_ENQUEUED_KEY, None)
+
+class OutboxWorker:
+    """
+    Pool de tarefas asyncio que drenam outbox_events em lotes. Cada lote é reservado com
+    SELECT ... FOR UPDATE SKIP LOCKED (vários workers e processos não pegam o mesmo
+    evento), aplicado pelos handlers e apagado na mesma transação. Se o lote falha, cada
+    evento é refeito na sua própria transação; os que falharem de novo voltam para a fila
+    com espera exponencial até OUTBOX_MAX_ATTEMPTS, e depois ficam parados para inspeção.
+    O acesso ao banco é síncrono e roda em threads (asyncio.to_thread).
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        batch_size: int,
+        poll_seconds: float,
+        max_attempts: int,
+        backoff_base_seconds: float,
+        backoff_max_seconds: float
+    ):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        # Sem SKIP LOCKED (SQLite), dois workers reservariam o mesmo lote: um por vez
+        self._serial_lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+        self.batches = 0
+        # Espera do evento mais antigo do último lote, entre a gravação e a aplicação
+        self.last_lag_seconds = 0.0
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._run(), name=f"outbox-worker-{index}")
+            for index in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+    def wake(self) -> None:
+        """Antecipa a próxima leitura da fila; pode ser chamado de qualquer thread."""
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            # Loop já encerrado
+            pass
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                claimed = await asyncio.to_thread(self.process_batch)
+            except Exception as e:
+                print(f"Erro ao processar o outbox: {e}")
+                claimed = 0
+            # Lote cheio: ainda há fila, segue sem esperar
+            if claimed >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def _backoff_seconds(self, attempts: int) -> float:
+        return min(self.backoff_base_seconds * 2 ** (attempts - 1), self.backoff_max_seconds)
+
+    def _claim(self, db: Session, now: datetime, event_id: Optional[int] = None) -> List[OutboxEvent]:
+        query = db.query(OutboxEvent).filter(
+            OutboxEvent.available_at <= now,
+            OutboxEvent.attempts < self.max_attempts
+        )
+        if event_id is not None:
+            query = query.filter(OutboxEvent.id == event_id)
+        return query.order_by(OutboxEvent.available_at, OutboxEvent.id).limit(
+            self.batch_size
+        ).with_for_update(skip_locked=True).all()
+
+    @staticmethod
+    def _apply(db: Session, events: List[OutboxEvent]) -> None:
+        """Aplica os eventos agrupados por tipo (na ordem da primeira ocorrência) e os apaga."""
+        by_kind: Dict[str, List[dict]] = {}
+        for outbox_event in events:
+            by_kind.setdefault(outbox_event.kind, []).append(outbox_event.payload)
+        for kind, payloads in by_kind.items():
+            handler = _handlers.get(kind)
+            if handler is None:
+                raise LookupError(f"Nenhum handler registrado para '{kind}'")
+            handler(db, payloads)
+        db.execute(
+            delete(OutboxEvent).where(OutboxEvent.id.in_([e.id for e in events])).execution_options(
+                synchronize_session=False
+            )
+        )
+
+    def process_batch(self) -> int:
+        """Reserva e aplica um lote. Retorna quantos eventos foram reservados."""
+        db = SessionLocal()
+        skip_locked = db.get_bind().dialect.name != "sqlite"
+        try:
+            with nullcontext() if skip_locked else self._serial_lock:
+                events = self._claim(db, datetime.utcnow())
+                if not events:
+                    return 0
+                event_ids = [e.id for e in events]
+                oldest = min(e.created_at for e in events)
+                try:
+                    self._apply(db, events)
+                    db.commit()
+                    self.processed += len(events)
+                except Exception:
+                    db.rollback()
+                    for event_id in event_ids:
+                        self._process_single(db, event_id)
+            self.batches += 1
+            self.last_lag_seconds = (datetime.utcnow() - oldest).total_seconds()
+            return len(event_ids)
+        finally:
+            db.close()
+
+    def _process_single(self, db: Session, event_id: int) -> None:
+        """Refaz um evento isolado; se falhar de novo, agenda a próxima tentativa."""
+        now = datetime.utcnow()
+        # Reserva de novo: o lote desfeito liberou os bloqueios
+        events = self._claim(db, now, event_id)
+        if not events:
+            return
+        try:
+            self._apply(db, events)
+            db.commit()
+            self.processed += 1
+            return
+        except Exception as e:
+            db.rollback()
+            error = f"{type(e).__name__}: {e}"
+
+        outbox_event = db.get(OutboxEvent, event_id)
+        if outbox_event is None:
+            return
+        outbox_event.attempts += 1
+        outbox_event.last_error = error[:2000]
+        outbox_event.available_at = now + timedelta(seconds=self._backoff_seconds(outbox_event.attempts))
+        db.commit()
+        self.failed += 1
+        print(f"Evento do outbox {event_id} ({outbox_event.kind}) falhou, tentativa {outbox_event.attempts}: {error}")
+
+    def stats(self, db: Session) -> dict:
+        """Fila pendente, eventos parados e atraso: idade do evento pendente mais antigo."""
+        pending, oldest = db.query(func.count(OutboxEvent.id), func.min(OutboxEvent.created_at)).filter(
+            OutboxEvent.attempts < self.max_attempts
+        ).one()
+        parked = db.query(func.count(OutboxEvent.id)).filter(
+            OutboxEvent.attempts >= self.max_attempts
+        ).scalar()
+        return {
+            "workers": len(self._tasks),
+            "pending": pending,
+            "parked": parked,
+            "lag_seconds": round((datetime.utcnow() - oldest).total_seconds(), 3) if oldest else 0.0,
+            "last_batch_lag_seconds": round(self.last_lag_seconds, 3),
+            "processed": self.processed,
+            "failed": self.failed,
+            "batches": self.batches
+        }
+
+outbox_worker = OutboxWorker(
+    workers=settings.OUTBOX_WORKERS,
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    poll_seconds=settings.OUTBOX_POLL_SECONDS,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+    backoff_base_seconds=settings.OUTBOX_BACKOFF_BASE_SECONDS,
+    backoff_max_seconds=settings.OUTBOX_BACKOFF_MAX_SECONDS
+)
@@ -0,0 +1,56 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_, literal
+
+# Cabeçalho com o cursor da próxima página nas listagens paginadas por keyset
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    return value
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "$dt" in value:
+        return datetime.fromisoformat(value["$dt"])
+    return value
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Serializa os valores da chave de ordenação do último item em um cursor opaco."""
+    payload = json.dumps([_encode_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Inverso de encode_cursor; responde 400 se o cursor estiver malformado."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError("tamanho inesperado")
+        return [_decode_value(value) for value in values]
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor de paginação inválido"
+        )
+
+def keyset_filter(order: Sequence[Tuple[Any, bool]], values: Sequence[Any]):
+    """
+    Condição "depois do cursor" para uma ordenação de várias colunas.
+    order é uma lista de (expressão, descendente); a última coluna deve ser única (ex.: id).
+    """
+    # literal() evita o tratamento especial do SQLAlchemy para comparações com True/False
+    values = [literal(value) for value in values]
+    clauses = []
+    for position, (column, descending) in enumerate(order):
+        equal_prefix = [order[i][0] == values[i] for i in range(position)]
+        after = column < values[position] if descending else column > values[position]
+        clauses.append(and_(*equal_prefix, after))
+    return or_(*clauses)
+
+def order_by_clauses(order: Sequence[Tuple[Any, bool]]) -> list:
+    return [column.desc() if descending else column.asc() for column, descending in order]
@@ -0,0 +1,143 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from back_end.models.reading_event import ReadingEvent
+from back_end.services.pagination import decode_cursor, encode_cursor, keyset_filter, order_by_clauses
+from back_end.services.timeline_service import record_activity
+
+EVENT_TYPES = ("added", "started", "progress", "finished", "rated", "favorited")
+
+DEFAULT_HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 200
+
+# (book_id, entry_id, estado anterior ou None, estado novo), estados no formato de entry_state
+ShelfChange = Tuple[int, Optional[int], Optional[dict], dict]
+
+# Quando uma escrita muda várias coisas de uma vez (ex.: adicionar como lido, avaliado e
+# favorito), o evento gravado é o primeiro desta ordem; o estado final vai junto nele
+EVENT_PRIORITY = ("finished", "started", "rated", "favorited", "progress", "added")
+
+def events_for_change(old_state: Optional[dict], new_state: Optional[dict]) -> List[str]:
+    """Tudo o que uma mudança de entrada fez; vazio se nada relevante mudou."""
+    if new_state is None:
+        return []
+    events = []
+    if old_state is None:
+        events.append("added")
+
+    old_status = old_state["status"] if old_state else None
+    if new_state["status"] != old_status:
+        if new_state["status"] == "reading":
+            events.append("started")
+        elif new_state["status"] == "read":
+            events.append("finished")
+
+    old_pages = (old_state["pages_read"] if old_state else 0) or 0
+    if (new_state["pages_read"] or 0) != old_pages and "finished" not in events:
+        events.append("progress")
+
+    old_rating = old_state["rating"] if old_state else None
+    if new_state["rating"] is not None and new_state["rating"] > 0 and new_state["rating"] != old_rating:
+        events.append("rated")
+
+    if new_state["is_favorite"] and not (old_state and old_state["is_favorite"]):
+        events.append("favorited")
+    return events
+
+def event_for_change(old_state: Optional[dict], new_state: Optional[dict]) -> Optional[str]:
+    """O evento gravado para uma mudança: o mais significativo dela, ou None."""
+    events = events_for_change(old_state, new_state)
+    return next((event_type for event_type in EVENT_PRIORITY if event_type in events), None)
+
+class ReadingEventService:
+    """
+    Grava e lê reading_events. As escritas na estante chamam record/record_many antes do
+    commit, na mesma transação; a distribuição para as timelines é agendada junto. Cada
+    mudança de entrada gera no máximo um evento (event_for_change), e assim um item por
+    seguidor no feed.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def record(self, user_id: int, book_id: int, entry_id: Optional[int], old_state: Optional[dict], new_state: Optional[dict]) -> None:
+        self.record_many(user_id, [(book_id, entry_id, old_state, new_state)])
+
+    def record_many(self, user_id: int, changes: Iterable[ShelfChange]) -> List[int]:
+        """Insere os eventos de várias mudanças de um usuário em um único INSERT. Não faz commit."""
+        now = datetime.utcnow()
+        rows = []
+        for book_id, entry_id, old_state, new_state in changes:
+            event_type = event_for_change(old_state, new_state)
+            if event_type is not None:
+                rows.append({
+                    "user_id": user_id,
+                    "book_id": book_id,
+                    "entry_id": entry_id,
+                    "event_type": event_type,
+                    "status": new_state["status"],
+                    "pages_read": new_state["pages_read"] or 0,
+                    "total_pages": new_state.get("total_pages"),
+                    "rating": new_state["rating"],
+                    "is_favorite": bool(new_state["is_favorite"]),
+                    "created_at": now
+                })
+        if not rows:
+            return []
+        event_ids = self.db.scalars(
+            insert(ReadingEvent).returning(ReadingEvent.id, sort_by_parameter_order=True), rows
+        ).all()
+        record_activity(self.db, user_id, event_ids)
+        return event_ids
+
+    def get_history(
+        self,
+        user_id: int,
+        limit: int = DEFAULT_HISTORY_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        book_id: Optional[int] = None
+    ) -> Tuple[List[ReadingEvent], Optional[str]]:
+        """Eventos do usuário, do mais recente ao mais antigo, paginados por (created_at, id)."""
+        limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+        order = [(ReadingEvent.created_at, True), (ReadingEvent.id, True)]
+
+        query = self.db.query(ReadingEvent).filter(ReadingEvent.user_id == user_id)
+        if book_id is not None:
+            query = query.filter(ReadingEvent.book_id == book_id)
+        if cursor:
+            query = query.filter(keyset_filter(order, decode_cursor(cursor, len(order))))
+        events = query.order_by(*order_by_clauses(order)).limit(limit + 1).all()
+
+        next_cursor = None
+        if len(events) > limit:
+            events = events[:limit]
+            next_cursor = encode_cursor([events[-1].created_at, events[-1].id])
+        return events, next_cursor
+
+    def get_monthly_summary(self, user_id: int, months: int = 12) -> List[Dict]:
+        """
+        Quantidade de eventos de cada tipo por mês nos últimos `months` meses (incluindo o
+        atual), do mais antigo ao mais novo. Meses sem eventos não aparecem. Cada escrita
+        conta uma vez, pelo tipo do seu evento (ver EVENT_PRIORITY).
+        """
+        now = datetime.utcnow()
+        first_month = now.year * 12 + now.month - 1 - (months - 1)
+        since = datetime(first_month // 12, first_month % 12 + 1, 1)
+        if self.db.get_bind().dialect.name == "sqlite":
+            month = func.strftime("%Y-%m", ReadingEvent.created_at)
+        else:
+            month = func.to_char(func.date_trunc("month", ReadingEvent.created_at), "YYYY-MM")
+        rows = self.db.query(
+            month.label("month"), ReadingEvent.event_type, func.count()
+        ).filter(
+            ReadingEvent.user_id == user_id,
+            ReadingEvent.created_at >= since
+        ).group_by(month, ReadingEvent.event_type).all()
+
+        summary = {}
+        for month_key, event_type, count in rows:
+            summary.setdefault(month_key, {event: 0 for event in EVENT_TYPES})[event_type] = count
+        return [{"month": month_key, **counts} for month_key, counts in sorted(summary.items())]
@@ -0,0 +1,214 @@
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import and_, case, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from back_end.models.bookshelf import UserBookshelf
+from back_end.models.reading_stats import UserReadingStats
+
+STAT_FIELDS = ("total", "to_read", "reading", "read", "rated_count", "rating_sum", "favorites", "pages_read")
+
+def entry_state(entry) -> dict:
+    """Campos de uma entrada da estante usados pelas estatísticas do usuário e pelos eventos de leitura."""
+    return {
+        "status": entry.status,
+        "rating": entry.rating,
+        "is_favorite": entry.is_favorite,
+        "pages_read": entry.pages_read,
+        "total_pages": entry.total_pages
+    }
+
+def stats_contribution(state: Optional[dict]) -> Dict[str, float]:
+    """Quanto uma entrada (ou nenhuma, se state for None) soma a cada estatística."""
+    if state is None:
+        return {field: 0 for field in STAT_FIELDS}
+    rated = state["status"] == "read" and state["rating"] is not None and state["rating"] > 0
+    return {
+        "total": 1,
+        "to_read": int(state["status"] == "to_read"),
+        "reading": int(state["status"] == "reading"),
+        "read": int(state["status"] == "read"),
+        "rated_count": int(rated),
+        "rating_sum": state["rating"] if rated else 0.0,
+        "favorites": int(bool(state["is_favorite"])),
+        "pages_read": state["pages_read"] or 0
+    }
+
+def stats_delta(old_state: Optional[dict], new_state: Optional[dict]) -> Dict[str, float]:
+    old = stats_contribution(old_state)
+    new = stats_contribution(new_state)
+    return {field: new[field] - old[field] for field in STAT_FIELDS}
+
+class ReadingStatsService:
+    """
+    Mantém a tabela user_reading_stats. As escritas na estante chamam ensure_row antes
+    de alterar a entrada e apply_change/apply_delta antes do commit, na mesma transação.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _insert(self):
+        dialect = self.db.get_bind().dialect.name
+        return sqlite.insert if dialect == "sqlite" else postgresql.insert
+
+    def _aggregate_query(self):
+        """Estatísticas calculadas a partir das entradas da estante, agrupadas por usuário."""
+        rated = and_(
+            UserBookshelf.status == "read",
+            UserBookshelf.rating.isnot(None),
+            UserBookshelf.rating > 0
+        )
+        return self.db.query(
+            UserBookshelf.user_id.label("user_id"),
+            func.count(UserBookshelf.id).label("total"),
+            func.sum(case((UserBookshelf.status == "to_read", 1), else_=0)).label("to_read"),
+            func.sum(case((UserBookshelf.status == "reading", 1), else_=0)).label("reading"),
+            func.sum(case((UserBookshelf.status == "read", 1), else_=0)).label("read"),
+            func.sum(case((rated, 1), else_=0)).label("rated_count"),
+            func.sum(case((rated, UserBookshelf.rating), else_=0.0)).label("rating_sum"),
+            func.sum(case((UserBookshelf.is_favorite.is_(True), 1), else_=0)).label("favorites"),
+            func.coalesce(func.sum(UserBookshelf.pages_read), 0).label("pages_read")
+        ).group_by(UserBookshelf.user_id)
+
+    def _computed_stats(self, user_ids: Optional[Iterable[int]] = None) -> Dict[int, dict]:
+        query = self._aggregate_query()
+        if user_ids is not None:
+            query = query.filter(UserBookshelf.user_id.in_(list(user_ids)))
+        return {
+            row.user_id: {field: getattr(row, field) or 0 for field in STAT_FIELDS}
+            for row in query.all()
+        }
+
+    def ensure_row(self, user_id: int) -> None:
+        """
+        Garante a linha do usuário, calculando-a da estante se ainda não existir
+        (usuários anteriores ao backfill). Deve rodar antes de alterar a estante.
+        """
+        exists = self.db.query(UserReadingStats.user_id).filter(UserReadingStats.user_id == user_id).first()
+        if exists:
+            return
+        values = self._computed_stats([user_id]).get(user_id, {field: 0 for field in STAT_FIELDS})
+        insert = self._insert()
+        self.db.execute(
+            insert(UserReadingStats).values(user_id=user_id, **values).on_conflict_do_nothing(
+                index_elements=[UserReadingStats.user_id]
+            )
+        )
+
+    def apply_change(self, user_id: int, old_state: Optional[dict], new_state: Optional[dict]) -> None:
+        self.apply_delta(user_id, stats_delta(old_state, new_state))
+
+    def apply_delta(self, user_id: int, delta: Dict[str, float]) -> None:
+        """Soma a variação à linha do usuário com um UPSERT atômico. Não faz commit."""
+        if not any(delta.values()):
+            return
+        insert = self._insert()
+        statement = insert(UserReadingStats).values(user_id=user_id, **delta)
+        statement = statement.on_conflict_do_update(
+            index_elements=[UserReadingStats.user_id],
+            set_={
+                **{field: getattr(UserReadingStats, field) + statement.excluded[field] for field in STAT_FIELDS},
+                "updated_at": func.now()
+            }
+        )
+        self.db.execute(statement)
+
+    def get_stats(self, user_id: int) -> Dict[str, float]:
+        """
+        Estatísticas do usuário. Sem linha ainda (anterior ao backfill ou usuário
+        inexistente), calcula da estante sem gravar: a linha nasce na próxima escrita.
+        """
+        stats = self.db.query(UserReadingStats).filter(UserReadingStats.user_id == user_id).first()
+        if stats is None:
+            return self._computed_stats([user_id]).get(user_id, {field: 0 for field in STAT_FIELDS})
+        return {field: getattr(stats, field) for field in STAT_FIELDS}
+
+    def get_bookshelf_stats(self, user_id: int) -> dict:
+        stats = self.get_stats(user_id)
+        return {
+            "total": stats["total"],
+            "want_to_read": stats["to_read"],
+            "reading": stats["reading"],
+            "read": stats["read"]
+        }
+
+    def get_bookshelf_stats_many(self, user_ids: Iterable[int]) -> Dict[int, dict]:
+        """
+        get_bookshelf_stats de vários usuários em uma consulta. Usuários sem linha
+        ainda (anteriores ao backfill) são calculados juntos com uma agregação agrupada.
+        """
+        user_ids = set(user_ids)
+        if not user_ids:
+            return {}
+        rows = {
+            row.user_id: {"total": row.total, "want_to_read": row.to_read, "reading": row.reading, "read": row.read}
+            for row in self.db.query(
+                UserReadingStats.user_id, UserReadingStats.total, UserReadingStats.to_read,
+                UserReadingStats.reading, UserReadingStats.read
+            ).filter(UserReadingStats.user_id.in_(user_ids)).all()
+        }
+        missing = user_ids - set(rows)
+        if missing:
+            computed = self._computed_stats(missing)
+            for user_id in missing:
+                values = computed.get(user_id, {field: 0 for field in STAT_FIELDS})
+                rows[user_id] = {
+                    "total": values["total"],
+                    "want_to_read": values["to_read"],
+                    "reading": values["reading"],
+                    "read": values["read"]
+                }
+        return rows
+
+    def get_average_rating(self, user_id: int) -> dict:
+        stats = self.get_stats(user_id)
+        if not stats["rated_count"]:
+            return {
+                "average_rating": 0.0,
+                "total_rated_books": 0,
+                "total_read_books": 0,
+                "message": "Nenhum livro avaliado encontrado"
+            }
+        return {
+            "average_rating": round(stats["rating_sum"] / stats["rated_count"], 2),
+            "total_rated_books": stats["rated_count"],
+            "total_read_books": stats["read"],
+            "message": f"Média calculada com base em {stats['rated_count']} livros avaliados"
+        }
+
+    def reconcile(self, fix: bool = False) -> dict:
+        """
+        Compara user_reading_stats com as estatísticas recalculadas da estante.
+        Com fix=True, reescreve (ou cria) as linhas divergentes.
+        """
+        expected = self._computed_stats()
+        stored = {
+            row.user_id: {field: getattr(row, field) for field in STAT_FIELDS}
+            for row in self.db.query(UserReadingStats).all()
+        }
+        zeros = {field: 0 for field in STAT_FIELDS}
+
+        mismatches = []
+        for user_id in sorted(set(expected) | set(stored)):
+            real = expected.get(user_id, zeros)
+            current = stored.get(user_id)
+            if current is not None and all(abs(current[field] - real[field]) < 1e-6 for field in STAT_FIELDS):
+                continue
+            mismatches.append({"user_id": user_id, "stored": current, "expected": real})
+            if fix:
+                insert = self._insert()
+                statement = insert(UserReadingStats).values(user_id=user_id, **real)
+                self.db.execute(statement.on_conflict_do_update(
+                    index_elements=[UserReadingStats.user_id],
+                    set_={field: statement.excluded[field] for field in STAT_FIELDS}
+                ))
+        if fix and mismatches:
+            self.db.commit()
+
+        return {
+            "mismatched_users": len(mismatches),
+            "fixed": fix,
+            "mismatches": mismatches
+        }
@@ -0,0 +1,183 @@
+import heapq
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from back_end.configs.settings import settings
+from back_end.models.base import SessionLocal
+from back_end.models.user import user_follows
+from back_end.services.cache import LRUTTLCache
+
+# Follows/unfollows da transação corrente, aplicados ao grafo só depois do commit
+_PENDING_KEY = "social_graph_pending_edges"
+
+class SocialGraph:
+    """
+    Grafo de quem segue quem, em memória, para as sugestões de amigos de amigos.
+    A carga de user_follows fica em CSR: os seguidos do usuário u são
+    neighbors[offsets[u]:offsets[u + 1]], ordenados (ids de usuário indexam offsets
+    diretamente). CSR não aceita inserções baratas, então follows e unfollows posteriores
+    ficam numa camada por usuário (_added/_removed) consultada junto. A cada
+    SOCIAL_GRAPH_RELOAD_SECONDS o grafo é recarregado em segundo plano, o que zera a
+    camada e traz as mudanças feitas por outros processos.
+    """
+
+    def __init__(self, reload_seconds: float):
+        self.reload_seconds = reload_seconds
+        self._lock = threading.Lock()
+        self._offsets = array("q", [0])
+        self._neighbors = array("i")
+        self._added: Dict[int, Set[int]] = {}
+        self._removed: Dict[int, Set[int]] = {}
+        # Mudanças aplicadas durante uma recarga; reaplicadas sobre o grafo novo
+        self._replay: Optional[List[Tuple[int, int, bool]]] = None
+        self._loading = False
+        self.loaded_at: Optional[float] = None
+        self.load_seconds = 0.0
+
+    def load(self) -> None:
+        """Lê user_follows inteiro em ordem de (follower_id, following_id) e troca o grafo."""
+        with self._lock:
+            self._replay = []
+        try:
+            started = time.monotonic()
+            offsets = array("q", [0])
+            neighbors = array("i")
+            db = SessionLocal()
+            try:
+                rows = db.execute(
+                    select(user_follows.c.follower_id, user_follows.c.following_id).order_by(
+                        user_follows.c.follower_id, user_follows.c.following_id
+                    ).execution_options(yield_per=10000)
+                )
+                for follower_id, following_id in rows:
+                    # Usuários sem seguidos entre o anterior e este ficam com linha vazia
+                    while len(offsets) <= follower_id:
+                        offsets.append(len(neighbors))
+                    neighbors.append(following_id)
+            finally:
+                db.close()
+            offsets.append(len(neighbors))
+
+            with self._lock:
+                replay, self._replay = self._replay, None
+                self._offsets, self._neighbors = offsets, neighbors
+                self._added, self._removed = {}, {}
+                for follower_id, following_id, following in replay:
+                    self._apply(follower_id, following_id, following)
+                self.loaded_at = time.monotonic()
+                self.load_seconds = self.loaded_at - started
+        except Exception:
+            with self._lock:
+                self._replay = None
+            raise
+
+    def ensure_fresh(self) -> None:
+        """Carrega na primeira vez; depois, se passou do prazo, recarrega numa thread sem bloquear."""
+        loaded_at = self.loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < self.reload_seconds:
+            return
+        with self._lock:
+            if self._loading:
+                return
+            self._loading = True
+        if loaded_at is None:
+            self._reload()
+        else:
+            threading.Thread(target=self._reload, name="social-graph-reload", daemon=True).start()
+
+    def _reload(self) -> None:
+        try:
+            self.load()
+        except Exception as e:
+            print(f"Erro ao recarregar o grafo de seguidores: {e}")
+        finally:
+            with self._lock:
+                self._loading = False
+
+    def _apply(self, follower_id: int, following_id: int, following: bool) -> None:
+        added = self._added.setdefault(follower_id, set())
+        removed = self._removed.setdefault(follower_id, set())
+        if following:
+            removed.discard(following_id)
+            added.add(following_id)
+        else:
+            added.discard(following_id)
+            removed.add(following_id)
+
+    def apply_changes(self, changes: List[Tuple[int, int, bool]]) -> None:
+        """Aplica (follower_id, following_id, segue?) já confirmados no banco, em ordem."""
+        with self._lock:
+            for change in changes:
+                self._apply(*change)
+                if self._replay is not None:
+                    self._replay.append(change)
+
+    def _following(self, user_id: int) -> Set[int]:
+        """Seguidos de user_id: linha do CSR mais a camada de mudanças. Chamar com o lock."""
+        if user_id + 1 < len(self._offsets):
+            following = set(self._neighbors[self._offsets[user_id]:self._offsets[user_id + 1]])
+        else:
+            following = set()
+        removed = self._removed.get(user_id)
+        if removed:
+            following -= removed
+        added = self._added.get(user_id)
+        if added:
+            following |= added
+        return following
+
+    def friends_of_friends(self, user_id: int, limit: int) -> List[Tuple[int, int]]:
+        """
+        Os `limit` usuários seguidos por mais seguidos de user_id que ele ainda não segue,
+        como (id, quantidade de conexões em comum), do maior para o menor.
+        """
+        with self._lock:
+            following = self._following(user_id)
+            mutuals = Counter()
+            for followed_id in following:
+                mutuals.update(self._following(followed_id))
+        for excluded_id in following | {user_id}:
+            mutuals.pop(excluded_id, None)
+        return heapq.nlargest(limit, mutuals.items(), key=lambda item: (item[1], -item[0]))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "users": len(self._offsets) - 1,
+                "edges": len(self._neighbors),
+                "pending_added": sum(len(s) for s in self._added.values()),
+                "pending_removed": sum(len(s) for s in self._removed.values()),
+                "bytes": self._offsets.itemsize * len(self._offsets) + self._neighbors.itemsize * len(self._neighbors),
+                "age_seconds": round(time.monotonic() - self.loaded_at, 1) if self.loaded_at else None,
+                "load_seconds": round(self.load_seconds, 3)
+            }
+
+social_graph = SocialGraph(settings.SOCIAL_GRAPH_RELOAD_SECONDS)
+
+# Top-k sugestões já ordenadas de cada usuário: lista de (id, em comum, livros em comum)
+follow_suggestions_cache = LRUTTLCache(
+    settings.FOLLOW_SUGGESTIONS_CACHE_SIZE, settings.FOLLOW_SUGGESTIONS_CACHE_TTL_SECONDS
+)
+
+def record_follow_change(session: Session, follower_id: int, following_id: int, following: bool) -> None:
+    """Atualiza o grafo em memória quando a transação corrente for confirmada."""
+    session.info.setdefault(_PENDING_KEY, []).append((follower_id, following_id, following))
+
+@event.listens_for(Session, "after_commit")
+def _apply_follow_changes(session):
+    changes = session.info.pop(_PENDING_KEY, None)
+    if not changes:
+        return
+    social_graph.apply_changes(changes)
+    for follower_id, _, _ in changes:
+        follow_suggestions_cache.invalidate(follower_id)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_follow_changes(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,215 @@
+import heapq
+from datetime import datetime
+from typing import Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import Integer, bindparam, literal, select, text, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from back_end.configs.settings import settings
+from back_end.models.reading_event import ReadingEvent
+from back_end.models.timeline import TimelineItem
+from back_end.models.user import User, user_follows
+from back_end.services.feed_cache import mark_feeds_changed
+from back_end.services.follow_graph import FollowGraphRepository
+from back_end.services.outbox import enqueue, outbox_handler
+
+# Posição de um item no feed: (momento do evento, id do evento)
+FeedPosition = Tuple[datetime, int]
+
+def record_activity(session: Session, author_id: int, event_ids: Iterable[int]) -> None:
+    """Grava no outbox a distribuição de eventos de leitura para os seguidores do autor."""
+    event_ids = list(event_ids)
+    if event_ids:
+        enqueue(session, "timeline.activity", {"author_id": author_id, "event_ids": event_ids})
+
+def record_follow(session: Session, follower_id: int, followed_id: int) -> None:
+    """Grava no outbox a cópia das atividades recentes do seguido para a timeline do seguidor."""
+    enqueue(session, "timeline.follow_changed", {"follower_id": follower_id, "followed_id": followed_id})
+
+def record_unfollow(session: Session, follower_id: int, followed_id: int) -> None:
+    """Grava no outbox a remoção das atividades do ex-seguido da timeline do seguidor."""
+    enqueue(session, "timeline.follow_changed", {"follower_id": follower_id, "followed_id": followed_id})
+
+@outbox_handler("timeline.activity")
+def _fan_out_activities(db: Session, payloads: List[dict]) -> None:
+    """
+    Distribui as atividades do lote, com um INSERT ... SELECT por autor. Só as timelines
+    que receberam linhas têm a versão do feed incrementada: seguidores de autores lidos
+    na hora não são percorridos, e as páginas deles em cache expiram pelo TTL.
+    """
+    event_ids_by_author = {}
+    for payload in payloads:
+        event_ids_by_author.setdefault(payload["author_id"], set()).update(payload["event_ids"])
+    timeline = TimelineService(db)
+    changed_owners = set()
+    for author_id, event_ids in event_ids_by_author.items():
+        changed_owners.update(timeline.fan_out(author_id, event_ids))
+    mark_feeds_changed(db, changed_owners)
+
+@outbox_handler("timeline.follow_changed")
+def _sync_followed_authors(db: Session, payloads: List[dict]) -> None:
+    """
+    Leva a timeline do seguidor ao estado atual da relação, e não ao do evento: follow e
+    unfollow do mesmo par podem chegar em lotes diferentes, em qualquer ordem.
+    """
+    pairs = {(payload["follower_id"], payload["followed_id"]) for payload in payloads}
+    timeline, follow_graph = TimelineService(db), FollowGraphRepository(db)
+    for follower_id, followed_id in pairs:
+        if follow_graph.is_following(follower_id, followed_id):
+            timeline.add_author(follower_id, followed_id)
+        else:
+            timeline.remove_author(follower_id, followed_id)
+    mark_feeds_changed(db, {follower_id for follower_id, _ in pairs})
+
+class TimelineService:
+    """
+    Feed materializado em timeline_items (fan-out na escrita). Autores com mais de
+    TIMELINE_FANOUT_MAX_FOLLOWERS seguidores não são distribuídos: get_feed_positions lê
+    a estante deles na hora e intercala com a timeline. Cada timeline guarda no máximo
+    TIMELINE_MAX_ITEMS itens.
+    """
+
+    # Uma passada pelo índice (owner_id, created_at DESC, event_id DESC) de cada timeline
+    # pedida; só as linhas além do limite são apagadas (e bloqueadas)
+    TRIM_SQL = text("""
+        DELETE FROM timeline_items
+        WHERE (owner_id, event_id) IN (
+            SELECT owner_id, event_id FROM (
+                SELECT owner_id, event_id,
+                       row_number() OVER (
+                           PARTITION BY owner_id ORDER BY created_at DESC, event_id DESC
+                       ) AS position
+                FROM timeline_items
+                WHERE owner_id IN :owner_ids
+            ) AS ranked
+            WHERE position > :max_items
+        )
+    """).bindparams(bindparam("owner_ids", expanding=True))
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.max_items = settings.TIMELINE_MAX_ITEMS
+        self.max_fanout_followers = settings.TIMELINE_FANOUT_MAX_FOLLOWERS
+
+    def _insert(self):
+        dialect = self.db.get_bind().dialect.name
+        return sqlite.insert if dialect == "sqlite" else postgresql.insert
+
+    def _is_pulled_author(self, author_id: int) -> bool:
+        # Mesmo critério de _pulled_author_ids: contador ainda não preenchido conta como distribuído
+        followers_count = self.db.query(User.followers_count).filter(User.id == author_id).scalar()
+        return followers_count is not None and followers_count > self.max_fanout_followers
+
+    def _insert_items(self, source) -> Set[int]:
+        """
+        Insere (owner_id, author_id, event_id, created_at) de um SELECT, ignorando repetidos.
+        Retorna os donos das timelines que receberam alguma linha nova.
+        """
+        insert = self._insert()
+        statement = insert(TimelineItem).from_select(
+            ["owner_id", "author_id", "event_id", "created_at"], source
+        ).on_conflict_do_nothing(
+            index_elements=[TimelineItem.owner_id, TimelineItem.event_id]
+        ).returning(TimelineItem.owner_id)
+        return {row[0] for row in self.db.execute(statement)}
+
+    def fan_out(self, author_id: int, event_ids: Iterable[int]) -> Set[int]:
+        """
+        Copia os eventos para a timeline de cada seguidor do autor com um único INSERT ... SELECT
+        e apara só as timelines que cresceram. Retorna os seguidores cuja timeline mudou.
+        """
+        event_ids = list(event_ids)
+        if not event_ids or self._is_pulled_author(author_id):
+            return set()
+        source = select(
+            user_follows.c.follower_id,
+            ReadingEvent.user_id,
+            ReadingEvent.id,
+            ReadingEvent.created_at
+        ).join(
+            ReadingEvent, ReadingEvent.user_id == user_follows.c.following_id
+        ).where(
+            ReadingEvent.user_id == author_id,
+            ReadingEvent.id.in_(event_ids)
+        )
+        owner_ids = self._insert_items(source)
+        self.trim(owner_ids)
+        return owner_ids
+
+    def add_author(self, owner_id: int, author_id: int) -> None:
+        """Preenche a timeline de quem passou a seguir com os eventos recentes do autor."""
+        if self._is_pulled_author(author_id):
+            return
+        recent = select(ReadingEvent.id, ReadingEvent.created_at).where(
+            ReadingEvent.user_id == author_id
+        ).order_by(ReadingEvent.created_at.desc(), ReadingEvent.id.desc()).limit(self.max_items).subquery()
+        # WHERE explícito: o SQLite não interpreta INSERT ... SELECT ... ON CONFLICT sem ele
+        source = select(
+            literal(owner_id, Integer),
+            literal(author_id, Integer),
+            recent.c.id,
+            recent.c.created_at
+        ).where(recent.c.id.isnot(None))
+        self.trim(self._insert_items(source))
+
+    def remove_author(self, owner_id: int, author_id: int) -> None:
+        self.db.query(TimelineItem).filter(
+            TimelineItem.owner_id == owner_id,
+            TimelineItem.author_id == author_id
+        ).delete(synchronize_session=False)
+
+    def trim(self, owner_ids: Iterable[int]) -> None:
+        """Apaga de cada timeline os itens além dos TIMELINE_MAX_ITEMS mais recentes."""
+        owner_ids = sorted(set(owner_ids))
+        if owner_ids:
+            self.db.execute(self.TRIM_SQL, {"owner_ids": owner_ids, "max_items": self.max_items})
+
+    def _pulled_author_ids(self, owner_id: int) -> List[int]:
+        rows = self.db.query(User.id).join(user_follows, user_follows.c.following_id == User.id).filter(
+            user_follows.c.follower_id == owner_id,
+            User.followers_count > self.max_fanout_followers
+        ).all()
+        return [row[0] for row in rows]
+
+    def get_feed_positions(
+        self,
+        owner_id: int,
+        limit: int,
+        before: Optional[FeedPosition] = None
+    ) -> List[FeedPosition]:
+        """
+        Itens mais recentes do feed (momento, id do evento), do mais novo para o mais antigo:
+        a timeline materializada intercalada com os eventos dos autores lidos na hora.
+        """
+        timeline = self.db.query(TimelineItem.created_at, TimelineItem.event_id).filter(
+            TimelineItem.owner_id == owner_id
+        )
+        if before:
+            timeline = timeline.filter(tuple_(TimelineItem.created_at, TimelineItem.event_id) < tuple_(*before))
+        sources = [
+            timeline.order_by(TimelineItem.created_at.desc(), TimelineItem.event_id.desc()).limit(limit).all()
+        ]
+
+        pulled_ids = self._pulled_author_ids(owner_id)
+        if pulled_ids:
+            pulled = self.db.query(ReadingEvent.created_at, ReadingEvent.id).filter(
+                ReadingEvent.user_id.in_(pulled_ids)
+            )
+            if before:
+                pulled = pulled.filter(tuple_(ReadingEvent.created_at, ReadingEvent.id) < tuple_(*before))
+            sources.append(
+                pulled.order_by(ReadingEvent.created_at.desc(), ReadingEvent.id.desc()).limit(limit).all()
+            )
+
+        merged = heapq.merge(*[[tuple(row) for row in rows] for rows in sources], reverse=True)
+        positions, seen = [], set()
+        for position in merged:
+            # Autor que passou do limite de seguidores pode estar nas duas fontes
+            if position[1] in seen:
+                continue
+            seen.add(position[1])
+            positions.append(position)
+            if len(positions) == limit:
+                break
+        return positions
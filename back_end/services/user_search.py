@@ -0,0 +1,231 @@
+import unicodedata
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from back_end.models.user import User
+from back_end.services.book_search import tokenize_query
+
+# Termos menores que isso não geram trigramas; só casam por prefixo
+MIN_TRIGRAM_TERM_LENGTH = 3
+
+# Bônus somados à relevância: username idêntico > username começando pelo termo > resto
+EXACT_USERNAME_BOOST = 2.0
+PREFIX_USERNAME_BOOST = 1.0
+
+# Posição depois da qual continuar a busca: (relevância, id) do último resultado
+SearchPosition = Tuple[float, int]
+
+def fold_search_term(value: str) -> str:
+    """Termo como as colunas indexadas: sem acentos e em minúsculas."""
+    decomposed = unicodedata.normalize("NFKD", value.strip())
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+class UserSearchBackend(ABC):
+    """
+    Interface comum dos motores de busca de usuários. search devolve (relevância, id)
+    ordenados por relevância decrescente e id, começando depois de after.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @abstractmethod
+    def search(
+        self,
+        query: str,
+        exclude_id: Optional[int],
+        limit: int,
+        after: Optional[SearchPosition] = None
+    ) -> List[SearchPosition]:
+        """Uma página de (relevância, id) dos usuários que casam com query."""
+        pass
+
+class PostgresUserSearchBackend(UserSearchBackend):
+    """
+    Similaridade por trigramas sobre username e full_name sem acentos, com os índices
+    GIN (gin_trgm_ops) e de prefixo criados pela migração add_user_search_index.
+    """
+
+    SEARCH_SQL = """
+        SELECT score, id FROM (
+            SELECT u.id,
+                   round((
+                       CASE WHEN public.immutable_unaccent(lower(u.username)) = :term THEN :exact_boost
+                            WHEN public.immutable_unaccent(lower(u.username)) LIKE :prefix THEN :prefix_boost
+                            ELSE 0 END
+                       + greatest(
+                           similarity(public.immutable_unaccent(lower(u.username)), :term),
+                           similarity(public.immutable_unaccent(lower(coalesce(u.full_name, ''))), :term)
+                       )
+                   )::numeric, 6) AS score
+            FROM users AS u
+            WHERE ({conditions}) AND (CAST(:exclude_id AS integer) IS NULL OR u.id <> :exclude_id)
+        ) AS ranked
+        WHERE CAST(:after_score AS numeric) IS NULL
+              OR score < CAST(:after_score AS numeric)
+              OR (score = CAST(:after_score AS numeric) AND id > :after_id)
+        ORDER BY score DESC, id
+        LIMIT :limit
+    """
+
+    PREFIX_CONDITIONS = [
+        "public.immutable_unaccent(lower(u.username)) LIKE :prefix",
+        "public.immutable_unaccent(lower(coalesce(u.full_name, ''))) LIKE :prefix"
+    ]
+
+    TRIGRAM_CONDITIONS = [
+        "public.immutable_unaccent(lower(u.username)) % :term",
+        "public.immutable_unaccent(lower(coalesce(u.full_name, ''))) % :term",
+        "public.immutable_unaccent(lower(u.username)) LIKE :contains",
+        "public.immutable_unaccent(lower(coalesce(u.full_name, ''))) LIKE :contains"
+    ]
+
+    def search(self, query, exclude_id, limit, after=None):
+        term = fold_search_term(query)
+        if not term:
+            return []
+        # Termos curtos com %/LIKE '%x%' varreriam a tabela inteira; ficam só no prefixo
+        conditions = list(self.PREFIX_CONDITIONS)
+        if len(term) >= MIN_TRIGRAM_TERM_LENGTH:
+            conditions += self.TRIGRAM_CONDITIONS
+        statement = text(self.SEARCH_SQL.format(conditions=" OR ".join(conditions)))
+        rows = self.db.execute(statement, {
+            "term": term,
+            "prefix": f"{escape_like(term)}%",
+            "contains": f"%{escape_like(term)}%",
+            "exact_boost": EXACT_USERNAME_BOOST,
+            "prefix_boost": PREFIX_USERNAME_BOOST,
+            "exclude_id": exclude_id,
+            # numeric como texto para comparar exatamente com o valor devolvido antes
+            "after_score": str(after[0]) if after else None,
+            "after_id": after[1] if after else None,
+            "limit": limit
+        })
+        return [(float(score), user_id) for score, user_id in rows]
+
+class SQLiteUserSearchBackend(UserSearchBackend):
+    """
+    Mesma busca sobre uma tabela virtual FTS5 (users_fts) sincronizada por triggers,
+    para rodar localmente e em testes. Casa termos por prefixo, sem tolerância a erros.
+    """
+
+    _ready_engines = set()
+
+    SCHEMA_SQL = [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+            username, full_name,
+            content='users', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN
+            INSERT INTO users_fts(rowid, username, full_name)
+            VALUES (new.id, new.username, new.full_name);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN
+            INSERT INTO users_fts(users_fts, rowid, username, full_name)
+            VALUES ('delete', old.id, old.username, old.full_name);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE OF username, full_name ON users BEGIN
+            INSERT INTO users_fts(users_fts, rowid, username, full_name)
+            VALUES ('delete', old.id, old.username, old.full_name);
+            INSERT INTO users_fts(rowid, username, full_name)
+            VALUES (new.id, new.username, new.full_name);
+        END
+        """,
+        "INSERT INTO users_fts(users_fts) VALUES ('rebuild')"
+    ]
+
+    SEARCH_SQL = text("""
+        SELECT score, id FROM (
+            SELECT users_fts.rowid AS id,
+                   round(
+                       CASE WHEN fold_search_term(users.username) = :term THEN :exact_boost
+                            WHEN fold_search_term(users.username) LIKE :prefix ESCAPE '\\' THEN :prefix_boost
+                            ELSE 0 END
+                       - bm25(users_fts, 5.0, 1.0),
+                       6
+                   ) AS score
+            FROM users_fts
+            JOIN users ON users.id = users_fts.rowid
+            WHERE users_fts MATCH :match AND (:exclude_id IS NULL OR users_fts.rowid <> :exclude_id)
+        ) AS ranked
+        WHERE :after_score IS NULL
+              OR score < :after_score
+              OR (score = :after_score AND id > :after_id)
+        ORDER BY score DESC, id
+        LIMIT :limit
+    """)
+
+    def ensure_schema(self) -> None:
+        """Cria a tabela FTS5 e os triggers uma vez por engine, indexando os usuários existentes."""
+        engine = self.db.get_bind()
+        if id(engine) in self._ready_engines:
+            return
+        with engine.begin() as conn:
+            exists = conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users_fts'"
+            ).first()
+            if not exists:
+                for statement in self.SCHEMA_SQL:
+                    conn.exec_driver_sql(statement)
+        self._ready_engines.add(id(engine))
+
+    def search(self, query, exclude_id, limit, after=None):
+        terms = tokenize_query(fold_search_term(query))
+        if not terms:
+            return []
+        self.ensure_schema()
+        # Mesma normalização nos dois lados dos bônus, como o immutable_unaccent do Postgres
+        self.db.connection().connection.dbapi_connection.create_function(
+            "fold_search_term", 1, fold_search_term, deterministic=True
+        )
+        term = fold_search_term(query)
+        rows = self.db.execute(self.SEARCH_SQL, {
+            "match": " ".join(f'"{token}"*' for token in terms),
+            "term": term,
+            "prefix": f"{escape_like(term)}%",
+            "exact_boost": EXACT_USERNAME_BOOST,
+            "prefix_boost": PREFIX_USERNAME_BOOST,
+            "exclude_id": exclude_id,
+            "after_score": after[0] if after else None,
+            "after_id": after[1] if after else None,
+            "limit": limit
+        })
+        return [(score, user_id) for score, user_id in rows]
+
+class LikeUserSearchBackend(UserSearchBackend):
+    """Fallback para outros bancos: ILIKE nas duas colunas, sem ranking (relevância 0)."""
+
+    def search(self, query, exclude_id, limit, after=None):
+        search_query = f"%{query.strip()}%"
+        statement = self.db.query(User.id).filter(
+            User.username.ilike(search_query) | User.full_name.ilike(search_query)
+        )
+        if exclude_id is not None:
+            statement = statement.filter(User.id != exclude_id)
+        if after:
+            statement = statement.filter(User.id > after[1])
+        rows = statement.order_by(User.id).limit(limit).all()
+        return [(0.0, row[0]) for row in rows]
+
+def get_user_search_backend(db: Session) -> UserSearchBackend:
+    """Escolhe o motor de busca de acordo com o banco da sessão."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return PostgresUserSearchBackend(db)
+    if dialect == "sqlite":
+        return SQLiteUserSearchBackend(db)
+    return LikeUserSearchBackend(db)
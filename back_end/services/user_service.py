@@ -1,20 +1,54 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func, case, or_
 from passlib.context import CryptContext
+from pydantic import TypeAdapter
 
-from back_end.models.user import User
-from back_end.models.bookshelf import UserBookshelf
-from back_end.models.notification import Notification
+from back_end.models.user import User, user_follows
+from back_end.models.bookshelf import UserBookshelf, Book
+from back_end.models.reading_event import ReadingEvent
 from back_end.schemas.user import UserResponse, UserUpdate, UserSearchResponse
+from back_end.schemas.bookshelf import FeedEntry
 from back_end.services.user_factory import UserFactory
+from back_end.services.reading_stats_service import ReadingStatsService
+from back_end.services.follow_graph import FollowGraphRepository
+from back_end.services.outbox import enqueue
+from back_end.services.feed_cache import feed_cache, feed_cache_key, feed_etag
+from back_end.services.feed_fragments import feed_fragments
+from back_end.services.timeline_service import TimelineService, record_follow, record_unfollow
+from back_end.services.user_search import get_user_search_backend
+from back_end.services.pagination import decode_cursor, encode_cursor, keyset_filter, order_by_clauses
+from back_end.services.social_graph import follow_suggestions_cache, record_follow_change, social_graph
+from back_end.configs.settings import settings
+
+DEFAULT_USER_LIST_PAGE_SIZE = 50
+MAX_USER_LIST_PAGE_SIZE = 100
+DEFAULT_USER_SEARCH_PAGE_SIZE = 20
+
+DEFAULT_FOLLOW_SUGGESTIONS = 10
+
+DEFAULT_FEED_PAGE_SIZE = 20
+MAX_FEED_PAGE_SIZE = 50
+
+# activity_type do FeedEntry (usado pelo front-end) para cada tipo de evento de leitura
+FEED_ACTIVITY_TYPES = {
+    "added": "added_to_shelf",
+    "started": "started_reading",
+    "progress": "progress",
+    "finished": "completed",
+    "rated": "rating",
+    "favorited": "favorite"
+}
+
+feed_entry_adapter = TypeAdapter(FeedEntry)
 
 class UserService:
     def __init__(self, db: Session):
         self.db = db
         self.user_factory = UserFactory()
+        self.follow_graph = FollowGraphRepository(db)
 
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         return self.user_factory.pwd_context.verify(plain_password, hashed_password)
@@ -29,43 +63,16 @@ class UserService:
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Usuário não encontrado"
             )
-        stats_dict = self.get_user_stats(user.id)
-        
-        # Obter contadores de seguidores e seguindo
-        follow_counts = self.get_follow_counts(user.id)
-        
-        # Se for o próprio usuário, retorna UserResponse (com email, etc)
+
+        # Se for o próprio usuário, retorna UserResponse (com email, sem is_following)
         if current_user_id is not None and user_id == current_user_id:
-            result = {
-                "id": user.id,
-                "username": user.username,
-                "email": user.email,
-                "full_name": user.full_name,
-                "profile_picture": user.profile_picture,
-                "created_at": user.created_at or datetime.now(),
-                "bookshelf_stats": stats_dict,
-                "follow_counts": follow_counts
-            }
-            return result
-        
-        # Se for outro usuário, verifica se o usuário atual está seguindo
-        is_following = False
-        if current_user_id is not None:
-            current_user_obj = self.db.query(User).filter(User.id == current_user_id).first()
-            if current_user_obj:
-                is_following = user in current_user_obj.following
-        
-        # Retorna dados públicos com informação de seguimento
-        return {
-            "id": user.id,
-            "username": user.username,
-            "full_name": user.full_name,
-            "profile_picture": user.profile_picture,
-            "created_at": user.created_at or datetime.now(),
-            "bookshelf_stats": stats_dict,
-            "is_following": is_following,
-            "follow_counts": follow_counts
-        }
+            card = self._load_profile_cards([user])[0]
+            card.pop("is_following")
+            card["email"] = user.email
+            return card
+
+        # Se for outro usuário, inclui se o usuário atual o segue
+        return self._load_profile_cards([user], viewer_id=current_user_id)[0]
 
     def get_user_by_username(self, username: str, current_user_id: int = None) -> UserSearchResponse:        
         user = self.db.query(User).filter(User.username == username).first()
@@ -74,92 +81,119 @@ class UserService:
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Usuário não encontrado"
             )
-        
-        stats_dict = self.get_user_stats(user.id)
-        follow_counts = self.get_follow_counts(user.id)
-        
-        # Verifica se o usuário atual está seguindo
-        is_following = False
-        if current_user_id is not None:
-            current_user_obj = self.db.query(User).filter(User.id == current_user_id).first()
-            if current_user_obj:
-                is_following = user in current_user_obj.following
-        
-        result = {
-            "id": user.id,
-            "username": user.username,
-            "full_name": user.full_name,
-            "profile_picture": user.profile_picture,
-            "created_at": user.created_at or datetime.now(),
-            "bookshelf_stats": stats_dict,
-            "is_following": is_following,
-            "follow_counts": follow_counts
-        }
-        
-        return result
+        return self._load_profile_cards([user], viewer_id=current_user_id)[0]
 
-    def get_user_stats(self, user_id: int) -> dict:
-        bookshelf_stats = self.db.query(
-            func.count(UserBookshelf.id).label('total'),
-            func.sum(case((UserBookshelf.status == 'to_read', 1), else_=0)).label('want_to_read'),
-            func.sum(case((UserBookshelf.status == 'reading', 1), else_=0)).label('reading'),
-            func.sum(case((UserBookshelf.status == 'read', 1), else_=0)).label('read')
-        ).filter(UserBookshelf.user_id == user_id).first()
+    def _load_profile_cards(self, users: List[User], viewer_id: Optional[int] = None) -> List[dict]:
+        """
+        Monta os cartões de perfil (estatísticas da estante, contadores de seguidores e
+        is_following do visitante) de uma lista de usuários com um número fixo de consultas
+        agrupadas, independente do tamanho da lista. Mantém a ordem de users.
+        """
+        if not users:
+            return []
+        user_ids = [user.id for user in users]
 
-        return {
-            'total': bookshelf_stats.total or 0,
-            'want_to_read': bookshelf_stats.want_to_read or 0,
-            'reading': bookshelf_stats.reading or 0,
-            'read': bookshelf_stats.read or 0
+        stats = ReadingStatsService(self.db).get_bookshelf_stats_many(user_ids)
+        follow_counts = self._get_follow_counts_many(users)
+
+        followed_by_viewer = set()
+        if viewer_id is not None:
+            followed_by_viewer = self.follow_graph.following_among(viewer_id, user_ids)
+
+        return [
+            {
+                "id": user.id,
+                "username": user.username,
+                "full_name": user.full_name,
+                "profile_picture": user.profile_picture,
+                "created_at": user.created_at or datetime.now(),
+                "bookshelf_stats": stats[user.id],
+                "is_following": user.id in followed_by_viewer if viewer_id is not None else None,
+                "follow_counts": follow_counts[user.id]
+            }
+            for user in users
+        ]
+
+    def _get_follow_counts_many(self, users: List[User]) -> Dict[int, dict]:
+        """
+        Contadores de vários usuários. Lê as colunas denormalizadas; para os ainda não
+        preenchidos (NULL), uma contagem agrupada por lado em user_follows.
+        """
+        counts = {
+            user.id: {'followers_count': user.followers_count, 'following_count': user.following_count}
+            for user in users
         }
+        missing_followers = [user_id for user_id, c in counts.items() if c['followers_count'] is None]
+        missing_following = [user_id for user_id, c in counts.items() if c['following_count'] is None]
 
-    def get_follow_counts(self, user_id: int) -> dict:        
-        user = self.db.query(User).filter(User.id == user_id).first()
-        if not user:
+        for user_id, count in self.follow_graph.count_followers(missing_followers).items():
+            counts[user_id]['followers_count'] = count
+        for user_id, count in self.follow_graph.count_following(missing_following).items():
+            counts[user_id]['following_count'] = count
+        return counts
+
+    def get_user_stats(self, user_id: int) -> dict:
+        return ReadingStatsService(self.db).get_bookshelf_stats(user_id)
+
+    def get_follow_counts(self, user_id: int) -> dict:
+        counters = self.db.query(User.followers_count, User.following_count).filter(User.id == user_id).first()
+        if not counters:
             print(f"User not found for ID: {user_id}")
             return {'followers_count': 0, 'following_count': 0}
-        
-        followers_count = len(user.followers)
-        following_count = len(user.following)
-        
-        result = {
+
+        followers_count, following_count = counters
+        # Usuários ainda não preenchidos pelo reparo: contagem direta, servida pelos índices
+        if followers_count is None:
+            followers_count = self.follow_graph.count_followers([user_id])[user_id]
+        if following_count is None:
+            following_count = self.follow_graph.count_following([user_id])[user_id]
+
+        return {
             'followers_count': followers_count,
             'following_count': following_count
         }
-        
-        return result
+
+    def _adjust_follow_counters(self, follower_id: int, following_id: int, delta: int) -> None:
+        """
+        Ajusta os contadores dos dois usuários com UPDATEs atômicos, na transação do follow.
+        Contadores NULL (não preenchidos) continuam NULL, pois NULL + 1 = NULL.
+        """
+        self.db.query(User).filter(User.id == follower_id).update(
+            {User.following_count: User.following_count + delta}, synchronize_session=False
+        )
+        self.db.query(User).filter(User.id == following_id).update(
+            {User.followers_count: User.followers_count + delta}, synchronize_session=False
+        )
 
     def follow_user(self, current_user: dict, user_to_follow_id: int) -> dict:
-        current_user_obj = self.db.query(User).filter(User.id == current_user["id"]).first()
-        
-        if user_to_follow_id == current_user_obj.id:
+        if user_to_follow_id == current_user["id"]:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Você não pode seguir a si mesmo"
             )
-        user_to_follow = self.db.query(User).filter(User.id == user_to_follow_id).first()
+        user_to_follow = self.db.query(User.id, User.username).filter(User.id == user_to_follow_id).first()
         if not user_to_follow:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Usuário não encontrado"
             )
-        
-        is_already_following = user_to_follow in current_user_obj.following
-        
-        if is_already_following:
+
+        if not self.follow_graph.follow(current_user["id"], user_to_follow.id):
+            self.db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Você já segue este usuário"
             )
-        current_user_obj.following.append(user_to_follow)
-        self.db.commit()
-        self.db.refresh(current_user_obj)
-        notification = Notification(
-            user_id=user_to_follow.id,
-            type="follow",
-            message=f"{current_user_obj.username} começou a te seguir."
-        )
-        self.db.add(notification)
+        self._adjust_follow_counters(current_user["id"], user_to_follow.id, 1)
+        record_follow(self.db, current_user["id"], user_to_follow.id)
+        record_follow_change(self.db, current_user["id"], user_to_follow.id, True)
+        follower_username = self.db.query(User.username).filter(User.id == current_user["id"]).scalar()
+        enqueue(self.db, "notification.notify", {
+            "user_id": user_to_follow.id,
+            "type": "follow",
+            "actor_id": current_user["id"],
+            "actor_username": follower_username
+        })
         self.db.commit()
         return {
             "is_following": True,
@@ -167,112 +201,154 @@ class UserService:
         }
 
     def unfollow_user(self, current_user: dict, user_to_unfollow_id: int) -> dict:
-        
-        current_user_obj = self.db.query(User).filter(User.id == current_user["id"]).first()
-        
-        if user_to_unfollow_id == current_user_obj.id:
+        if user_to_unfollow_id == current_user["id"]:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Você não pode deixar de seguir a si mesmo"
             )
-        user_to_unfollow = self.db.query(User).filter(User.id == user_to_unfollow_id).first()
+        user_to_unfollow = self.db.query(User.id, User.username).filter(User.id == user_to_unfollow_id).first()
         if not user_to_unfollow:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Usuário não encontrado"
             )
-        
-        is_following = user_to_unfollow in current_user_obj.following
-        
-        if not is_following:
+
+        if not self.follow_graph.unfollow(current_user["id"], user_to_unfollow.id):
+            self.db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Você não segue este usuário"
             )
-        current_user_obj.following.remove(user_to_unfollow)
+        self._adjust_follow_counters(current_user["id"], user_to_unfollow.id, -1)
+        record_unfollow(self.db, current_user["id"], user_to_unfollow.id)
+        record_follow_change(self.db, current_user["id"], user_to_unfollow.id, False)
         self.db.commit()
-        self.db.refresh(current_user_obj)
         return {
             "is_following": False,
             "message": f"Você deixou de seguir {user_to_unfollow.username}"
         }
 
-    def get_user_followers(self, user_id: int) -> List[UserSearchResponse]:
-        user = self.db.query(User).filter(User.id == user_id).first()
-        if not user:
+    def _list_follow_relation(
+        self,
+        user_id: int,
+        own_column,
+        other_column,
+        limit: int,
+        cursor: Optional[str],
+        viewer_id: Optional[int]
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Página de seguidores/seguidos de user_id, em ordem de id e paginada por keyset.
+        own_column é o lado de user_id em user_follows; other_column, o dos usuários listados.
+        """
+        if not self.db.query(User.id).filter(User.id == user_id).first():
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Usuário não encontrado"
             )
-        followers = user.followers
-        results = []
-        for follower in followers:
-            stats_dict = self.get_user_stats(follower.id)
-            follow_counts = self.get_follow_counts(follower.id)
-            results.append({
-                "id": follower.id,
-                "username": follower.username,
-                "full_name": follower.full_name,
-                "profile_picture": follower.profile_picture,
-                "created_at": follower.created_at or datetime.now(),
-                "bookshelf_stats": stats_dict,
-                "follow_counts": follow_counts
-            })
-        return results
-
-    def get_user_following(self, user_id: int) -> List[UserSearchResponse]:
-        user = self.db.query(User).filter(User.id == user_id).first()
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Usuário não encontrado"
-            )
-        following = user.following
-        results = []
-        for followed in following:
-            stats_dict = self.get_user_stats(followed.id)
-            follow_counts = self.get_follow_counts(followed.id)
-            results.append({
-                "id": followed.id,
-                "username": followed.username,
-                "full_name": followed.full_name,
-                "profile_picture": followed.profile_picture,
-                "created_at": followed.created_at or datetime.now(),
-                "bookshelf_stats": stats_dict,
-                "follow_counts": follow_counts
-            })
-        return results
-
-    def search_users(self, query: str, current_user_id: int) -> List[UserSearchResponse]:
-        
-        users = self.db.query(User).filter(
-            User.id != current_user_id,
-            or_(
-                User.username.ilike(f"%{query}%"),
-                User.full_name.ilike(f"%{query}%")
-            )
-        ).all()
+        limit = max(1, min(limit, MAX_USER_LIST_PAGE_SIZE))
+        order = [(User.id, False)]
 
-        results = []
-        current_user_obj = self.db.query(User).filter(User.id == current_user_id).first()
-        
-        for user in users:
-            stats_dict = self.get_user_stats(user.id)
-            follow_counts = self.get_follow_counts(user.id)
-            is_following = user in current_user_obj.following if current_user_obj else False
-            created_at = user.created_at or datetime.now()
+        query = self.db.query(User).join(user_follows, other_column == User.id).filter(own_column == user_id)
+        if cursor:
+            query = query.filter(keyset_filter(order, decode_cursor(cursor, len(order))))
+        users = query.order_by(*order_by_clauses(order)).limit(limit + 1).all()
 
-            results.append({
-                "id": user.id,
-                "username": user.username,
-                "full_name": user.full_name,
-                "profile_picture": user.profile_picture,
-                "created_at": created_at or datetime.now(),
-                "bookshelf_stats": stats_dict,
-                "is_following": is_following,
-                "follow_counts": follow_counts
-            })
-        return results
+        next_cursor = None
+        if len(users) > limit:
+            users = users[:limit]
+            next_cursor = encode_cursor([users[-1].id])
+        return self._load_profile_cards(users, viewer_id=viewer_id), next_cursor
+
+    def get_user_followers(
+        self,
+        user_id: int,
+        limit: int = DEFAULT_USER_LIST_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        viewer_id: Optional[int] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        return self._list_follow_relation(
+            user_id, user_follows.c.following_id, user_follows.c.follower_id, limit, cursor, viewer_id
+        )
+
+    def get_user_following(
+        self,
+        user_id: int,
+        limit: int = DEFAULT_USER_LIST_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        viewer_id: Optional[int] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        return self._list_follow_relation(
+            user_id, user_follows.c.follower_id, user_follows.c.following_id, limit, cursor, viewer_id
+        )
+
+    def search_users(
+        self,
+        query: str,
+        current_user_id: int,
+        limit: int = DEFAULT_USER_SEARCH_PAGE_SIZE,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Busca por username/nome completo, ignorando acentos e ordenada por relevância
+        (username idêntico e prefixo primeiro). Paginada por cursor (relevância, id).
+        """
+        limit = max(1, min(limit, MAX_USER_LIST_PAGE_SIZE))
+        after = tuple(decode_cursor(cursor, 2)) if cursor else None
+
+        matches = get_user_search_backend(self.db).search(query, current_user_id, limit + 1, after)
+        next_cursor = None
+        if len(matches) > limit:
+            matches = matches[:limit]
+            next_cursor = encode_cursor(list(matches[-1]))
+
+        user_ids = [user_id for _, user_id in matches]
+        users_by_id = {user.id: user for user in self.db.query(User).filter(User.id.in_(user_ids)).all()}
+        users = [users_by_id[user_id] for user_id in user_ids if user_id in users_by_id]
+        return self._load_profile_cards(users, viewer_id=current_user_id), next_cursor
+
+    def _count_shared_books(self, user_id: int, candidate_ids: List[int]) -> Dict[int, int]:
+        """Livros da estante de user_id presentes na de cada candidato (índice único (user_id, book_id))."""
+        if not candidate_ids:
+            return {}
+        own_books = self.db.query(UserBookshelf.book_id).filter(UserBookshelf.user_id == user_id)
+        return dict(self.db.query(UserBookshelf.user_id, func.count()).filter(
+            UserBookshelf.user_id.in_(candidate_ids),
+            UserBookshelf.book_id.in_(own_books.scalar_subquery())
+        ).group_by(UserBookshelf.user_id).all())
+
+    def _rank_follow_suggestions(self, user_id: int) -> List[Tuple[int, int, int]]:
+        """
+        Amigos de amigos pelo grafo em memória: os FOLLOW_SUGGESTIONS_CANDIDATES com mais
+        conexões em comum são reordenados somando o peso dos livros em comum. Devolve os
+        FOLLOW_SUGGESTIONS_TOP_K primeiros como (id, em comum, livros em comum).
+        """
+        social_graph.ensure_fresh()
+        candidates = social_graph.friends_of_friends(user_id, settings.FOLLOW_SUGGESTIONS_CANDIDATES)
+        shared_books = self._count_shared_books(user_id, [candidate_id for candidate_id, _ in candidates])
+        ranked = [
+            (candidate_id, mutual_count, shared_books.get(candidate_id, 0))
+            for candidate_id, mutual_count in candidates
+        ]
+        ranked.sort(key=lambda item: (-(item[1] + settings.FOLLOW_SUGGESTIONS_SHELF_WEIGHT * item[2]), item[0]))
+        return ranked[:settings.FOLLOW_SUGGESTIONS_TOP_K]
+
+    def get_follow_suggestions(self, user_id: int, limit: int = DEFAULT_FOLLOW_SUGGESTIONS) -> List[dict]:
+        """Quem seguir, do cache por usuário (descartado quando ele segue ou deixa de seguir alguém)."""
+        ranked = follow_suggestions_cache.get(user_id)
+        if ranked is None:
+            ranked = self._rank_follow_suggestions(user_id)
+            follow_suggestions_cache.set(user_id, ranked)
+        ranked = ranked[:limit]
+
+        user_ids = [candidate_id for candidate_id, _, _ in ranked]
+        users_by_id = {user.id: user for user in self.db.query(User).filter(User.id.in_(user_ids)).all()}
+        users = [users_by_id[candidate_id] for candidate_id in user_ids if candidate_id in users_by_id]
+        scores = {candidate_id: (mutual_count, shelf_overlap) for candidate_id, mutual_count, shelf_overlap in ranked}
+        cards = self._load_profile_cards(users, viewer_id=user_id)
+        for card in cards:
+            card["mutual_count"], card["shelf_overlap"] = scores[card["id"]]
+        return cards
 
     def update_user_profile(self, user_id: int, user_update: UserUpdate) -> User:
         user = self.db.query(User).filter(User.id == user_id).first()
@@ -330,124 +406,129 @@ class UserService:
                 detail=f"Erro ao atualizar perfil: {str(e)}"
             )
 
-    def get_notifications(self, user_id: int):
-        from back_end.schemas.user import NotificationResponse
-        notifications = self.db.query(Notification).filter(Notification.user_id == user_id).order_by(Notification.created_at.desc()).all()
-        result = []
-        for n in notifications:
-            try:
-                notif = NotificationResponse.from_orm(n)
-                result.append(notif)
-            except Exception as e:
-                print(f"Erro ao converter notificação id={n.id}: {e}")
-        return result
-
-    def safe_int(self, val):
-        try:
-            return int(val)
-        except (TypeError, ValueError):
-            return None
+    def _get_feed_positions(self, user_id: int, limit: int, before: Optional[str]) -> List[Tuple[datetime, int]]:
+        # Feed materializado (timeline_items) intercalado com autores muito seguidos
+        return TimelineService(self.db).get_feed_positions(
+            user_id, limit, self._parse_feed_cursor(before) if before else None
+        )
 
-    def safe_float(self, val):
-        try:
-            return float(val)
-        except (TypeError, ValueError):
+    def _load_feed_entries(self, positions: List[Tuple[datetime, int]], event_ids: List[int]) -> Dict[int, FeedEntry]:
+        """FeedEntry de cada evento pedido (dentre as posições), com autor e livro, em uma consulta."""
+        rows = self.db.query(
+            ReadingEvent.id, ReadingEvent.user_id, ReadingEvent.book_id, ReadingEvent.event_type,
+            ReadingEvent.status, ReadingEvent.pages_read, ReadingEvent.total_pages, ReadingEvent.rating,
+            ReadingEvent.is_favorite, ReadingEvent.created_at,
+            User.username, User.full_name, User.profile_picture,
+            Book.name, Book.subtitle, Book.cover_url, Book.num_pages, Book.average_rating
+        ).join(
+            User, User.id == ReadingEvent.user_id
+        ).join(
+            Book, Book.id == ReadingEvent.book_id
+        ).filter(
+            ReadingEvent.id.in_(event_ids),
+            # Intervalo das posições: no Postgres limita a busca às partições envolvidas
+            ReadingEvent.created_at.between(positions[-1][0], positions[0][0])
+        ).all()
+
+        # Dados vindos tipados do banco: o FeedEntry é montado sem nova validação
+        entries = {}
+        for row in rows:
+            created_at = row.created_at.isoformat()
+            entries[row.id] = FeedEntry.model_construct(
+                id=row.id,
+                user_id=row.user_id,
+                book_id=row.book_id,
+                status=row.status,
+                pages_read=row.pages_read,
+                total_pages=row.total_pages,
+                rating=row.rating,
+                is_favorite=bool(row.is_favorite),
+                created_at=created_at,
+                updated_at=created_at,
+                user={
+                    "id": row.user_id,
+                    "username": row.username,
+                    "full_name": row.full_name,
+                    "profile_picture": row.profile_picture
+                },
+                book={
+                    "id": row.book_id,
+                    "name": row.name,
+                    "subtitle": row.subtitle,
+                    "cover_url": row.cover_url,
+                    "num_pages": row.num_pages,
+                    "average_rating": row.average_rating
+                },
+                activity_type=FEED_ACTIVITY_TYPES.get(row.event_type, "update")
+            )
+        return entries
+
+    def _next_feed_cursor(self, positions: List[Tuple[datetime, int]], limit: int) -> Optional[str]:
+        if len(positions) < limit:
             return None
+        last_created_at, last_event_id = positions[-1]
+        return f"{last_created_at.isoformat()},{last_event_id}"
 
-    def get_feed(self, user_id: int, limit: int = 20):        
-        user = self.db.query(User).filter(User.id == user_id).first()
-        if not user:
-            return []
-        
-        followed_ids = [u.id for u in user.following]
-        
-        if not followed_ids:
-            return []
-        
-        from back_end.models.bookshelf import UserBookshelf, Book
-        feed_entries = self.db.query(UserBookshelf).filter(UserBookshelf.user_id.in_(followed_ids)).order_by(UserBookshelf.updated_at.desc()).limit(limit).all()
-        
-        if not feed_entries:
-            return []
-        
-        # Serializar os dados para o formato esperado pelo schema FeedEntry
-        result = []
-        for entry in feed_entries:
-            try:
-                # Buscar informações do usuário SEMPRE ATUALIZADAS
-                user_info = None
-                if entry.user_id:
-                    fresh_user = self.db.query(User).filter(User.id == entry.user_id).first()
-                    if fresh_user:
-                        user_info = {
-                            "id": self.safe_int(fresh_user.id),
-                            "username": fresh_user.username,
-                            "full_name": fresh_user.full_name,
-                            "profile_picture": fresh_user.profile_picture
-                        }
-                # Buscar informações do livro
-                book_info = None
-                if entry.book:
-                    book_info = {
-                        "id": self.safe_int(entry.book.id),
-                        "name": entry.book.name,
-                        "subtitle": entry.book.subtitle,
-                        "cover_url": entry.book.cover_url,
-                        "num_pages": self.safe_int(entry.book.num_pages) if entry.book.num_pages is not None else None,
-                        "average_rating": self.safe_float(entry.book.average_rating) if entry.book.average_rating is not None else None
-                    }
-                # Determinar o tipo de atividade
-                activity_type = self._determine_activity_type(entry)
-                entry_data = {
-                    "id": self.safe_int(entry.id),
-                    "user_id": self.safe_int(entry.user_id),
-                    "book_id": self.safe_int(entry.book_id),
-                    "status": str(entry.status) if entry.status is not None else None,
-                    "pages_read": self.safe_int(entry.pages_read) if entry.pages_read is not None else None,
-                    "total_pages": self.safe_int(entry.total_pages) if entry.total_pages is not None else None,
-                    "rating": self.safe_float(entry.rating) if entry.rating is not None else None,
-                    "is_favorite": bool(entry.is_favorite) if entry.is_favorite is not None else False,
-                    "created_at": (entry.created_at or datetime.now()).isoformat(),
-                    "updated_at": (entry.updated_at or datetime.now()).isoformat(),
-                    "user": user_info,
-                    "book": book_info,
-                    "activity_type": activity_type
-                }
-                result.append(entry_data)
-            except Exception as e:
-                print(f"Error serializing entry {getattr(entry, 'id', 'unknown')}: {e}")
-                import traceback
-                traceback.print_exc()
-                continue
-        
-        # Garantir que sempre retorne uma lista
-        if not isinstance(result, list):
-            print("Result is not a list, returning empty list")
-            return []
-        
-        return result
-    
-    def _determine_activity_type(self, entry):
-        """Determina o tipo de atividade baseado nas mudanças recentes"""
-        # Se tem rating, é uma avaliação
-        if entry.rating is not None:
-            return "rating"
-        # Se é favorito, pode ser uma marcação como favorito
-        elif entry.is_favorite:
-            return "favorite"
-        # Se mudou o status para 'read', é conclusão de leitura
-        elif entry.status == 'read':
-            return "completed"
-        # Se mudou o status para 'reading', é início de leitura
-        elif entry.status == 'reading':
-            return "started_reading"
-        # Se tem progresso de páginas, é atualização de progresso
-        elif entry.pages_read > 0:
-            return "progress"
-        # Se mudou para 'to_read', é adição à lista
-        elif entry.status == 'to_read':
-            return "added_to_shelf"
-        else:
-            return "update" 
-
-    
\ No newline at end of file
+    def get_feed(
+        self,
+        user_id: int,
+        limit: int = DEFAULT_FEED_PAGE_SIZE,
+        before: Optional[str] = None
+    ) -> Tuple[List[FeedEntry], Optional[str]]:
+        """
+        Página do feed, do evento mais recente ao mais antigo, montada com um número fixo de
+        consultas: posições na timeline e uma consulta de eventos com autores e livros.
+        before é o cursor "<created_at ISO>,<id do evento>" devolvido pela página anterior.
+        """
+        limit = max(1, min(limit, MAX_FEED_PAGE_SIZE))
+        positions = self._get_feed_positions(user_id, limit, before)
+        if not positions:
+            return [], None
+
+        event_ids = [event_id for _, event_id in positions]
+        entries = self._load_feed_entries(positions, event_ids)
+        return [entries[event_id] for event_id in event_ids if event_id in entries], self._next_feed_cursor(positions, limit)
+
+    def get_feed_page(
+        self,
+        user_id: int,
+        limit: int = DEFAULT_FEED_PAGE_SIZE,
+        before: Optional[str] = None
+    ) -> Tuple[bytes, Optional[str], str]:
+        """
+        Página do feed já serializada: (corpo JSON, cursor da próxima página, ETag).
+        Páginas ficam no feed_cache até a versão do feed do usuário mudar ou o TTL vencer.
+        O corpo é a concatenação dos fragmentos de cada item (feed_fragments): só os itens
+        ausentes do cache de fragmentos são lidos do banco e serializados.
+        """
+        limit = max(1, min(limit, MAX_FEED_PAGE_SIZE))
+        cache_key = feed_cache_key(user_id, limit, before)
+        cached = feed_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        positions = self._get_feed_positions(user_id, limit, before)
+        event_ids = [event_id for _, event_id in positions]
+        fragments = feed_fragments.get_many(event_ids)
+        missing = [event_id for event_id in event_ids if event_id not in fragments]
+        if missing:
+            stamp = feed_fragments.stamp()
+            for event_id, entry in self._load_feed_entries(positions, missing).items():
+                fragment = feed_entry_adapter.dump_json(entry)
+                feed_fragments.store(event_id, entry.user_id, entry.book_id, fragment, stamp)
+                fragments[event_id] = fragment
+
+        body = b"[" + b",".join(fragments[event_id] for event_id in event_ids if event_id in fragments) + b"]"
+        page = (body, self._next_feed_cursor(positions, limit), feed_etag(body))
+        feed_cache.set(cache_key, page)
+        return page
+
+    def _parse_feed_cursor(self, before: str) -> Tuple[datetime, int]:
+        try:
+            created_at, event_id = before.rsplit(",", 1)
+            return datetime.fromisoformat(created_at), int(event_id)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cursor de paginação inválido"
+            )
@@ -63,6 +63,42 @@ async function apiRequest<T>(
   }
 }
 
+// Listas paginadas por cursor: o cursor da próxima página vem no cabeçalho X-Next-Cursor
+// (ausente na última página)
+const NEXT_CURSOR_HEADER = 'X-Next-Cursor';
+
+// Busca todas as páginas de uma lista paginada, seguindo o cursor até a última
+async function apiRequestAllPages<T>(endpoint: string, pageSize: number): Promise<T[]> {
+  const token = localStorage.getItem('access_token');
+  if (!token) {
+    throw new Error('Sessão expirada');
+  }
+
+  const items: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const separator = endpoint.includes('?') ? '&' : '?';
+    let url = `${API_BASE_URL}${endpoint}${separator}limit=${pageSize}`;
+    if (cursor) {
+      url += `&cursor=${encodeURIComponent(cursor)}`;
+    }
+
+    const response = await fetch(url, {
+      headers: { 'Authorization': `Bearer ${token}` },
+    });
+    const responseData = await response.json();
+
+    if (!response.ok) {
+      throw new Error(responseData.detail || 'Erro na requisição');
+    }
+
+    items.push(...responseData);
+    cursor = response.headers.get(NEXT_CURSOR_HEADER);
+  } while (cursor);
+
+  return items;
+}
+
 export async function getFeed() {
   const token = localStorage.getItem('access_token');
   if (!token) {
@@ -219,15 +255,8 @@ export async function getFeedRobust() {
   return data;
 }
 
-export async function getNotifications() {
-  const token = localStorage.getItem('access_token');
-  const res = await fetch(`${API_BASE_URL}/users/notifications`, {
-    headers: {
-      'Authorization': `Bearer ${token}`
-    }
-  });
-  if (!res.ok) throw new Error('Erro ao buscar notificações');
-  return res.json();
+export function getNotifications() {
+  return apiRequestAllPages('/users/notifications', 100);
 }
 
 // Funções específicas para cada endpoint
@@ -277,7 +306,7 @@ export const api = {
   getUserByUsername: (username: string) => apiRequest<UserProfile>(`/users/username/${username}`),
 
   // Bookshelf
-  getBookshelf: () => apiRequest('/bookshelf'),
+  getBookshelf: () => apiRequestAllPages('/bookshelf/', 200),
   getBookDetails: (bookId: number) => apiRequest(`/bookshelf/books/${bookId}`),
   addToBookshelf: (bookData: any) => apiRequest('/bookshelf', 'POST', bookData),
   updateBookshelfEntry: (entryId: number, data: any) => apiRequest(`/bookshelf/${entryId}`, 'PATCH', data),
@@ -324,39 +353,9 @@ export const api = {
     return response.json();
   },
 
-  async getUserFollowers(userId: number) {
-    const response = await fetch(`${API_BASE_URL}/users/${userId}/followers`, {
-      method: 'GET',
-      headers: {
-        'Content-Type': 'application/json',
-        'Authorization': `Bearer ${localStorage.getItem('access_token')}`
-      },
-    });
-
-    if (!response.ok) {
-      const error = await response.json();
-      throw new Error(error.detail || 'Falha ao obter os seguidores do usuário');
-    }
-
-    return response.json();
-  },
-
-  async getUserFollowing(userId: number) {
-    const response = await fetch(`${API_BASE_URL}/users/${userId}/following`, {
-      method: 'GET',
-      headers: {
-        'Content-Type': 'application/json',
-        'Authorization': `Bearer ${localStorage.getItem('access_token')}`
-      },
-    });
+  getUserFollowers: (userId: number) => apiRequestAllPages(`/users/${userId}/followers`, 100),
 
-    if (!response.ok) {
-      const error = await response.json();
-      throw new Error(error.detail || 'Falha ao obter os usuários seguidos pelo usuário');
-    }
-
-    return response.json();
-  },
+  getUserFollowing: (userId: number) => apiRequestAllPages(`/users/${userId}/following`, 100),
 
   async getUserFollowCounts(userId: number) {
     const response = await fetch(`${API_BASE_URL}/users/${userId}/follow-counts`, {